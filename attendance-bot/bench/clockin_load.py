@@ -0,0 +1,349 @@
+"""Synthetic load benchmark for the clock-in cog.
+
+Drives the real ClockInCreate cog offline against the stand-ins in
+bench.fakes, on an event loop whose clock skips ahead to the next timer,
+so a 3-hour shift replays in seconds. Run from attendance-bot/:
+
+    python -m bench.clockin_load --attendees 500 --hours 3
+    python -m bench.clockin_load --shifts 4 --flaps-per-hour 6 --json
+    python -m bench.clockin_load --processes 4 --shifts 2
+
+With --processes N every process runs the same scenario as one shard of
+N, in a guild on that shard, all against one shared SQLite file standing
+in for the deployment's store; the report merges them.
+"""
+import os
+import sys
+import time
+import sqlite3
+import json
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+import multiprocessing
+
+from bench.fakes import FakeBot, FakeInteraction, FakeVoiceState, VirtualClockLoop
+from utils.sharding import shard_for_guild
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# =========================
+# SCENARIO
+# =========================
+def build_scenario(args, rng):
+    """Return [(t, kind, shift_index, member_index)] sorted by time.
+
+    Every attendee connects during the first join_window seconds and presses
+    Join shortly after. From then on they drop out at flaps_per_hour on
+    average and stay away for mean_away seconds, so some of them outlast
+    the grace period. Mute/deafen noise arrives as same-channel updates.
+    """
+    duration = args.hours * 3600
+    events = []
+    for s in range(args.shifts):
+        for m in range(args.attendees):
+            t = rng.uniform(0, args.join_window)
+            events.append((t, "connect", s, m))
+            t += rng.uniform(1, 30)
+            events.append((t, "join", s, m))
+            if rng.random() < args.leave_fraction:
+                events.append((rng.uniform(t, duration), "leave", s, m))
+            connected = True
+            while args.flaps_per_hour > 0:
+                if connected:
+                    t += rng.expovariate(args.flaps_per_hour / 3600)
+                else:
+                    t += rng.expovariate(1 / args.mean_away)
+                if t >= duration:
+                    break
+                events.append((t, "disconnect" if connected else "reconnect", s, m))
+                connected = not connected
+            for _ in range(int(args.noise_per_hour * args.hours)):
+                events.append((rng.uniform(0, duration), "toggle", s, m))
+        events.append((duration, "finish", s, None))
+    events.sort(key=lambda e: e[0])
+    return events
+
+# =========================
+# TIMING
+# =========================
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def install_virtual_clock(clockin, loop):
+    # The cog reads epoch_now(); tie it to the virtual clock
+    epoch = time.time()
+    base = loop.time()
+    clockin.epoch_now = lambda: epoch + (loop.time() - base)
+
+def install_render_timer(clockin, latencies):
+    # render_loop and flush_embed look update_embed up as a module global
+    update_embed = clockin.update_embed
+
+    async def timed_update_embed(shift, bot):
+        started = time.perf_counter()
+        try:
+            return await update_embed(shift, bot)
+        finally:
+            latencies.setdefault("update_embed", []).append(time.perf_counter() - started)
+
+    clockin.update_embed = timed_update_embed
+
+# =========================
+# RUNNER
+# =========================
+def guild_for_shard(shard_id, shard_count):
+    # A snowflake-shaped guild id that Discord would route to shard_id
+    guild_id = (1000 * shard_count + shard_id) << 22
+    assert shard_for_guild(guild_id, shard_count) == shard_id
+    return guild_id
+
+async def run(args, clockin, guild_id=None):
+    loop = asyncio.get_running_loop()
+    install_virtual_clock(clockin, loop)
+    latencies = {}
+    install_render_timer(clockin, latencies)
+
+    bot = FakeBot()
+    guild = bot.add_guild()
+    if guild_id is not None:
+        guild.id = guild_id
+    text = guild.add_text_channel()
+    role = guild.add_role(clockin.high_ranks_role)
+    host = guild.add_member("host", roles=[role])
+
+    cog = clockin.ClockInCreate(bot)
+    await cog.cog_load()
+    await cog.on_ready()
+
+    async def timed(kind, coro):
+        started = time.perf_counter()
+        await coro
+        latencies.setdefault(kind, []).append(time.perf_counter() - started)
+
+    def press(action, shift_id, user):
+        interaction = FakeInteraction(bot, guild, user, text, message=text.messages.get(shift_ids[shift_id][1]))
+        return clockin.ClockInButton(action, shift_id, bot).callback(interaction)
+
+    shifts = []  # [(shift_id, voice, members)]
+    shift_ids = {}  # {shift_id: (voice, message_id)}
+    for s in range(args.shifts):
+        voice = guild.add_voice_channel(f"shift-vc-{s}")
+        interaction = FakeInteraction(bot, guild, host, text)
+        await timed("create", cog.clockincreate_slash.callback(
+            cog, interaction, f"Bench shift {s}", voice,
+            min_attendance=args.min_attendance, grace_minutes=args.grace_minutes))
+        shift_id = f"{guild.id}-{interaction.id}"
+        members = [guild.add_member(f"member-{s}-{m}") for m in range(args.attendees)]
+        shifts.append((shift_id, voice, members))
+        shift_ids[shift_id] = (voice, interaction._message.id)
+
+    events = build_scenario(args, random.Random(args.seed))
+    if args.tracemalloc:
+        tracemalloc.start()
+    base = loop.time()
+    started = time.perf_counter()
+    for t, kind, s, m in events:
+        delay = t - (loop.time() - base)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        shift_id, voice, members = shifts[s]
+        member = members[m] if m is not None else host
+        if kind == "connect" or kind == "reconnect":
+            before = FakeVoiceState(None)
+            member.voice = FakeVoiceState(voice)
+            await timed("voice_state", cog.on_voice_state_update(member, before, member.voice))
+        elif kind == "disconnect":
+            before = member.voice
+            member.voice = None
+            await timed("voice_state", cog.on_voice_state_update(member, before, FakeVoiceState(None)))
+        elif kind == "toggle":
+            if member.voice is None:
+                continue
+            await timed("voice_state", cog.on_voice_state_update(member, member.voice, FakeVoiceState(voice)))
+        elif kind == "join":
+            await timed("button_join", press("join", shift_id, member))
+        elif kind == "leave":
+            await timed("button_leave", press("leave", shift_id, member))
+        elif kind == "finish":
+            await timed("button_finish", press("finish", shift_id, host))
+    # Let trailing renders and grace expiries settle before stopping the clock
+    await asyncio.sleep(args.grace_minutes * 60 + clockin.EMBED_UPDATE_INTERVAL + 1)
+    elapsed = time.perf_counter() - started
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    if args.tracemalloc:
+        tracemalloc.stop()
+    await cog.cog_unload()
+
+    return {
+        "latencies": latencies,
+        "elapsed": elapsed,
+        "stats": vars(bot.stats),
+        "peak_rss_kib": peak_rss_kib(),
+        "traced_peak": traced_peak,
+    }
+
+def build_report(args, runs):
+    # runs: what run() returned, one per process
+    latencies = {}
+    for result in runs:
+        for kind, samples in result["latencies"].items():
+            latencies.setdefault(kind, []).extend(samples)
+    stats = {key: sum(result["stats"][key] for result in runs) for key in runs[0]["stats"]}
+    elapsed = max(result["elapsed"] for result in runs)  # The processes run side by side
+    handled = sum(len(v) for k, v in latencies.items() if k not in ("create", "update_embed"))
+    traced = [result["traced_peak"] for result in runs if result["traced_peak"] is not None]
+    rss = [result["peak_rss_kib"] for result in runs if result["peak_rss_kib"] is not None]
+    report = {
+        "scenario": {
+            "shifts": args.shifts,
+            "attendees_per_shift": args.attendees,
+            "hours": args.hours,
+            "seed": args.seed,
+            "processes": len(runs),
+        },
+        "events": handled,
+        "wall_seconds": round(elapsed, 3),
+        "events_per_second": round(handled / elapsed, 1) if elapsed > 0 else None,
+        "latency_ms": {
+            kind: {
+                "count": len(samples),
+                "p50": round(percentile(samples, 50) * 1000, 3),
+                "p99": round(percentile(samples, 99) * 1000, 3),
+                "max": round(max(samples) * 1000, 3),
+            }
+            for kind, samples in sorted(latencies.items())
+        },
+        "rest": {
+            "msg_edit": stats["edits"],
+            "msg_edit_embed": stats["embed_edits"],
+            "channel_send": stats["sends"],
+            "dm": stats["dms"],
+            "interaction_responses": stats["responses"],
+        },
+        "memory": {
+            "peak_rss_kib": sum(rss) if rss else None,  # Summed over the processes
+            "traced_peak_kib": round(sum(traced) / 1024, 1) if traced else None,
+        },
+    }
+    return report
+
+def peak_rss_kib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KiB elsewhere
+
+def print_report(report):
+    sc = report["scenario"]
+    per = f" per process, {sc['processes']} processes" if sc["processes"] > 1 else ""
+    print(f"{sc['shifts']} shift(s) x {sc['attendees_per_shift']} attendees over {sc['hours']}h{per} (seed {sc['seed']})")
+    print(f"{report['events']} events in {report['wall_seconds']}s -> {report['events_per_second']} events/s")
+    print(f"{'handler':<16}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, lat in report["latency_ms"].items():
+        print(f"{kind:<16}{lat['count']:>8}{lat['p50']:>10.3f}{lat['p99']:>10.3f}{lat['max']:>10.3f}")
+    rest = report["rest"]
+    print(f"msg.edit: {rest['msg_edit']} ({rest['msg_edit_embed']} embed), sends: {rest['channel_send']}, DMs: {rest['dm']}")
+    mem = report["memory"]
+    line = f"peak RSS: {mem['peak_rss_kib']} KiB" + (" (all processes)" if sc["processes"] > 1 else "")
+    if mem["traced_peak_kib"] is not None:
+        line += f", traced peak: {mem['traced_peak_kib']} KiB"
+    print(line)
+    if "store" in report:
+        st = report["store"]
+        print(f"shared store: {st['shifts']} shifts in {st['guilds']} guilds, journal positions: {st['journal_seq_keys']}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a synthetic shift through the clock-in cog.")
+    parser.add_argument("--shifts", type=int, default=1)
+    parser.add_argument("--attendees", type=int, default=500, help="Attendees per shift")
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--join-window", type=float, default=600.0, help="Seconds over which attendees arrive")
+    parser.add_argument("--flaps-per-hour", type=float, default=2.0, help="Mean disconnects per attendee per hour")
+    parser.add_argument("--mean-away", type=float, default=120.0, help="Mean seconds away per disconnect")
+    parser.add_argument("--noise-per-hour", type=float, default=4.0, help="Mute/deafen updates per attendee per hour")
+    parser.add_argument("--leave-fraction", type=float, default=0.05, help="Share of attendees pressing Leave")
+    parser.add_argument("--grace-minutes", type=float, default=5.0)
+    parser.add_argument("--min-attendance", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-journal", action="store_true", help="Run without the shift journal")
+    parser.add_argument("--processes", type=int, default=1, help="Shard processes sharing one store")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also report the traced Python heap peak (slower)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+def configure_env(args, workdir, shard_id=None):
+    # The cog reads its paths and partition at import time
+    os.environ["SHIFT_DB_PATH"] = os.path.join(workdir, "shifts.db")
+    os.environ["SHIFT_JOURNAL_DIR"] = "" if args.no_journal else os.path.join(workdir, "journal")
+    if shard_id is not None:
+        os.environ["SHARD_COUNT"] = str(args.processes)
+        os.environ["SHARD_IDS"] = str(shard_id)
+
+def run_in_loop(args, guild_id=None):
+    loop = VirtualClockLoop()
+    asyncio.set_event_loop(loop)
+    try:
+        clockin = importlib.import_module("commands.clockincreate")
+        return loop.run_until_complete(run(args, clockin, guild_id))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+def run_shard(args, workdir, shard_id, results):
+    # Entry point of one shard process
+    configure_env(args, workdir, shard_id)
+    results.put((shard_id, run_in_loop(args, guild_for_shard(shard_id, args.processes))))
+
+def run_processes(args, workdir):
+    context = multiprocessing.get_context("spawn")  # Fresh interpreters: the cog keeps its state in module globals
+    results = context.Queue()
+    processes = [
+        context.Process(target=run_shard, args=(args, workdir, shard_id, results)) for shard_id in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    runs = dict(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return [runs[shard_id] for shard_id in sorted(runs)]
+
+def inspect_store(workdir):
+    conn = sqlite3.connect(os.path.join(workdir, "shifts.db"))
+    try:
+        shifts, guilds = conn.execute("SELECT COUNT(*), COUNT(DISTINCT guild_id) FROM shifts").fetchone()
+        keys = [key for key, in conn.execute("SELECT key FROM meta WHERE key LIKE 'journal_seq%' ORDER BY key")]
+    finally:
+        conn.close()
+    return {"shifts": shifts, "guilds": guilds, "journal_seq_keys": keys}
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="clockin-bench-")
+    try:
+        if args.processes > 1:
+            report = build_report(args, run_processes(args, workdir))
+            report["store"] = inspect_store(workdir)
+        else:
+            configure_env(args, workdir)
+            report = build_report(args, [run_in_loop(args)])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Offline stand-ins for the discord.py objects the clock-in cog touches.
+
+Only the attributes and coroutines the cog actually uses are provided.
+Every outbound call (message edits, sends, deletes, DMs) is counted in
+a shared Stats object so a benchmark can report REST traffic.
+"""
+import asyncio
+import itertools
+import discord
+
+_ids = itertools.count(10**17)
+
+def next_id():
+    return next(_ids)
+
+class Stats:
+    def __init__(self):
+        self.edits = 0  # msg.edit calls of any kind
+        self.embed_edits = 0
+        self.sends = 0
+        self.deletes = 0
+        self.dms = 0
+        self.responses = 0
+
+class FakePermissions:
+    manage_messages = True
+
+class FakeAsset:
+    url = "https://cdn.example/avatar.png"
+
+class FakeRole:
+    def __init__(self, name, role_id=None):
+        self.id = role_id or next_id()
+        self.name = name
+
+class FakeVoiceState:
+    def __init__(self, channel=None):
+        self.channel = channel
+
+class FakeMember(discord.Member):
+    # Plain class attributes shadow discord.Member's properties, so instances
+    # can hold their own values while still passing isinstance(..., Member)
+    id = None
+    name = None
+    display_name = None
+    mention = None
+    bot = False
+    voice = None
+    roles = ()
+    guild = None
+    display_avatar = None
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, guild, stats, name, roles=(), bot=False):
+        self.id = next_id()
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{self.id}>"
+        self.bot = bot
+        self.voice = None
+        self.roles = list(roles)
+        self.guild = guild
+        self.display_avatar = FakeAsset()
+        self._stats = stats
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __eq__(self, other):
+        return getattr(other, "id", None) == self.id
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"<FakeMember {self.name}>"
+
+    def get_role(self, role_id):
+        for role in self.roles:
+            if role.id == role_id:
+                return role
+        return None
+
+    async def send(self, *args, **kwargs):
+        self._stats.dms += 1
+
+class FakeMessage:
+    def __init__(self, channel, stats):
+        self.id = next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self._stats = stats
+
+    async def edit(self, **kwargs):
+        self._stats.edits += 1
+        if "embed" in kwargs:
+            self._stats.embed_edits += 1
+
+    async def delete(self):
+        self._stats.deletes += 1
+
+class FakeTextChannel:
+    def __init__(self, guild, stats, name="shifts"):
+        self.id = next_id()
+        self.name = name
+        self.guild = guild
+        self.mention = f"<#{self.id}>"
+        self._stats = stats
+        self.messages = {}
+
+    def permissions_for(self, member):
+        return FakePermissions()
+
+    async def send(self, *args, **kwargs):
+        self._stats.sends += 1
+        msg = FakeMessage(self, self._stats)
+        self.messages[msg.id] = msg
+        return msg
+
+    def get_partial_message(self, message_id):
+        return self.messages.get(message_id) or FakeMessage(self, self._stats)
+
+class FakeVoiceChannel:
+    def __init__(self, guild, name="shift-vc"):
+        self.id = next_id()
+        self.name = name
+        self.guild = guild
+        self.mention = f"<#{self.id}>"
+
+    @property
+    def members(self):
+        return [m for m in self.guild.members.values() if m.voice and m.voice.channel is self]
+
+class FakeGuild:
+    def __init__(self, stats, name="guild"):
+        self.id = next_id()
+        self.name = name
+        self.members = {}
+        self.channels = {}
+        self.roles = []
+        self._stats = stats
+        self.me = None
+
+    def add_member(self, name, roles=(), bot=False):
+        member = FakeMember(self, self._stats, name, roles=roles, bot=bot)
+        self.members[member.id] = member
+        return member
+
+    def add_text_channel(self, name="shifts"):
+        channel = FakeTextChannel(self, self._stats, name)
+        self.channels[channel.id] = channel
+        return channel
+
+    def add_voice_channel(self, name="shift-vc"):
+        channel = FakeVoiceChannel(self, name)
+        self.channels[channel.id] = channel
+        return channel
+
+    def add_role(self, name):
+        role = FakeRole(name)
+        self.roles.append(role)
+        return role
+
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+
+    def get_role(self, role_id):
+        for role in self.roles:
+            if role.id == role_id:
+                return role
+        return None
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self._interaction._stats.responses += 1
+        if not kwargs.get("ephemeral"):
+            self._interaction._message = FakeMessage(self._interaction.channel, self._interaction._stats)
+            self._interaction.channel.messages[self._interaction._message.id] = self._interaction._message
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self._interaction._stats.edits += 1
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, *args, **kwargs):
+        self._interaction._stats.responses += 1
+
+class FakeInteraction:
+    def __init__(self, bot, guild, user, channel, message=None, namespace=None):
+        self.id = next_id()
+        self.client = bot
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.channel = channel
+        self.message = message
+        self.namespace = namespace
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self._stats = bot.stats
+        self._message = None
+
+    async def original_response(self):
+        return self._message
+
+class FakeBot:
+    def __init__(self):
+        self.stats = Stats()
+        self.guilds = []
+        self.user = None
+        self.tree = None
+        self.loop = None
+
+    def add_guild(self, name="guild"):
+        guild = FakeGuild(self.stats, name)
+        guild.me = guild.add_member("bot", bot=True)
+        self.user = self.user or guild.me
+        self.guilds.append(guild)
+        return guild
+
+    def get_guild(self, guild_id):
+        for guild in self.guilds:
+            if guild.id == guild_id:
+                return guild
+        return None
+
+    def get_channel(self, channel_id):
+        for guild in self.guilds:
+            channel = guild.channels.get(channel_id)
+            if channel is not None:
+                return channel
+        return None
+
+    def get_user(self, user_id):
+        for guild in self.guilds:
+            member = guild.members.get(user_id)
+            if member is not None:
+                return member
+        return None
+
+    def get_cog(self, name):
+        return None
+
+    def add_dynamic_items(self, *items):
+        pass
+
+    def remove_dynamic_items(self, *items):
+        pass
+
+# =========================
+# VIRTUAL CLOCK
+# =========================
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop whose clock jumps to the next timer instead of sleeping.
+
+    A 3-hour shift with 5-minute grace periods replays in however long
+    the handlers take to run. Waits with no timer (I/O, worker threads)
+    still block for real.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._virtual_now = 0.0
+        real_select = self._selector.select
+
+        def select(timeout=None):
+            if timeout is not None and timeout > 0:
+                self._virtual_now += timeout
+                timeout = 0
+            return real_select(timeout)
+
+        self._selector.select = select
+
+    def time(self):
+        return self._virtual_now
@@ -0,0 +1,100 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from discord import Interaction
+from typing import Literal, Optional
+import datetime
+import logging
+from commands.clockincreate import store, format_time_delta, safe_get_user
+from utils.storage import ALL_TIME, StoreReader, period_of
+
+log = logging.getLogger(__name__)
+
+LEADERBOARD_SIZE = 10
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def resolve_period(period):
+    # Returns (rollup key, label)
+    now = datetime.datetime.utcnow()
+    if period == "this_month":
+        return period_of(now), now.strftime("%B %Y")
+    if period == "last_month":
+        last = now.replace(day=1) - datetime.timedelta(days=1)
+        return period_of(last), last.strftime("%B %Y")
+    return ALL_TIME, "all time"
+
+def describe_rollup(attended, passed, seconds, attendance_sum):
+    average = attendance_sum / attended if attended else 0.0
+    return (
+        f"Passed **{passed}/{attended}** shifts ({passed / attended * 100:.0f}%) · "
+        f"{format_time_delta(datetime.timedelta(seconds=seconds))} present · "
+        f"average attendance {average * 100:.0f}%"
+    )
+
+class Attendance(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.reader = StoreReader(store)  # Rollup lookups are single index probes
+
+    @app_commands.command(
+        name="attendance",
+        description="Shift attendance for a member, or the leaderboard when no member is given"
+    )
+    @app_commands.describe(
+        member="Member to look up (leave empty for the leaderboard)",
+        period="Which shifts to count"
+    )
+    async def attendance_slash(
+        self,
+        interaction: Interaction,
+        member: Optional[discord.Member] = None,
+        period: Literal["this_month", "last_month", "all_time"] = "this_month"
+    ):
+        if interaction.guild is None:
+            await interaction.response.send_message("❌ You need to be in a server.", ephemeral=True)
+            return
+        key, label = resolve_period(period)
+        try:
+            if member is not None:
+                row = await self.reader.query(store.load_rollup, interaction.guild.id, member.id, key)
+                if row is None or not row[0]:
+                    await interaction.response.send_message(
+                        f"ℹ️ {member.display_name} has no finished shifts ({label}).", ephemeral=True)
+                    return
+                embed = discord.Embed(
+                    title=f"📊 Attendance: {member.display_name}",
+                    description=describe_rollup(*row),
+                    color=discord.Color.blue()
+                )
+                embed.set_footer(text=label)
+                await interaction.response.send_message(embed=embed, ephemeral=True)
+                return
+
+            rows = await self.reader.query(store.load_leaderboard, interaction.guild.id, key, LEADERBOARD_SIZE)
+            if not rows:
+                await interaction.response.send_message(f"ℹ️ No finished shifts ({label}).", ephemeral=True)
+                return
+            lines = []
+            for rank, (uid, attended, passed, seconds, attendance_sum) in enumerate(rows, start=1):
+                user = safe_get_user(self.bot, uid)
+                name = getattr(user, "display_name", None) or f"User {uid}"
+                lines.append(f"**{rank}.** {name}: {describe_rollup(attended, passed, seconds, attendance_sum)}")
+            embed = discord.Embed(
+                title="🏆 Attendance Leaderboard",
+                description="\n".join(lines)[:4096],
+                color=discord.Color.gold()
+            )
+            embed.set_footer(text=label)
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            log.exception("Attendance query failed", extra={"guild": interaction.guild.id, "user": interaction.user.id})
+            await interaction.response.send_message(f"❌ Could not load attendance: {e}", ephemeral=True)
+
+    async def cog_unload(self):
+        self.reader.close()
+
+async def setup(bot):
+    await bot.add_cog(Attendance(bot))
+    log.info("Loaded extension: commands.attendance")
@@ -2,17 +2,87 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from discord import Interaction
-from discord.ui import View, Button, Select
+from discord.ui import View, Button
 import datetime
+import time
 import asyncio
-import traceback
+import logging
+import json
+import os
+from utils.storage import ShiftStore, StoreReader, GUILD_SETTINGS, from_epoch
+from utils.models import Shift, Attendee, epoch_now
+from utils.timers import DeadlineScheduler
+from utils.nameindex import NameIndex
+from utils.permissions import RolePermissions
+from utils.outbox import Outbox
+from utils.journal import ShiftJournal
+from utils.sharding import Partition
+from utils import metrics, scoring
+
+log = logging.getLogger(__name__)
 
 # =========================
 # STORAGE
 # =========================
 active_shifts = {}
-grace_periods = {}  # {user_id: {shift_id, left_at, task}}
-high_ranks_role = "brotato"  # Role name for high ranks
+grace_periods = {}  # {user_id: {shift_id, left_at}}, deadlines live in grace_scheduler
+voice_index = {}  # {voice_channel_id: {shift_id, ...}} for live shifts only
+render_states = {}  # {shift_id: {dirty, task, last_flush, last_hash}}
+name_indexes = {}  # {shift_id: NameIndex} of attendee display names for /clockinremove, built on first use
+high_ranks_role = "brotato"  # Role name for high ranks, in guilds that have not configured manager roles
+EMBED_UPDATE_INTERVAL = float(os.environ.get("EMBED_UPDATE_INTERVAL", "2.0"))  # Min seconds between edits of one shift message
+SHIFT_DB_PATH = os.environ.get("SHIFT_DB_PATH", "shifts.db")
+SHIFT_JOURNAL_DIR = os.environ.get("SHIFT_JOURNAL_DIR", "shift-journal")  # Empty to run without a journal
+# With a journal the database is only a snapshot, so it can be written less often
+SHIFT_FLUSH_INTERVAL = float(os.environ.get("SHIFT_FLUSH_INTERVAL", "5.0" if SHIFT_JOURNAL_DIR else "1.0"))
+GRACE_PERIOD_SECONDS = 300  # Default, shifts can override it with grace_minutes
+RESULTS_RETRY_BASE = float(os.environ.get("RESULTS_RETRY_BASE", "5"))  # Seconds before the first retry of a failed results post, doubling after
+RESULTS_RETRY_MAX = float(os.environ.get("RESULTS_RETRY_MAX", "900"))  # Longest wait between retries
+RESULTS_MAX_ATTEMPTS = int(os.environ.get("RESULTS_MAX_ATTEMPTS", "10"))  # Results are dropped (and logged) after this many failed posts
+ROSTER_PAGE_SIZE = 20  # Attendees per roster page (shift message, shift log and the page buttons)
+partition = Partition.from_env()  # Guilds on this process's shards (SHARD_COUNT/SHARD_IDS); all of them by default
+# Each shard process journals its own guilds, in a directory of its own
+shift_journal_path = os.path.join(SHIFT_JOURNAL_DIR, partition.name) if SHIFT_JOURNAL_DIR and partition.name else SHIFT_JOURNAL_DIR
+journal = ShiftJournal(shift_journal_path) if shift_journal_path else None  # Every state transition, in order
+store = ShiftStore(SHIFT_DB_PATH, flush_interval=SHIFT_FLUSH_INTERVAL, journal=journal,
+                   partition=partition)  # Snapshot of active_shifts/grace_periods, opened in cog_load
+grace_scheduler = DeadlineScheduler()  # One task for every grace deadline, keyed by (user_id, shift_id)
+guild_settings = {}  # {guild_id: settings dict} of guilds that changed a default, loaded in cog_load
+permissions = RolePermissions(high_ranks_role)  # Manager role IDs per guild, loaded in cog_load
+outbox = Outbox(
+    store,
+    digest_seconds=lambda guild_id: get_guild_settings(guild_id)["digest_seconds"],
+    on_done=lambda item: results_sent(item["shift_id"]),
+    base_delay=RESULTS_RETRY_BASE, max_delay=RESULTS_RETRY_MAX, max_attempts=RESULTS_MAX_ATTEMPTS
+)  # Shift results waiting to be posted
+history_reader = StoreReader(store)  # Roster pages of shifts ended before a restart
+
+# =========================
+# METRICS
+# =========================
+handler_seconds = metrics.Histogram("clockin_handler_seconds", "Time spent in clock-in handlers", ("handler",))
+outbound_requests = metrics.Counter("clockin_outbound_requests_total", "Discord REST calls made by the clock-in cog", ("kind",))
+outbound_failures = metrics.Counter("clockin_outbound_failures_total", "Discord REST calls that raised", ("kind",))
+# Bound once here so recording is just an add
+voice_state_seconds = handler_seconds.labels("on_voice_state_update")
+update_embed_seconds = handler_seconds.labels("update_embed")
+end_shift_seconds = handler_seconds.labels("end_shift")
+shift_log_seconds = handler_seconds.labels("send_shift_log")
+button_seconds = {action: handler_seconds.labels(f"button_{action}") for action in ("join", "leave", "finish", "edit", "delete", "page")}
+edits_sent = outbound_requests.labels("edit")
+deletes_sent = outbound_requests.labels("delete")
+messages_sent = outbound_requests.labels("send")
+dms_sent = outbound_requests.labels("dm")
+edit_failures = outbound_failures.labels("edit")
+send_failures = outbound_failures.labels("send")
+dm_failures = outbound_failures.labels("dm")
+metrics.Gauge("clockin_active_shifts", "Shifts that have not ended",
+              lambda: sum(1 for shift in active_shifts.values() if not shift.ended))
+metrics.Gauge("clockin_attendees", "Attendees registered in shifts that have not ended",
+              lambda: sum(len(shift.attendees) for shift in active_shifts.values() if not shift.ended))
+metrics.Gauge("clockin_pending_results", "Shift results queued or waiting on a retry", lambda: len(outbox))
+metrics.Gauge("clockin_pending_grace_periods", "Attendees out of voice and waiting on a grace deadline",
+              lambda: len(grace_periods))
 
 # =========================
 # HELPER FUNCTIONS
@@ -30,17 +100,26 @@ def round_attendance(fraction):
         return 0.0
 
 def calculate_attendance_from_sessions(sessions, shift_start, shift_end):
+    # Times in epoch seconds; an open session (end None) runs to shift_end
     total_present_seconds = 0
     if shift_end < shift_start:
-        shift_end = shift_start + datetime.timedelta(seconds=1)
+        shift_end = shift_start + 1
     for start, end in sessions:
         ses_start = max(start, shift_start)
         ses_end = end if end else shift_end
         ses_end = min(ses_end, shift_end)
         if ses_start > ses_end:
             continue
-        total_present_seconds += max(0, (ses_end - ses_start).total_seconds())
-    shift_duration_seconds = (shift_end - shift_start).total_seconds()
+        total_present_seconds += max(0, ses_end - ses_start)
+    return attendance_from_seconds(total_present_seconds, shift_end - shift_start)
+
+def calculate_attendance(attendee, shift_start, shift_end):
+    # Equivalent of calculate_attendance_from_sessions, read from the running totals
+    if shift_end < shift_start:
+        shift_end = shift_start + 1
+    return attendance_from_seconds(attendee_present_seconds(attendee, shift_start, shift_end), shift_end - shift_start)
+
+def attendance_from_seconds(total_present_seconds, shift_duration_seconds):
     if shift_duration_seconds <= 0:
         shift_duration_seconds = 1
     if total_present_seconds > shift_duration_seconds:
@@ -48,6 +127,61 @@ def calculate_attendance_from_sessions(sessions, shift_start, shift_end):
     fraction = total_present_seconds / shift_duration_seconds
     return round_attendance(fraction)
 
+def score_attendees(shift, shift_end):
+    # [(user_id, present_seconds, attendance)] in roster order; big shifts are scored in one NumPy pass
+    shift_start = shift.start
+    if shift_end < shift_start:
+        shift_end = shift_start + 1
+    attendees = shift.attendees
+    if len(attendees) >= scoring.SCORING_BATCH_MIN:
+        batch = scoring.score_batch(attendees.values(), shift_start, shift_end)
+        if batch is not None:
+            return list(zip(attendees, *batch))
+    results = []
+    for uid, attendee in attendees.items():
+        present = attendee_present_seconds(attendee, shift_start, shift_end)
+        results.append((uid, present, attendance_from_seconds(present, shift_end - shift_start)))
+    return results
+
+def index_shift(shift):
+    voice_index.setdefault(shift.voice, set()).add(shift.shift_id)
+
+def unindex_shift(shift):
+    sids = voice_index.get(shift.voice)
+    if sids is None:
+        return
+    sids.discard(shift.shift_id)
+    if not sids:
+        del voice_index[shift.voice]
+
+# ==== ATTENDEE SESSIONS ====
+# Each attendee keeps the seconds of its closed sessions in present_seconds
+# and the start of its open session (if any) in open_since, so totals never
+# need a walk over its spans (kept for the record of who was there when).
+def new_attendee(now):
+    return Attendee(join=now, open_since=now)
+
+def open_session(attendee, at):
+    if attendee.open_since is not None:
+        return
+    attendee.open_since = at
+
+def close_session(shift, attendee, at):
+    start = attendee.open_since
+    if start is None:
+        return
+    attendee.open_since = None
+    attendee.spans.append(start)
+    attendee.spans.append(at)
+    attendee.present_seconds += max(0, at - max(start, shift.start))
+
+def attendee_present_seconds(attendee, shift_start, until):
+    total = attendee.present_seconds
+    start = attendee.open_since
+    if start is not None:
+        total += max(0, until - max(start, shift_start))
+    return total
+
 def format_time_delta(delta):
     total_seconds = int(max(0, delta.total_seconds()))
     hours = total_seconds // 3600
@@ -56,6 +190,108 @@ def format_time_delta(delta):
         return f"{hours}h {minutes}m"
     return f"{minutes}m"
 
+# ==== ROSTER PAGES ====
+def page_count(total):
+    return max(1, -(-total // ROSTER_PAGE_SIZE))
+
+def resolve_page(page, total):
+    # Negative pages count from the end (-1 is the last one)
+    pages = page_count(total)
+    if page < 0:
+        page += pages
+    return min(max(page, 0), pages - 1)
+
+def display_name(bot, user_id):
+    member = safe_get_user(bot, user_id)
+    if member:
+        return getattr(member, "display_name", getattr(member, "name", f"User {user_id}"))
+    return f"User {user_id}"
+
+def roster_line(name, attendance, passed):
+    return f"{'✅' if passed else '❌'} {name} ({attendance*100:.0f}%)"
+
+def roster_page_lines(shift, page, bot):
+    # Only the attendees on this page are looked up and scored
+    lines = []
+    now = epoch_now()
+    for uid in shift.roster[page * ROSTER_PAGE_SIZE:(page + 1) * ROSTER_PAGE_SIZE]:
+        attendee = shift.attendees[uid]
+        name = display_name(bot, uid)
+        if shift.ended:
+            attendance = calculate_attendance(attendee, shift.start, shift.end_time)
+            lines.append(roster_line(name, attendance, attendance >= shift.min_attendance))
+            continue
+        # Red if they left (button or voice) or are in a grace period
+        in_grace = (uid in grace_periods) and (grace_periods[uid]["shift_id"] == shift.shift_id)
+        if in_grace or attendee.leave is not None:
+            status_emoji = "🔴"
+            until = attendee.leave or now
+        else:
+            status_emoji = "🟢"
+            until = now
+        total_present_seconds = attendee_present_seconds(attendee, shift.start, until)
+        time_present = format_time_delta(datetime.timedelta(seconds=total_present_seconds))
+        lines.append(f"{status_emoji} {name} ({time_present})")
+    return lines
+
+def fit_field(text, limit=1024):
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+async def load_history_page(shift_id, page):
+    # Only for ended shifts, which leave active_shifts: fresh, since one that just ended may not be written yet
+    return await history_reader.query(
+        store.load_history_page, shift_id, page * ROSTER_PAGE_SIZE, ROSTER_PAGE_SIZE)
+
+async def build_roster_page(shift_id, page, bot):
+    """(embed, view) for one roster page, or None if the shift is gone."""
+    shift = active_shifts.get(shift_id)
+    if shift is not None:
+        total = len(shift.roster)
+        page = resolve_page(page, total)
+        title = shift.title
+        lines = roster_page_lines(shift, page, bot)
+        color = discord.Color.red() if shift.ended else discord.Color.green()
+    else:
+        # Ended (and evicted): the page comes from the history table
+        found = await load_history_page(shift_id, max(page, 0))
+        if found is None:
+            return None
+        title, total, rows = found
+        resolved = resolve_page(page, total)
+        if resolved != page:
+            # Counted from the end or past it: read the page it resolves to
+            title, total, rows = await load_history_page(shift_id, resolved)
+            page = resolved
+        lines = [roster_line(display_name(bot, uid), attendance, passed) for uid, attendance, passed in rows]
+        color = discord.Color.red()
+    embed = discord.Embed(
+        title=f"👥 Roster: {title}",
+        description=fit_field("\n".join(lines) if lines else "—", 4096),
+        color=color
+    )
+    pages = page_count(total)
+    embed.set_footer(text=f"Page {page + 1}/{pages} · {total} attendee{'s' if total != 1 else ''}")
+    return embed, RosterView(shift_id, page, pages)
+
+# ==== NAME INDEX ====
+def shift_name_index(shift, bot):
+    # Built from the member cache the first time a shift is searched, then
+    # kept up to date by joins and removals instead of being rebuilt
+    index = name_indexes.get(shift.shift_id)
+    if index is None:
+        index = NameIndex()
+        guild = bot.get_guild(shift.guild_id)
+        for uid in shift.roster:
+            member = safe_get_member(guild, uid)
+            index.add(uid, member.display_name if member else display_name(bot, uid))
+        name_indexes[shift.shift_id] = index
+    return index
+
+def index_attendee_name(shift, member):
+    index = name_indexes.get(shift.shift_id)
+    if index is not None:
+        index.add(member.id, getattr(member, "display_name", None) or f"User {member.id}")
+
 # ==== DEFENSIVE UTILS ====
 def safe_get_member(guild, user_id):
     # Try to get a Member, fallback to User if can't
@@ -76,6 +312,33 @@ def safe_get_user(bot, user_id):
         user = None
     return user
 
+def can_manage_shift(user, shift):
+    # Host of the shift, or anyone with a manager role
+    if getattr(user, "id", None) == shift.host:
+        return True
+    return permissions.is_manager(user)
+
+def get_guild_settings(guild_id):
+    return guild_settings.get(guild_id) or GUILD_SETTINGS
+
+def update_guild_settings(guild_id, **changes):
+    # Config change: takes effect now, the row is written by the next flush
+    settings = dict(get_guild_settings(guild_id))
+    settings.update(changes)
+    guild_settings[guild_id] = settings
+    store.save_guild_settings(guild_id, settings)
+    return settings
+
+def set_manager_roles(guild_id, role_ids):
+    # role_ids None resets the guild to the default role name; an empty set means no managers
+    if role_ids is None:
+        permissions.reset(guild_id)  # Invalidates the guild's cached role IDs
+        update_guild_settings(guild_id, manager_roles=[], managers_configured=False)
+        return None
+    role_ids = permissions.set_roles(guild_id, role_ids)
+    update_guild_settings(guild_id, manager_roles=sorted(role_ids), managers_configured=True)
+    return role_ids
+
 def can_edit_message(msg):
     try:
         return hasattr(msg, "guild") and msg.guild is not None and msg.channel.permissions_for(msg.guild.me).manage_messages
@@ -86,16 +349,44 @@ def ensure_embed_fields(embed, shift, bot):
     # Always at least these fields
     if len(embed.fields) < 5:
         embed.clear_fields()
-        host = safe_get_user(bot, shift["host"])
-        host_mention = host.mention if getattr(host,"mention",None) else f"<@{shift['host']}>"
-        vchan = bot.get_channel(shift["voice"])
+        host = safe_get_user(bot, shift.host)
+        host_mention = host.mention if getattr(host,"mention",None) else f"<@{shift.host}>"
+        vchan = bot.get_channel(shift.voice)
         vname = vchan.mention if vchan else "Unknown"
         embed.add_field(name="👤 Host", value=host_mention, inline=True)
         embed.add_field(name="⏱️ Elapsed Time", value="0m", inline=True)
         embed.add_field(name="🎙️ Voice Channel", value=vname, inline=True)
-        embed.add_field(name="📅 Start", value=f"<t:{int(shift['start'].timestamp())}:R>", inline=True)
+        embed.add_field(name="📅 Start", value=f"<t:{int(shift.start)}:R>", inline=True)
         embed.add_field(name="👥 Present (0)", value="—", inline=False)
 
+def build_shift_embed(shift, bot):
+    # Fresh embed for a shift recovered from the store (the original one died with the old process)
+    embed = discord.Embed(
+        title=f"🟢 {shift.title}",
+        description="**Active Clock-in Shift**\nUse the button to count your attendance.",
+        color=discord.Color.green(),
+        timestamp=from_epoch(shift.start)
+    )
+    host = safe_get_user(bot, shift.host)
+    if host:
+        embed.set_author(
+            name=f"Host: {getattr(host, 'display_name', None) or getattr(host, 'name', shift.host)}",
+            icon_url=host.display_avatar.url if getattr(host, "display_avatar", None) else None
+        )
+    ensure_embed_fields(embed, shift, bot)
+    embed.set_footer(text="Click ✅ Join to register for the shift")
+    return embed
+
+def get_shift_message(shift, bot):
+    # Reattach the shift message lazily by channel and message ID after a restart
+    msg = shift.message
+    if msg is None and shift.message_id:
+        channel = bot.get_channel(shift.channel_id)
+        if channel is not None:
+            msg = channel.get_partial_message(shift.message_id)
+            shift.message = msg
+    return msg
+
 # =========================
 # COG & SLASH COMMAND
 # =========================
@@ -103,65 +394,133 @@ class ClockInCreate(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        # Open the store and bring back every shift that was running before the restart
+        try:
+            await asyncio.to_thread(store.open)
+            shifts, graces = await asyncio.to_thread(store.load_open_shifts)
+            snapshot_seq = await asyncio.to_thread(store.load_journal_seq)
+            guild_settings.update(await asyncio.to_thread(store.load_guild_settings))
+            permissions.load({
+                gid: settings["manager_roles"] if settings["managers_configured"] else None
+                for gid, settings in guild_settings.items()
+            })
+            undelivered = await asyncio.to_thread(store.load_outbox)
+            if journal is not None:
+                await asyncio.to_thread(journal.open)
+                journal.last_seq = max(journal.last_seq, snapshot_seq)
+        except Exception as e:
+            # Fail the extension load: running without the store, scheduler and outbox would lose every shift
+            raise RuntimeError(f"could not load shifts from {SHIFT_DB_PATH}: {e}") from e
+        for sid, shift in shifts.items():
+            active_shifts[sid] = shift
+            index_shift(shift)
+        for user_id, sid, left_at in graces:
+            start_grace(user_id, shifts[sid], left_at)
+        outbox.load(undelivered)  # Before the replay, which may queue or settle results
+        replayed = 0
+        if journal is not None:
+            # The snapshot holds everything up to snapshot_seq; only the tail is replayed
+            journal.replaying = True
+            try:
+                for record in journal.replay(snapshot_seq):
+                    apply_journal_record(record)
+                    replayed += 1
+            except Exception as e:
+                log.exception("Journal replay stopped early: %s", e)
+            finally:
+                journal.replaying = False
+            journal.start()
+        # Grace expiry and result delivery wait for on_ready: a deadline that passed while the
+        # bot was down must be decided from the real voice channel members, and neither guilds
+        # nor channels are cached until READY
+        store.start()
+        try:
+            await metrics.start_server()
+        except OSError as e:
+            log.warning("Could not start the metrics endpoint: %s", e)
+        recovered = sum(1 for shift in active_shifts.values() if not shift.ended)
+        if recovered:
+            log.info("Recovered %d open shift(s) from %s (+%d journal records)", recovered, SHIFT_DB_PATH, replayed,
+                     extra={"shifts": recovered, "replayed": replayed})
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.reconcile_voice_states()
+        # Both are no-ops after the first READY
+        grace_scheduler.start(lambda keys: expire_grace_periods(keys, self.bot))
+        outbox.start(lambda guild_id, items: deliver_results(self.bot, guild_id, items))
+
+    @commands.Cog.listener()
+    async def on_resumed(self):
+        self.reconcile_voice_states()
+
+    def reconcile_voice_states(self):
+        # Voice events missed while disconnected (or while the bot was down) are
+        # synthesized here from one read of each shift's voice channel members
+        try:
+            now = epoch_now()
+            for sid, shift in list(active_shifts.items()):
+                if shift.ended:
+                    continue
+                channel = self.bot.get_channel(shift.voice)
+                if channel is None:
+                    continue
+                present = {m.id for m in getattr(channel, "members", []) if not m.bot}
+                changed = False
+                for uid, attendee in list(shift.attendees.items()):
+                    grace = grace_periods.get(uid)
+                    if uid in present:
+                        if grace is not None and grace["shift_id"] == sid:
+                            attendee_voice_returned(shift, uid, now)
+                            changed = True
+                    elif attendee.open_since is not None and grace is None:
+                        attendee_voice_left(shift, uid, now)
+                        changed = True
+                if changed:
+                    schedule_embed_update(shift, self.bot)
+        except Exception:
+            log.exception("Voice state reconciliation failed")
+
     def has_brotato_role(self, member: discord.Member):
-        return any(r.name.lower() == high_ranks_role.lower() for r in getattr(member, "roles", []))
+        return permissions.is_manager(member)
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
+        # Timed inline rather than with metrics.timed: this is the hottest path
+        started = time.perf_counter()
         try:
             if member.bot:
                 return
 
-            # Clear up ghosted/ended shifts
-            for sid, shift in list(active_shifts.items()):
-                if shift.get("ended", False) and sid in active_shifts:
-                    # Defensive prune
-                    continue
+            # Mute/deafen/stream toggles keep the same channel: nothing to track
+            before_id = before.channel.id if before and before.channel else None
+            after_id = after.channel.id if after and after.channel else None
+            if before_id == after_id:
+                return
 
             # User left a tracked shift voice channel
-            if before and before.channel:
-                for sid, shift in list(active_shifts.items()):
-                    if shift.get("ended"):
+            if before_id is not None and member.id not in grace_periods:
+                for sid in voice_index.get(before_id, ()):
+                    shift = active_shifts.get(sid)
+                    if shift is None or shift.ended or member.id not in shift.attendees:
                         continue
-                    if before.channel.id == shift["voice"] and member.id in shift["attendees"]:
-                        if member.id not in grace_periods:
-                            left_at = datetime.datetime.utcnow()
-                            task = asyncio.create_task(grace_period_task(member.id, sid, self.bot))
-                            grace_periods[member.id] = {
-                                "shift_id": sid,
-                                "left_at": left_at,
-                                "task": task
-                            }
-                            attendee = shift["attendees"].get(member.id)
-                            now = left_at
-                            if attendee is not None:
-                                if attendee["sessions"] and attendee["sessions"][-1][1] is None:
-                                    attendee["sessions"][-1] = (attendee["sessions"][-1][0], now)
-                                attendee["leave"] = now
-                            await update_embed(shift, self.bot)
+                    attendee_voice_left(shift, member.id, epoch_now())
+                    schedule_embed_update(shift, self.bot)
+                    break
 
             # User returned to a tracked shift voice channel
-            if after and after.channel:
+            if after_id is not None:
                 if member.id in grace_periods:
                     ginfo = grace_periods[member.id]
                     shift = active_shifts.get(ginfo["shift_id"])
-                    if shift and after.channel.id == shift["voice"]:
-                        try:
-                            ginfo["task"].cancel()
-                        except Exception:
-                            pass
-                        del grace_periods[member.id]
-                        attendee = shift["attendees"].get(member.id)
-                        if attendee is not None:
-                            attendee["leave"] = None
-                            if attendee["sessions"]:
-                                if attendee["sessions"][-1][1] is not None:
-                                    attendee["sessions"].append((datetime.datetime.utcnow(), None))
-                            else:
-                                attendee["sessions"] = [(datetime.datetime.utcnow(), None)]
-                        await update_embed(shift, self.bot)
+                    if shift and after_id == shift.voice:
+                        attendee_voice_returned(shift, member.id, epoch_now())
+                        schedule_embed_update(shift, self.bot)
         except Exception:
-            traceback.print_exc()
+            log.exception("on_voice_state_update failed", extra={"user": member.id, "guild": getattr(member.guild, "id", None)})
+        finally:
+            voice_state_seconds.observe(time.perf_counter() - started)
 
     @app_commands.command(
         name="clockincreate",
@@ -170,14 +529,16 @@ class ClockInCreate(commands.Cog):
     @app_commands.describe(
         title="Shift name",
         voice="Voice channel to monitor",
-        min_attendance="Minimum presence ratio to pass (0.25 = 25%)"
+        min_attendance="Minimum presence ratio to pass (0.25 = 25%)",
+        grace_minutes="Minutes someone may be out of the voice channel before being clocked out"
     )
     async def clockincreate_slash(
         self,
         interaction: Interaction,
         title: str,
         voice: discord.VoiceChannel,
-        min_attendance: float = 0.25
+        min_attendance: float = 0.25,
+        grace_minutes: float = GRACE_PERIOD_SECONDS / 60
     ):
         try:
             if not isinstance(interaction.user, discord.Member):
@@ -185,11 +546,11 @@ class ClockInCreate(commands.Cog):
                 return
             if not self.has_brotato_role(interaction.user):
                 await interaction.response.send_message(
-                    f"❌ Only members with role `{high_ranks_role}` can create clock-ins.",
+                    f"❌ Only members with role {permissions.describe(interaction.guild)} can create clock-ins.",
                     ephemeral=True)
                 return
 
-            now = datetime.datetime.utcnow()
+            now = epoch_now()
             host = interaction.user
             shift_id = f"{interaction.guild_id}-{interaction.id}"
 
@@ -197,7 +558,7 @@ class ClockInCreate(commands.Cog):
                 title=f"🟢 {title}",
                 description="**Active Clock-in Shift**\nUse the button to count your attendance.",
                 color=discord.Color.green(),
-                timestamp=now
+                timestamp=from_epoch(now)
             )
             embed.set_author(
                 name=f"Host: {host.display_name}",
@@ -206,58 +567,163 @@ class ClockInCreate(commands.Cog):
             embed.add_field(name="👤 Host", value=host.mention, inline=True)
             embed.add_field(name="⏱️ Elapsed Time", value="0m", inline=True)
             embed.add_field(name="🎙️ Voice Channel", value=voice.mention, inline=True)
-            embed.add_field(name="📅 Start", value=f"<t:{int(now.timestamp())}:R>", inline=True)
+            embed.add_field(name="📅 Start", value=f"<t:{int(now)}:R>", inline=True)
             embed.add_field(name="👥 Present ({})".format(0), value="—", inline=False)
             embed.set_footer(text="Click ✅ Join to register for the shift")
 
             view = ClockInView(shift_id, self.bot)
             await interaction.response.send_message(embed=embed, view=view)
             msg = await interaction.original_response()
-
-            active_shifts[shift_id] = {
-                "host": host.id,
-                "title": title,
-                "min_attendance": min_attendance,
-                "voice": voice.id,
-                "guild_id": interaction.guild_id,
-                "start": now,
-                "attendees": {},
-                "embed": embed,
-                "message": msg,
-                "ended": False,
-                "shift_id": shift_id
-            }
+            get_render_state(shift_id)["paged"] = False
+
+            shift_opened(Shift(
+                shift_id=shift_id,
+                guild_id=interaction.guild_id,
+                host=host.id,
+                title=title,
+                min_attendance=min_attendance,
+                grace_seconds=max(0.0, grace_minutes) * 60,
+                voice=voice.id,
+                start=now,
+                channel_id=msg.channel.id,
+                message_id=msg.id,
+                embed=embed,
+                message=msg
+            ))
         except Exception as e:
-            traceback.print_exc()
+            log.exception("Failed to create clock-in shift", extra={"guild": interaction.guild_id, "user": interaction.user.id})
             await interaction.response.send_message(f"❌ Failed to create clock-in shift: {e}", ephemeral=True)
 
+    async def drain(self):
+        # Shutdown: persist all shift state first, then render every pending embed edit.
+        # Shielded, since the pipeline's deadline may cancel this step: a cancelled flush
+        # would release the store's lock while its worker thread is still writing
+        await asyncio.shield(store.flush())  # Flushes the journal first
+        pending = [
+            active_shifts[sid] for sid, state in render_states.items()
+            if (state["dirty"] or state["task"] is not None) and sid in active_shifts
+        ]
+        results = await asyncio.gather(*(flush_embed(shift, self.bot) for shift in pending), return_exceptions=True)
+        for shift, result in zip(pending, results):
+            if isinstance(result, Exception):
+                log.warning("Could not flush embed on shutdown: %s", result, extra={"shift": shift.shift_id})
+        await asyncio.shield(store.flush())  # Anything marked while the renders were awaited
+
     async def cog_unload(self):
+        history_reader.close()
+        outbox.stop()  # Undelivered results are written by the store's last flush and sent after the restart
+        try:
+            if journal is not None:
+                await journal.close()
+            await store.close()
+        except Exception as e:
+            log.warning("Could not close shift store: %s", e)
+        grace_scheduler.stop()
+        await metrics.stop_server()
+        try:
+            self.bot.remove_dynamic_items(ClockInButton, RosterPageButton)
+        except Exception as e:
+            log.warning("Could not remove clock-in buttons: %s", e)
         tree = getattr(self.bot, "tree", None)
         if tree:
             try:
                 tree.remove_command("clockincreate", type=discord.AppCommandType.chat_input)
             except Exception as e:
-                print(f"[ClockInCreate] Could not remove /clockincreate: {e}")
+                log.warning("Could not remove /clockincreate: %s", e)
 
 # =========================
 # BUTTON VIEW
 # =========================
+# Custom IDs look like "clockin:<action>:<shift_id>" (and "clockin:page:
+# <shift_id>:<page>" for the roster pages), so one registered DynamicItem
+# serves the buttons of every shift, including those posted before a
+# restart, without keeping a View object per shift in memory.
+CLOCKIN_BUTTONS = {
+    "join": ("Join", discord.ButtonStyle.success, "✅"),
+    "leave": ("Leave", discord.ButtonStyle.secondary, "❌"),
+    "finish": ("Finish", discord.ButtonStyle.danger, "⛔"),
+    "edit": ("Edit", discord.ButtonStyle.primary, "🛠️"),
+    "delete": ("Delete", discord.ButtonStyle.danger, "🗑️")
+}
+
 class ClockInView(View):
-    def __init__(self, shift_id, bot):
-        super().__init__(timeout=24*60*60)  # Force 1 day for safety instead of None
+    def __init__(self, shift_id, bot, paged=False):
+        super().__init__(timeout=None)
+        for action in CLOCKIN_BUTTONS:
+            self.add_item(ClockInButton(action, shift_id, bot))
+        if paged:
+            # Only once the roster outgrows the embed, which shows the first page
+            add_roster_entry(self, shift_id, first=1)
+
+def add_roster_entry(view, shift_id, first):
+    # Prev opens the last roster page, Next opens page `first`
+    view.add_item(RosterPageButton(shift_id, -1, "prev"))
+    view.add_item(RosterPageButton(shift_id, first, "next"))
+    return view
+
+class RosterView(View):
+    # Prev/Next around one roster page
+    def __init__(self, shift_id, page, pages):
+        super().__init__(timeout=None)
+        self.add_item(RosterPageButton(shift_id, page - 1, "prev", disabled=page <= 0))
+        self.add_item(RosterPageButton(shift_id, page + 1, "next", disabled=page >= pages - 1))
+
+class RosterPageButton(discord.ui.DynamicItem[Button], template=r"clockin:page:(?P<shift_id>[0-9]+-[0-9]+):(?P<page>-?[0-9]+)"):
+    # The target page is in the custom ID, so any number of viewers can page independently
+    def __init__(self, shift_id, page, direction, disabled=False):
+        super().__init__(Button(
+            label="Prev" if direction == "prev" else "Next", emoji="◀" if direction == "prev" else "▶",
+            style=discord.ButtonStyle.secondary, custom_id=f"clockin:page:{shift_id}:{page}", disabled=disabled, row=1
+        ))
+        self.shift_id = shift_id
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: Interaction, item: Button, match):
+        page = int(match["page"])
+        return cls(match["shift_id"], page, "prev" if item.label == "Prev" else "next")
+
+    async def callback(self, interaction: Interaction):
+        with button_seconds["page"].time():
+            try:
+                rendered = await build_roster_page(self.shift_id, self.page, interaction.client)
+                if rendered is None:
+                    await interaction.response.send_message("❌ This shift was not found.", ephemeral=True)
+                    return
+                embed, view = rendered
+                flags = getattr(interaction.message, "flags", None)
+                if getattr(flags, "ephemeral", False):
+                    # Paging inside a roster already opened by this user
+                    await interaction.response.edit_message(embed=embed, view=view)
+                else:
+                    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+            except Exception:
+                log.exception("Roster page failed", extra={"shift": self.shift_id, "user": interaction.user.id})
+                await interaction.response.send_message("❌ Could not load that page.", ephemeral=True)
+
+class ClockInButton(discord.ui.DynamicItem[Button], template=r"clockin:(?P<action>join|leave|finish|edit|delete):(?P<shift_id>[0-9]+-[0-9]+)"):
+    def __init__(self, action, shift_id, bot=None):
+        label, style, emoji = CLOCKIN_BUTTONS[action]
+        super().__init__(Button(label=label, style=style, emoji=emoji, custom_id=f"clockin:{action}:{shift_id}"))
+        self.action = action
         self.shift_id = shift_id
         self.bot = bot
 
+    @classmethod
+    async def from_custom_id(cls, interaction: Interaction, item: Button, match):
+        return cls(match["action"], match["shift_id"], interaction.client)
+
+    async def callback(self, interaction: Interaction):
+        with button_seconds[self.action].time():
+            await getattr(self, self.action)(interaction)
+
     def has_permission(self, user: discord.Member, shift) -> bool:
-        if getattr(user, "id", None) == shift["host"]:
-            return True
-        return any(getattr(role, "name", "").lower() == high_ranks_role.lower() for role in getattr(user, "roles", []))
+        return can_manage_shift(user, shift)
 
-    @discord.ui.button(label="Join", style=discord.ButtonStyle.success, emoji="✅")
-    async def join(self, interaction: Interaction, button: Button):
+    async def join(self, interaction: Interaction):
         try:
             shift = active_shifts.get(self.shift_id)
-            if not shift or shift["ended"]:
+            if not shift or shift.ended:
                 await interaction.response.send_message("❌ This shift has already ended.", ephemeral=True)
                 return
 
@@ -265,76 +731,49 @@ class ClockInView(View):
             if not isinstance(user, discord.Member):
                 await interaction.response.send_message("❌ Error finding server member.", ephemeral=True)
                 return
-            voice_channel = self.bot.get_channel(shift["voice"])
+            voice_channel = self.bot.get_channel(shift.voice)
             if not voice_channel:
                 await interaction.response.send_message("❌ Voice channel not found.", ephemeral=True)
                 return
 
-            if user.voice is None or user.voice.channel.id != shift["voice"]:
+            if user.voice is None or user.voice.channel.id != shift.voice:
                 await interaction.response.send_message(
                     f"❌ You need to be in {voice_channel.mention} to join the shift.", ephemeral=True)
                 return
 
-            if user.id in shift["attendees"]:
+            if user.id in shift.attendees:
                 await interaction.response.send_message("⚠️ You are already registered in the shift.", ephemeral=True)
                 return
 
-            if user.id in grace_periods:
-                try:
-                    grace_periods[user.id]["task"].cancel()
-                except Exception:
-                    pass
-                del grace_periods[user.id]
-
-            now = datetime.datetime.utcnow()
-            shift["attendees"][user.id] = {
-                "join": now,
-                "leave": None,
-                "sessions": [(now, None)]
-            }
-            await update_embed(shift, self.bot)
+            attendee_joined(shift, user.id, epoch_now())
+            index_attendee_name(shift, user)
+            schedule_embed_update(shift, self.bot)
             await interaction.response.send_message("✅ Registered in the shift!", ephemeral=True)
         except Exception:
-            traceback.print_exc()
+            log.exception("Join button failed", extra={"shift": self.shift_id, "user": interaction.user.id})
             await interaction.response.send_message("❌ Error while joining shift. Try again later.", ephemeral=True)
 
-    @discord.ui.button(label="Leave", style=discord.ButtonStyle.secondary, emoji="❌")
-    async def leave(self, interaction: Interaction, button: Button):
+    async def leave(self, interaction: Interaction):
         try:
             shift = active_shifts.get(self.shift_id)
-            if not shift or shift["ended"]:
+            if not shift or shift.ended:
                 await interaction.response.send_message("❌ This shift has already ended.", ephemeral=True)
                 return
 
             user = interaction.user
-            attendee = shift["attendees"].get(user.id)
+            attendee = shift.attendees.get(user.id)
             if attendee is None:
                 await interaction.response.send_message("❌ You were not part of this shift.", ephemeral=True)
                 return
 
-            now = datetime.datetime.utcnow()
-            if user.id in grace_periods:
-                info = grace_periods[user.id]
-                task = info.get("task")
-                if task:
-                    try:
-                        task.cancel()
-                    except Exception:
-                        pass
-                del grace_periods[user.id]
-
-            if attendee["sessions"] and attendee["sessions"][-1][1] is None:
-                attendee["sessions"][-1] = (attendee["sessions"][-1][0], now)
-            attendee["leave"] = now
-
-            await update_embed(shift, self.bot)
+            attendee_left(shift, user.id, epoch_now())
+            schedule_embed_update(shift, self.bot)
             await interaction.response.send_message("❌ You left the shift.", ephemeral=True)
         except Exception:
-            traceback.print_exc()
+            log.exception("Leave button failed", extra={"shift": self.shift_id, "user": interaction.user.id})
             await interaction.response.send_message("❌ Error while leaving shift. Try again later.", ephemeral=True)
 
-    @discord.ui.button(label="Finish", style=discord.ButtonStyle.danger, emoji="⛔", custom_id=None)
-    async def finish(self, interaction: Interaction, button: Button):
+    async def finish(self, interaction: Interaction):
         shift = active_shifts.get(self.shift_id)
         try:
             if not shift:
@@ -347,48 +786,30 @@ class ClockInView(View):
             if not self.has_permission(user, shift):
                 await interaction.response.send_message("❌ No permission to end this shift.", ephemeral=True)
                 return
-            if shift.get("ended", False):
+            if shift.ended:
                 await interaction.response.send_message("⛔ This shift is already ended.", ephemeral=True)
                 try:
                     if hasattr(interaction, "message") and can_edit_message(interaction.message):
+                        edits_sent.inc()
                         await interaction.message.edit(view=None)
                 except Exception as e:
-                    print(f"[WARN] Failed to remove shift view after already ended: {e}")
+                    log.warning("Failed to remove shift view after already ended: %s", e, extra={"shift": self.shift_id})
                 return
 
-            # --- CRITICAL DEFENSIVE BLOCK: Clean up all grace periods for this shift ---
-            for user_id, info in list(grace_periods.items()):
-                if info["shift_id"] == shift["shift_id"]:
-                    attendee = shift["attendees"].get(user_id)
-                    left_at = info.get("left_at", shift.get("end_time") or datetime.datetime.utcnow())
-                    if attendee:
-                        if attendee["sessions"] and (attendee["sessions"][-1][1] is None):
-                            attendee["sessions"][-1] = (attendee["sessions"][-1][0], left_at)
-                        if not attendee.get("leave") or (attendee.get("leave") and left_at < attendee["leave"]):
-                            attendee["leave"] = left_at
-                    tsk = info.get("task")
-                    if tsk:
-                        try:
-                            tsk.cancel()
-                        except Exception:
-                            pass
-                    del grace_periods[user_id]
-
+            # Grace periods of this shift are closed out by end_shift (shift_finished)
             await end_shift(shift, self.bot)
             await interaction.response.send_message("⛔ Shift finished! Attendance and results have been calculated.", ephemeral=True)
         except Exception as e:
-            print(f"[ERROR] finish button exception: {e}")
-            traceback.print_exc()
+            log.exception("Finish button failed", extra={"shift": self.shift_id, "user": interaction.user.id})
             try:
                 await interaction.response.send_message(f"❌ Error ending shift: {e}", ephemeral=True)
             except Exception as e2:
-                print(f"[ERROR] Also failed sending error: {e2}")
+                log.error("Also failed sending error: %s", e2, extra={"shift": self.shift_id})
 
-    @discord.ui.button(label="Edit", style=discord.ButtonStyle.primary, emoji="🛠️")
-    async def edit(self, interaction: Interaction, button: Button):
+    async def edit(self, interaction: Interaction):
         shift = active_shifts.get(self.shift_id)
         try:
-            if not shift or shift["ended"]:
+            if not shift or shift.ended:
                 await interaction.response.send_message("❌ This shift has already ended.", ephemeral=True)
                 return
             user = interaction.user
@@ -399,52 +820,20 @@ class ClockInView(View):
                 await interaction.response.send_message("❌ No permission to edit this shift.", ephemeral=True)
                 return
 
-            options = []
-            for uid in shift["attendees"]:
-                member = interaction.guild.get_member(uid)
-                name = member.display_name if member else f"User {uid}"
-                options.append(discord.SelectOption(
-                    label=name,
-                    value=str(uid),
-                    description="Remove from shift"
-                ))
-
-            if not options:
+            if not shift.attendees:
                 await interaction.response.send_message("❌ No participants to edit.", ephemeral=True)
                 return
-
-            select = Select(
-                placeholder="Select a member to remove...",
-                options=options[:25]
-            )
-
-            async def select_callback(select_interaction: Interaction):
-                if not self.has_permission(select_interaction.user, shift):
-                    await select_interaction.response.send_message("❌ No permission.", ephemeral=True)
-                    return
-
-                removed_id = int(select.values[0])
-                if removed_id in shift["attendees"]:
-                    del shift["attendees"][removed_id]
-                    await update_embed(shift, self.bot)
-                    await select_interaction.response.send_message(f"✅ Removed <@{removed_id}> from the shift.", ephemeral=True)
-                else:
-                    await select_interaction.response.send_message("❌ Member not found in shift.", ephemeral=True)
-
-            select.callback = select_callback
-            new_view = View()
-            new_view.add_item(select)
+            # A Select holds only 25 options; the command searches every attendee by name
             await interaction.response.send_message(
-                "Select who to remove from the shift:",
-                view=new_view,
+                f"🛠️ To remove someone, use `/clockinremove`, pick **{shift.title}** as the shift "
+                "and start typing their name.",
                 ephemeral=True
             )
         except Exception:
-            traceback.print_exc()
+            log.exception("Edit button failed", extra={"shift": self.shift_id, "user": interaction.user.id})
             await interaction.response.send_message("❌ Error. Could not edit shift participants.", ephemeral=True)
 
-    @discord.ui.button(label="Delete", style=discord.ButtonStyle.danger, emoji="🗑️")
-    async def delete(self, interaction: Interaction, button: Button):
+    async def delete(self, interaction: Interaction):
         shift = active_shifts.get(self.shift_id)
         try:
             if not shift:
@@ -457,42 +846,288 @@ class ClockInView(View):
             if not self.has_permission(user, shift):
                 await interaction.response.send_message("❌ No permission to delete this shift.", ephemeral=True)
                 return
-            if self.shift_id in active_shifts:
-                del active_shifts[self.shift_id]
+            shift_deleted(self.shift_id)
             try:
                 if hasattr(interaction, "message") and can_edit_message(interaction.message):
+                    deletes_sent.inc()
                     await interaction.message.delete()
             except Exception as e:
-                print(f"[WARN] Could not delete shift message: {e}")
+                log.warning("Could not delete shift message: %s", e, extra={"shift": self.shift_id})
             await interaction.response.send_message("🗑️ Shift deleted.", ephemeral=True)
         except Exception:
-            traceback.print_exc()
+            log.exception("Delete button failed", extra={"shift": self.shift_id, "user": interaction.user.id})
             await interaction.response.send_message("❌ Error. Could not delete the shift.", ephemeral=True)
 
+# =========================
+# STATE TRANSITIONS
+# =========================
+# Every change to a shift goes through one of these. Each one updates the
+# in-memory state, marks the store and journals one record, and replaying
+# the journal calls the same functions, so a recovered shift goes through
+# exactly the steps the live one did.
+def record_event(kind, shift_id, **fields):
+    if journal is not None:
+        fields["e"] = kind
+        fields["sh"] = shift_id
+        journal.append(fields)
+
+def shift_opened(shift):
+    sid = shift.shift_id
+    active_shifts[sid] = shift
+    index_shift(shift)
+    store.save_shift(shift)
+    record_event(
+        "create", sid, host=shift.host, title=shift.title, min=shift.min_attendance,
+        grace=shift.grace_seconds, voice=shift.voice, guild=shift.guild_id,
+        ch=shift.channel_id, msg=shift.message_id, at=shift.start
+    )
+
+def shift_finished(shift, at):
+    shift.ended = True
+    shift.end_time = at
+    unindex_shift(shift)
+    name_indexes.pop(shift.shift_id, None)  # Nobody can be removed from an ended shift
+    for user_id in list(grace_periods.keys()):
+        if grace_periods[user_id]["shift_id"] == shift.shift_id:
+            attendee = shift.attendees.get(user_id)
+            left_at = grace_periods[user_id].get("left_at", at)
+            if attendee:
+                close_session(shift, attendee, left_at)
+                if not attendee.leave or (attendee.leave and left_at < attendee.leave):
+                    attendee.leave = left_at
+            cancel_grace(user_id)
+    for uid, attendee in shift.attendees.items():
+        if attendee.open_since is not None:
+            leave_at = attendee.leave or at
+            close_session(shift, attendee, min(leave_at, at))
+        if not attendee.leave:
+            attendee.leave = at
+        store.save_attendee(shift, uid)
+    store.save_shift(shift)
+    # Final results go to the history table and its per-user rollups
+    results = [
+        (uid, present, attendance, attendance >= shift.min_attendance)
+        for uid, present, attendance in score_attendees(shift, at)
+    ]
+    store.save_history(shift, results)
+    record_event("finish", shift.shift_id, at=at)
+
+def shift_evicted(shift_id):
+    # Ended with its results queued: from here on it is only read from the store
+    active_shifts.pop(shift_id, None)
+    drop_render_state(shift_id)
+
+def shift_deleted(shift_id):
+    shift = active_shifts.pop(shift_id, None)
+    if shift is not None:
+        unindex_shift(shift)
+    name_indexes.pop(shift_id, None)
+    for user_id, info in list(grace_periods.items()):
+        if info["shift_id"] == shift_id:
+            cancel_grace(user_id)
+    drop_render_state(shift_id)
+    store.delete_shift(shift_id)
+    record_event("delete", shift_id)
+
+def attendee_joined(shift, user_id, at):
+    cancel_grace(user_id)
+    shift.add_attendee(user_id, new_attendee(at))
+    store.save_attendee(shift, user_id)
+    record_event("join", shift.shift_id, u=user_id, at=at)
+
+def attendee_left(shift, user_id, at):
+    # Leave button
+    cancel_grace(user_id)
+    attendee = shift.attendees[user_id]
+    close_session(shift, attendee, at)
+    attendee.leave = at
+    store.save_attendee(shift, user_id)
+    record_event("leave", shift.shift_id, u=user_id, at=at)
+
+def attendee_voice_left(shift, user_id, at):
+    start_grace(user_id, shift, at)
+    attendee = shift.attendees[user_id]
+    close_session(shift, attendee, at)
+    attendee.leave = at
+    store.save_attendee(shift, user_id)
+    record_event("voice_left", shift.shift_id, u=user_id, at=at)
+
+def attendee_voice_returned(shift, user_id, at):
+    cancel_grace(user_id)
+    attendee = shift.attendees.get(user_id)
+    if attendee is not None:
+        attendee.leave = None
+        open_session(attendee, at)
+        store.save_attendee(shift, user_id)
+    record_event("voice_return", shift.shift_id, u=user_id, at=at)
+
+def attendee_grace_expired(shift, user_id, left_at):
+    cancel_grace(user_id)
+    attendee = shift.attendees.get(user_id)
+    if attendee is not None:
+        close_session(shift, attendee, left_at)
+        if not attendee.leave or left_at < attendee.leave:
+            attendee.leave = left_at
+        store.save_attendee(shift, user_id)
+    record_event("grace_expired", shift.shift_id, u=user_id, at=left_at)
+
+def results_queued(shift_id, guild_id, payload):
+    outbox.enqueue(shift_id, guild_id, payload)
+    record_event("results", shift_id, guild=guild_id, payload=payload)
+
+def results_sent(shift_id):
+    # The outbox is done with these results (posted, or given up on)
+    record_event("results_sent", shift_id)
+
+def attendee_removed(shift, user_id):
+    # /clockinremove
+    if grace_periods.get(user_id, {}).get("shift_id") == shift.shift_id:
+        cancel_grace(user_id)  # Or its expiry would act on an attendee that is gone
+    shift.remove_attendee(user_id)
+    index = name_indexes.get(shift.shift_id)
+    if index is not None:
+        index.remove(user_id)
+    store.remove_attendee(shift.shift_id, user_id)
+    record_event("remove", shift.shift_id, u=user_id)
+
+ATTENDEE_REPLAY = {
+    "join": attendee_joined,
+    "leave": attendee_left,
+    "voice_left": attendee_voice_left,
+    "voice_return": attendee_voice_returned,
+    "grace_expired": attendee_grace_expired
+}
+
+def apply_journal_record(record):
+    kind = record["e"]
+    sid = record["sh"]
+    if kind == "create":
+        shift_opened(Shift(
+            shift_id=sid,
+            guild_id=record["guild"],
+            host=record["host"],
+            title=record["title"],
+            min_attendance=record["min"],
+            grace_seconds=record["grace"],
+            voice=record["voice"],
+            start=record["at"],
+            channel_id=record.get("ch"),
+            message_id=record.get("msg")
+        ))
+        return
+    if kind == "delete":
+        shift_deleted(sid)
+        return
+    # Not tied to an open shift: the snapshot may already hold it as ended
+    if kind == "results":
+        results_queued(sid, record["guild"], record["payload"])
+        return
+    if kind == "results_sent":
+        outbox.done([{"shift_id": sid}])
+        return
+    shift = active_shifts.get(sid)
+    if shift is None:
+        return
+    if kind == "finish":
+        if not shift.ended:
+            shift_finished(shift, record["at"])
+        shift_evicted(sid)
+    elif kind == "remove":
+        if record["u"] in shift.attendees:
+            attendee_removed(shift, record["u"])
+    elif kind in ATTENDEE_REPLAY:
+        if kind in ("leave", "voice_left") and record["u"] not in shift.attendees:
+            return
+        ATTENDEE_REPLAY[kind](shift, record["u"], record["at"])
+
+# =========================
+# RENDER SCHEDULER
+# =========================
+def get_render_state(shift_id):
+    state = render_states.get(shift_id)
+    if state is None:
+        state = render_states[shift_id] = {
+            "dirty": False,
+            "task": None,
+            "last_flush": 0.0,
+            "last_hash": None,
+            "paged": None  # Whether the message's view has the roster buttons; None until an edit sets it
+        }
+    return state
+
+def schedule_embed_update(shift, bot):
+    # Mark the shift dirty; at most one edit per EMBED_UPDATE_INTERVAL goes out
+    if shift.shift_id not in active_shifts:
+        return  # Ended and evicted, or deleted: its last edit already went out
+    state = get_render_state(shift.shift_id)
+    state["dirty"] = True
+    if state["task"] is None:
+        state["task"] = asyncio.create_task(render_loop(shift, bot, state))
+
+async def render_loop(shift, bot, state):
+    loop = asyncio.get_running_loop()
+    try:
+        while state["dirty"]:
+            wait = state["last_flush"] + EMBED_UPDATE_INTERVAL - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            state["dirty"] = False
+            state["last_flush"] = loop.time()
+            await update_embed(shift, bot)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if state["task"] is asyncio.current_task():
+            state["task"] = None
+
+async def flush_embed(shift, bot):
+    # Render right now, dropping any pending scheduled render
+    state = get_render_state(shift.shift_id)
+    task = state["task"]
+    if task is not None:
+        state["task"] = None
+        task.cancel()
+    state["dirty"] = False
+    state["last_flush"] = asyncio.get_running_loop().time()
+    await update_embed(shift, bot)
+
+def drop_render_state(shift_id):
+    state = render_states.pop(shift_id, None)
+    if state and state["task"] is not None:
+        state["task"].cancel()
+
+def embed_fingerprint(embed):
+    try:
+        return hash(json.dumps(embed.to_dict(), sort_keys=True, default=str))
+    except Exception:
+        return None
+
 # =========================
 # EMBED/SHIFT UPDATE
 # =========================
+@metrics.timed(update_embed_seconds)
 async def update_embed(shift, bot):
-    if not shift.get("message"):
+    if not get_shift_message(shift, bot):
         return
 
-    embed = shift["embed"]
-
     try:
-        if shift.get("ended"):
-            elapsed = shift.get("end_time", datetime.datetime.utcnow()) - shift["start"]
+        if shift.embed is None:
+            shift.embed = build_shift_embed(shift, bot)
+        embed = shift.embed
+
+        if shift.ended:
+            elapsed = datetime.timedelta(seconds=(shift.end_time or epoch_now()) - shift.start)
         else:
-            elapsed = datetime.datetime.utcnow() - shift["start"]
+            elapsed = datetime.timedelta(seconds=epoch_now() - shift.start)
         time_str = format_time_delta(elapsed)
-        duration_minutes = elapsed.total_seconds() / 60 if elapsed.total_seconds() > 0 else 1
 
-        if shift.get("ended"):
+        if shift.ended:
             embed.color = discord.Color.red()
-            embed.title = f"🔴 {shift['title']}"
+            embed.title = f"🔴 {shift.title}"
             embed.description = "**Shift Ended**"
         else:
             embed.color = discord.Color.green()
-            embed.title = f"🟢 {shift['title']}"
+            embed.title = f"🟢 {shift.title}"
 
         ensure_embed_fields(embed, shift, bot)
 
@@ -506,164 +1141,105 @@ async def update_embed(shift, bot):
         except Exception:
             ensure_embed_fields(embed, shift, bot)
 
-        attendees_list = []
-        shift_start = shift["start"]
-        shift_end = shift.get("end_time", datetime.datetime.utcnow()) if shift.get("ended") else datetime.datetime.utcnow()
-        for uid, attendee in shift["attendees"].items():
-            # Try to get Member, fallback to User
-            member = safe_get_user(bot, uid)
-            if member:
-                name = getattr(member, "display_name", getattr(member, "name", f"User {uid}"))
-            else:
-                name = f"User {uid}"
-
-            if not shift.get("ended"):
-                # Show red if attendee.get('leave') is set (button or voice left) or in grace_period
-                in_grace = (uid in grace_periods) and (grace_periods[uid]["shift_id"] == shift["shift_id"])
-                if in_grace or attendee.get("leave") is not None:
-                    status_emoji = "🔴"
-                    leave_cap = attendee.get("leave", shift_end)
-                    sessions = attendee.get("sessions", [])
-                    total_present_seconds = 0
-                    for session_start, session_end in sessions:
-                        ses_start = max(session_start, shift_start)
-                        ses_end = session_end if session_end else leave_cap
-                        ses_end = min(ses_end, leave_cap)
-                        if ses_start > ses_end:
-                            continue
-                        total_present_seconds += max(0, (ses_end - ses_start).total_seconds())
-                    total_present_minutes = total_present_seconds / 60
-                    hours = int(total_present_minutes // 60)
-                    minutes = int(total_present_minutes % 60)
-                    if hours > 0:
-                        time_present = f"{hours}h {minutes}m"
-                    else:
-                        time_present = f"{minutes}m"
-                    attendees_list.append(f"{status_emoji} {name} ({time_present})")
-                else:
-                    status_emoji = "🟢"
-                    sessions = attendee.get("sessions", [])
-                    total_present_seconds = 0
-                    for session_start, session_end in sessions:
-                        ses_start = max(session_start, shift_start)
-                        ses_end = session_end if session_end else shift_end
-                        ses_end = min(ses_end, shift_end)
-                        if ses_start > ses_end:
-                            continue
-                        total_present_seconds += max(0, (ses_end - ses_start).total_seconds())
-                    total_present_minutes = total_present_seconds / 60
-                    hours = int(total_present_minutes // 60)
-                    minutes = int(total_present_minutes % 60)
-                    if hours > 0:
-                        time_present = f"{hours}h {minutes}m"
-                    else:
-                        time_present = f"{minutes}m"
-                    attendees_list.append(f"{status_emoji} {name} ({time_present})")
-            else:
-                sessions = attendee.get("sessions", [])
-                attendance = calculate_attendance_from_sessions(sessions, shift_start, shift_end)
-                if attendance >= shift["min_attendance"]:
-                    attendees_list.append(f"✅ {name} ({attendance*100:.0f}%)")
-                else:
-                    attendees_list.append(f"❌ {name} ({attendance*100:.0f}%)")
-
-        attendees_text = "\n".join(attendees_list) if attendees_list else "—"
+        # Counts plus the first roster page; the other pages render on demand (RosterPageButton)
+        total = len(shift.roster)
+        attendees_text = "\n".join(roster_page_lines(shift, 0, bot)) or "—"
+        if total > ROSTER_PAGE_SIZE:
+            attendees_text += f"\n*Page 1/{page_count(total)}: use ◀ ▶ to see everyone*"
         try:
             embed.set_field_at(
                 index=4,
-                name=f"👥 Present ({len(shift['attendees'])})",
-                value=attendees_text[:1024] if len(attendees_text) <= 1024 else attendees_text[:1021] + "...",
+                name=f"👥 Present ({total})",
+                value=fit_field(attendees_text),
                 inline=False
             )
         except Exception:
             try:
                 embed.add_field(
-                    name=f"👥 Present ({len(shift['attendees'])})",
-                    value=attendees_text[:1024] if len(attendees_text) <= 1024 else attendees_text[:1021] + "...",
+                    name=f"👥 Present ({total})",
+                    value=fit_field(attendees_text),
                     inline=False
                 )
             except Exception as e:
-                print(f"[WARN] Could not update embed attendance field: {e}")
+                log.warning("Could not update embed attendance field: %s", e, extra={"shift": shift.shift_id})
 
-        if shift.get("ended"):
+        if shift.ended:
             embed.set_footer(text="Shift Ended")
         else:
             embed.set_footer(text="Click ✅ Join to register for the shift")
 
-        msg = shift.get("message")
+        msg = shift.message
+
+        # Skip the edit when nothing visible changed since the last one
+        state = get_render_state(shift.shift_id)
+        fingerprint = embed_fingerprint(embed)
+        if fingerprint is not None and fingerprint == state["last_hash"]:
+            return
 
+        # The view is only sent again when the roster crosses one page, to add or drop Prev/Next
+        paged = total > ROSTER_PAGE_SIZE
+        changes = {"embed": embed}
+        if not shift.ended and paged != state["paged"]:
+            changes["view"] = ClockInView(shift.shift_id, bot, paged)
         try:
             if msg and can_edit_message(msg):
-                await msg.edit(embed=embed)
+                edits_sent.inc()
+                await msg.edit(**changes)
+                state["last_hash"] = fingerprint
+                if "view" in changes:
+                    state["paged"] = paged
             else:
-                print(f"[WARN] Can't edit message for shift {shift.get('title','')} (no permissions?) - skipping update")
+                log.warning("Can't edit message for shift %s (no permissions?) - skipping update", shift.title,
+                            extra={"shift": shift.shift_id, "guild": shift.guild_id})
         except Exception as e:
-            print(f"[WARN] Failed to update shift embed: {e}")
-            traceback.print_exc()
+            edit_failures.inc()
+            log.warning("Failed to update shift embed: %s", e, exc_info=True,
+                        extra={"shift": shift.shift_id, "guild": shift.guild_id})
 
     except Exception as e:
-        print(f"[WARN] update_embed global problem: {e}")
-        traceback.print_exc()
+        log.exception("update_embed global problem: %s", e, extra={"shift": shift.shift_id})
 
 # =========================
 # SHIFT END
 # =========================
+@metrics.timed(end_shift_seconds)
 async def end_shift(shift, bot):
     try:
-        if shift.get("ended", False):
+        if shift.ended:
             return
-        shift["ended"] = True
-        shift["end_time"] = datetime.datetime.utcnow()
-        for user_id in list(grace_periods.keys()):
-            if grace_periods[user_id]["shift_id"] == shift["shift_id"]:
-                attendee = shift["attendees"].get(user_id)
-                left_at = grace_periods[user_id].get("left_at", shift["end_time"])
-                if attendee:
-                    if attendee["sessions"] and attendee["sessions"][-1][1] is None:
-                        attendee["sessions"][-1] = (attendee["sessions"][-1][0], left_at)
-                    if not attendee.get("leave") or (attendee.get("leave") and left_at < attendee["leave"]):
-                        attendee["leave"] = left_at
-                try:
-                    grace_periods[user_id]["task"].cancel()
-                except Exception:
-                    pass
-                del grace_periods[user_id]
-        for uid, attendee in shift["attendees"].items():
-            if attendee["sessions"] and attendee["sessions"][-1][1] is None:
-                leave_at = attendee.get("leave") or shift["end_time"]
-                session_end = min(leave_at, shift["end_time"])
-                attendee["sessions"][-1] = (attendee["sessions"][-1][0], session_end)
-            if not attendee.get("leave"):
-                attendee["leave"] = shift["end_time"]
-        await update_embed(shift, bot)
+        shift_finished(shift, epoch_now())
+        # Queued (and journaled) in the same step as the finish, so a crash cannot keep one without the other
+        await send_shift_log(shift, bot)
+        await flush_embed(shift, bot)
         try:
-            msg = shift.get("message")
+            msg = get_shift_message(shift, bot)
             if msg and can_edit_message(msg):
-                await msg.edit(view=None)
+                # Only the roster pages stay clickable, and only if there is more than the embed shows
+                view = add_roster_entry(View(timeout=None), shift.shift_id, first=1) if len(shift.roster) > ROSTER_PAGE_SIZE else None
+                edits_sent.inc()
+                await msg.edit(view=view)
         except Exception as e:
-            print(f"[WARN] Failed to remove shift view: {e}")
-            traceback.print_exc()
-        await send_shift_log(shift, bot)
+            edit_failures.inc()
+            log.warning("Failed to remove shift view: %s", e, exc_info=True, extra={"shift": shift.shift_id})
+        shift_evicted(shift.shift_id)
     except Exception as e:
-        print(f"[ERROR] end_shift exception: {e}")
-        traceback.print_exc()
+        log.exception("end_shift failed: %s", e, extra={"shift": shift.shift_id})
 
 # =========================
 # SHIFT LOG
 # =========================
+@metrics.timed(shift_log_seconds)
 async def send_shift_log(shift, bot):
     embed = discord.Embed(
-        title=f"📊 Shift Results: {shift['title']}",
+        title=f"📊 Shift Results: {shift.title}",
         color=discord.Color.blue(),
-        timestamp=shift["end_time"]
+        timestamp=from_epoch(shift.end_time)
     )
-    host = safe_get_user(bot, shift["host"])
-    embed.add_field(name="👤 Host", value=host.mention if getattr(host,"mention",None) else f"<@{shift['host']}>", inline=True)
-    actual_duration = shift["end_time"] - shift["start"]
+    host = safe_get_user(bot, shift.host)
+    embed.add_field(name="👤 Host", value=host.mention if getattr(host,"mention",None) else f"<@{shift.host}>", inline=True)
+    actual_duration = datetime.timedelta(seconds=shift.end_time - shift.start)
     duration_str = format_time_delta(actual_duration)
     duration_minutes = actual_duration.total_seconds() / 60
-    actual_duration = max(actual_duration, datetime.timedelta(seconds=1))
-    actual_duration_minutes = duration_minutes if duration_minutes > 0 else 1
 
     embed.add_field(
         name="⏱️ Duration",
@@ -673,113 +1249,180 @@ async def send_shift_log(shift, bot):
 
     passed = []
     failed = []
-    shift_start = shift["start"]
-    shift_end = shift["end_time"]
-
-    for uid, attendee in shift["attendees"].items():
-        member = safe_get_user(bot, uid)
-        name = getattr(member, "display_name", getattr(member,"name", f"User {uid}")) if member else f"User {uid}"
-        sessions = attendee.get("sessions", [])
-        attendance = calculate_attendance_from_sessions(sessions, shift_start, shift_end)
-        if attendance >= shift["min_attendance"]:
-            passed.append(f"✅ {name}: {attendance*100:.0f}%")
-        else:
-            failed.append(f"❌ {name}: {attendance*100:.0f}%")
-    if passed:
-        embed.add_field(
-            name=f"✅ Passed ({len(passed)})",
-            value="\n".join(passed[:20]) if len(passed) <= 20 else "\n".join(passed[:20]) + f"\n... and {len(passed)-20} more",
-            inline=False
-        )
-    if failed:
-        embed.add_field(
-            name=f"❌ Failed ({len(failed)})",
-            value="\n".join(failed[:20]) if len(failed) <= 20 else "\n".join(failed[:20]) + f"\n... and {len(failed)-20} more",
-            inline=False
-        )
-    print(f"\n{'='*50}")
-    print(f"SHIFT LOG: {shift['title']}")
-    print(f"Host: {host}")
-    print(f"Duration: {duration_str}")
-    print(f"Passed: {len(passed)}, Failed: {len(failed)}")
-    print(f"{'='*50}\n")
-    # Try to send log as a followup if present
+    for uid, _, attendance in score_attendees(shift, shift.end_time):
+        (passed if attendance >= shift.min_attendance else failed).append((uid, attendance))
+    # Names are only looked up for the lines shown; everyone else is on the roster pages
+    for label, group, mark in (("✅ Passed", passed, "✅"), ("❌ Failed", failed, "❌")):
+        if not group:
+            continue
+        lines = [f"{mark} {display_name(bot, uid)}: {attendance*100:.0f}%" for uid, attendance in group[:ROSTER_PAGE_SIZE]]
+        if len(group) > ROSTER_PAGE_SIZE:
+            lines.append(f"... and {len(group) - ROSTER_PAGE_SIZE} more")
+        embed.add_field(name=f"{label} ({len(group)})", value=fit_field("\n".join(lines)), inline=False)
+    log.info("Shift log: %s", shift.title, extra={
+        "shift": shift.shift_id, "guild": shift.guild_id, "user": shift.host,
+        "duration": duration_str, "passed": len(passed), "failed": len(failed)
+    })
+    # Posted by the outbox (log channel or webhook, retried on failure), never from here
+    results_queued(shift.shift_id, shift.guild_id, {
+        "embed": embed.to_dict(),
+        "pages": len(passed) > ROSTER_PAGE_SIZE or len(failed) > ROSTER_PAGE_SIZE,
+        "channel_id": shift.channel_id,
+        "summary": {
+            "title": shift.title, "host": shift.host, "duration": duration_str,
+            "passed": len(passed), "failed": len(failed), "end": shift.end_time
+        }
+    })
+
+# ==== RESULT DELIVERY ====
+def result_destination(settings, item):
+    # Webhook, then log channel, then the channel the shift was posted in
+    if settings["log_webhook"]:
+        return ("webhook", settings["log_webhook"])
+    if settings["log_channel_id"]:
+        return ("channel", settings["log_channel_id"])
+    return ("channel", item["payload"]["channel_id"])
+
+def digest_line(summary):
+    return (
+        f"**{summary['title']}** · <@{summary['host']}> · {summary['duration']} · "
+        f"✅ {summary['passed']} ❌ {summary['failed']} · ended <t:{int(summary['end'])}:t>"
+    )
+
+def digest_chunks(items, limit=4096):
+    # [(lines, items)] with each chunk's lines fitting one embed description
+    chunks = []
+    lines, members, size = [], [], 0
+    for item in items:
+        line = digest_line(item["payload"]["summary"])[:limit]
+        if lines and size + len(line) + 1 > limit:
+            chunks.append((lines, members))
+            lines, members, size = [], [], 0
+        lines.append(line)
+        members.append(item)
+        size += len(line) + 1
+    if lines:
+        chunks.append((lines, members))
+    return chunks
+
+async def post_result(bot, destination, embed, view=None):
+    kind, target = destination
+    messages_sent.inc()
     try:
-        msg = shift.get("message")
-        if msg and hasattr(msg, "channel"):
-            await msg.channel.send(embed=embed)
+        if kind == "webhook":
+            # Webhook messages can't carry the roster buttons
+            await discord.Webhook.from_url(target, client=bot).send(embed=embed)
+        else:
+            channel = bot.get_channel(target)
+            if channel is None:
+                raise RuntimeError(f"log channel {target} not found")
+            await channel.send(embed=embed, view=view)
     except Exception:
-        traceback.print_exc()
+        send_failures.inc()
+        raise
+
+async def deliver_results(bot, guild_id, items):
+    # Outbox callback; anything it raises is retried with backoff
+    settings = get_guild_settings(guild_id)
+    groups = {}
+    for item in items:
+        groups.setdefault(result_destination(settings, item), []).append(item)
+    for destination, group in groups.items():
+        if len(group) == 1:
+            payload = group[0]["payload"]
+            view = add_roster_entry(View(timeout=None), group[0]["shift_id"], first=0) if payload["pages"] else None
+            await post_result(bot, destination, discord.Embed.from_dict(payload["embed"]), view)
+            outbox.done(group)
+            continue
+        # Digest: every shift that ended in the window, one line each
+        for lines, members in digest_chunks(group):
+            embed = discord.Embed(
+                title=f"📊 Shift Results ({len(group)} shifts)",
+                description="\n".join(lines),
+                color=discord.Color.blue(),
+                timestamp=from_epoch(max(item["payload"]["summary"]["end"] for item in members))
+            )
+            await post_result(bot, destination, embed)
+            outbox.done(members)
+        log.info("Shift results digest sent", extra={"guild": guild_id, "shifts": len(group)})
 
 # =========================
-# GRACE PERIOD TASK
+# GRACE PERIODS
 # =========================
-async def grace_period_task(user_id, shift_id, bot):
+def start_grace(user_id, shift, left_at):
+    sid = shift.shift_id
+    grace_periods[user_id] = {
+        "shift_id": sid,
+        "left_at": left_at
+    }
+    # Counted from left_at, so grace periods restored after a restart keep their deadline
+    delay = shift.grace_seconds - (epoch_now() - left_at)
+    grace_scheduler.arm((user_id, sid), delay)
+    store.save_grace(user_id, sid, left_at)
+
+def cancel_grace(user_id):
+    info = grace_periods.pop(user_id, None)
+    if info is not None:
+        grace_scheduler.cancel((user_id, info["shift_id"]))
+        store.drop_grace(user_id, info["shift_id"])
+    return info
+
+def is_in_shift_voice(bot, shift, user_id):
     try:
-        await asyncio.sleep(300)
+        guild = bot.get_guild(shift.guild_id)
+        if guild:
+            member = guild.get_member(user_id)
+            if member and member.voice and member.voice.channel and member.voice.channel.id == shift.voice:
+                return True
+    except Exception:
+        pass
+    return False
+
+async def expire_grace_periods(keys, bot):
+    # Called by grace_scheduler with every (user_id, shift_id) that ran out together
+    refresh = {}
+    notices = []
+    for user_id, shift_id in keys:
         info = grace_periods.get(user_id)
         if not info or info["shift_id"] != shift_id:
-            return
+            continue
         shift = active_shifts.get(shift_id)
-        if not shift or shift.get("ended",False):
-            if user_id in grace_periods:
-                del grace_periods[user_id]
-            return
-        user = safe_get_user(bot, user_id)
-        left_at = info.get("left_at") or datetime.datetime.utcnow()
-        guild = bot.get_guild(shift["guild_id"])
+        if not shift or shift.ended:
+            cancel_grace(user_id)
+            continue
         # Defensive: making sure user didn't return
-        still_left = True
-        try:
-            if guild:
-                member = guild.get_member(user_id)
-                if member and member.voice and member.voice.channel and member.voice.channel.id == shift["voice"]:
-                    still_left = False
-        except Exception:
-            pass
-        if not still_left:
-            if user_id in grace_periods:
-                del grace_periods[user_id]
-            attendee = shift["attendees"].get(user_id)
-            if attendee is not None:
-                attendee["leave"] = None
-                if attendee["sessions"]:
-                    if attendee["sessions"][-1][1] is not None:
-                        attendee["sessions"].append((datetime.datetime.utcnow(), None))
-                else:
-                    attendee["sessions"] = [(datetime.datetime.utcnow(), None)]
-            await update_embed(shift, bot)
-            return
-        if shift and user_id in shift["attendees"]:
-            attendee = shift["attendees"][user_id]
-            if attendee["sessions"] and attendee["sessions"][-1][1] is None:
-                attendee["sessions"][-1] = (attendee["sessions"][-1][0], left_at)
-            if not attendee.get("leave") or left_at < attendee["leave"]:
-                attendee["leave"] = left_at
-            try:
-                if user:
-                    await user.send(
-                        f"⚠️ You left the voice channel for {shift['title']} and did not return within 5 minutes. "
-                        f"Your attendance has been recorded."
-                    )
-            except Exception as e:
-                print(f"[WARN] Could not notify user {user_id} about grace period: {e}")
-                traceback.print_exc()
-            await update_embed(shift, bot)
-        if user_id in grace_periods:
-            del grace_periods[user_id]
-    except asyncio.CancelledError:
-        pass
+        if is_in_shift_voice(bot, shift, user_id):
+            attendee_voice_returned(shift, user_id, epoch_now())
+        else:
+            attendee_grace_expired(shift, user_id, info.get("left_at") or epoch_now())
+            if user_id in shift.attendees:
+                notices.append(notify_grace_expired(bot, user_id, shift))
+        refresh[shift_id] = shift
+    for shift in refresh.values():
+        schedule_embed_update(shift, bot)
+    if notices:
+        await asyncio.gather(*notices)
+
+async def notify_grace_expired(bot, user_id, shift):
+    user = safe_get_user(bot, user_id)
+    minutes = shift.grace_seconds / 60
+    try:
+        if user:
+            dms_sent.inc()
+            await user.send(
+                f"⚠️ You left the voice channel for {shift.title} and did not return within {minutes:g} minutes. "
+                f"Your attendance has been recorded."
+            )
     except Exception as e:
-        print(f"[WARN] grace_period_task failed: {e}")
-        traceback.print_exc()
+        dm_failures.inc()
+        log.warning("Could not notify user about grace period: %s", e, extra={"shift": shift.shift_id, "user": user_id})
 
 async def setup(bot):
     await bot.add_cog(ClockInCreate(bot))
-    print("\n✓ Loaded extension: commands.clockincreate")
+    bot.add_dynamic_items(ClockInButton, RosterPageButton)
+    log.info("Loaded extension: commands.clockincreate")
     tree = getattr(bot, "tree", None)
     if tree:
         registered = [cmd.name for cmd in tree.get_commands(type=discord.AppCommandType.chat_input)]
         if "clockincreate" in registered:
-            print("\n[Tree] Registered commands in app_commands tree:\n")
-            print("  /clockincreate - Create a clock-in shift (only members with brotato role)")
\ No newline at end of file
+            log.info("Registered /clockincreate in the app_commands tree")
\ No newline at end of file
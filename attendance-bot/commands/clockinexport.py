@@ -0,0 +1,167 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from discord import Interaction
+from typing import Literal
+import datetime
+import asyncio
+import logging
+import csv
+import os
+import tempfile
+from commands.clockincreate import store, permissions, calculate_attendance_from_sessions
+from utils.storage import to_epoch
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet exports are optional
+    pyarrow = None
+
+log = logging.getLogger(__name__)
+
+EXPORT_CHUNK_ROWS = 1000  # Rows buffered before each write
+EXPORT_COLUMNS = [
+    "shift_id", "title", "host_id", "shift_start", "shift_end", "min_attendance",
+    "user_id", "joined", "left", "sessions", "session_count", "present_seconds", "attendance", "passed"
+]
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def export_rows(records):
+    # One row per attendee, scored the same way as the shift log
+    for rec in records:
+        sessions = rec["sessions"]
+        attendance = calculate_attendance_from_sessions(
+            [(to_epoch(start), to_epoch(end)) for start, end in sessions], to_epoch(rec["start"]), to_epoch(rec["end_time"])
+        )
+        yield (
+            rec["shift_id"], rec["title"], rec["host"], rec["start"], rec["end_time"], rec["min_attendance"],
+            rec["user_id"], rec["join"], rec["leave"],
+            ";".join(f"{iso(start)}/{iso(end)}" for start, end in sessions), len(sessions),
+            round(rec["present_seconds"], 3), attendance, attendance >= rec["min_attendance"]
+        )
+
+def iso(dt):
+    return dt.isoformat() + "Z" if dt is not None else ""
+
+def chunked(rows, size=EXPORT_CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_csv(path, rows):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for chunk in chunked(rows):
+            writer.writerows(
+                [iso(v) if isinstance(v, datetime.datetime) else v for v in row] for row in chunk
+            )
+            count += len(chunk)
+    return count
+
+def parquet_schema():
+    ts = pyarrow.timestamp("ms", tz="UTC")
+    return pyarrow.schema([
+        ("shift_id", pyarrow.string()), ("title", pyarrow.string()), ("host_id", pyarrow.int64()),
+        ("shift_start", ts), ("shift_end", ts), ("min_attendance", pyarrow.float64()),
+        ("user_id", pyarrow.int64()), ("joined", ts), ("left", ts), ("sessions", pyarrow.string()),
+        ("session_count", pyarrow.int32()), ("present_seconds", pyarrow.float64()),
+        ("attendance", pyarrow.float64()), ("passed", pyarrow.bool_())
+    ])
+
+def write_parquet(path, rows):
+    schema = parquet_schema()
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for chunk in chunked(rows):
+            columns = list(zip(*chunk))
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                [pyarrow.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema
+            ))
+            count += len(chunk)
+    return count
+
+def run_export(guild_id, since, fmt, path):
+    """Stream the guild's ended shifts since `since` into `path`; runs on a worker thread."""
+    conn = store.open_reader()
+    try:
+        rows = export_rows(store.iter_ended_attendees(conn, guild_id, since=since))
+        return write_parquet(path, rows) if fmt == "parquet" else write_csv(path, rows)
+    finally:
+        conn.close()
+
+class ClockInExport(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    def has_brotato_role(self, member: discord.Member):
+        return permissions.is_manager(member)
+
+    @app_commands.command(
+        name="clockinexport",
+        description="Export finished shifts with attendance to CSV or Parquet (only members with brotato role)"
+    )
+    @app_commands.describe(
+        days="How many days back to export",
+        file_format="File format of the export"
+    )
+    async def clockinexport_slash(
+        self,
+        interaction: Interaction,
+        days: app_commands.Range[int, 1, 3660] = 30,
+        file_format: Literal["csv", "parquet"] = "csv"
+    ):
+        if not isinstance(interaction.user, discord.Member) or interaction.guild is None:
+            await interaction.response.send_message("❌ You need to be in a server.", ephemeral=True)
+            return
+        if not self.has_brotato_role(interaction.user):
+            await interaction.response.send_message(
+                f"❌ Only members with role {permissions.describe(interaction.guild)} can export shifts.", ephemeral=True)
+            return
+        if file_format == "parquet" and pyarrow is None:
+            await interaction.response.send_message(
+                "❌ Parquet export needs `pyarrow` installed on the bot. Use CSV instead.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+        fd, path = tempfile.mkstemp(prefix="clockin-export-", suffix=f".{file_format}")
+        os.close(fd)
+        try:
+            await store.flush()  # Include shifts that ended since the last flush
+            count = await asyncio.to_thread(run_export, interaction.guild.id, since, file_format, path)
+            if count == 0:
+                await interaction.followup.send(f"ℹ️ No finished shifts in the last {days} days.", ephemeral=True)
+                return
+            size = os.path.getsize(path)
+            if size > interaction.guild.filesize_limit:
+                await interaction.followup.send(
+                    f"❌ The export is {size / 1024 / 1024:.1f} MB, over this server's upload limit. "
+                    f"Try fewer days{' or Parquet' if file_format == 'csv' and pyarrow is not None else ''}.",
+                    ephemeral=True)
+                return
+            filename = f"shifts-{interaction.guild.id}-{datetime.datetime.utcnow():%Y%m%d}.{file_format}"
+            await interaction.followup.send(
+                f"📦 {count} attendance rows from the last {days} days.",
+                file=discord.File(path, filename=filename), ephemeral=True)
+        except Exception as e:
+            log.exception("Shift export failed", extra={"guild": interaction.guild.id, "user": interaction.user.id})
+            await interaction.followup.send(f"❌ Export failed: {e}", ephemeral=True)
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+async def setup(bot):
+    await bot.add_cog(ClockInExport(bot))
+    log.info("Loaded extension: commands.clockinexport")
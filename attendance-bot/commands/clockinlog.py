@@ -0,0 +1,85 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from discord import Interaction
+from typing import Optional
+import re
+import logging
+from commands.clockincreate import get_guild_settings, update_guild_settings
+
+log = logging.getLogger(__name__)
+
+WEBHOOK_URL = re.compile(r"https://(?:canary\.|ptb\.)?discord(?:app)?\.com/api/webhooks/[0-9]+/[A-Za-z0-9_-]+")
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def describe_log_settings(settings):
+    if settings["log_webhook"]:
+        destination = "a webhook"
+    elif settings["log_channel_id"]:
+        destination = f"<#{settings['log_channel_id']}>"
+    else:
+        destination = "the channel each shift was posted in"
+    digest = settings["digest_seconds"]
+    mode = f"one digest every {digest / 60:g} min" if digest > 0 else "one message per shift"
+    return f"📨 Shift results go to {destination}, {mode}."
+
+class ClockInLog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(
+        name="clockinlog",
+        description="Choose where shift results are posted (Manage Server only)"
+    )
+    @app_commands.describe(
+        channel="Log channel for shift results",
+        webhook="Webhook URL for shift results (used instead of the channel)",
+        digest_minutes="Batch every shift that ends within this many minutes into one message (0 = off)",
+        reset="Go back to posting in each shift's own channel, one message per shift"
+    )
+    @app_commands.default_permissions(manage_guild=True)
+    async def clockinlog_slash(
+        self,
+        interaction: Interaction,
+        channel: Optional[discord.TextChannel] = None,
+        webhook: Optional[str] = None,
+        digest_minutes: Optional[app_commands.Range[float, 0, 1440]] = None,
+        reset: bool = False
+    ):
+        if not isinstance(interaction.user, discord.Member) or interaction.guild is None:
+            await interaction.response.send_message("❌ You need to be in a server.", ephemeral=True)
+            return
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("❌ You need the Manage Server permission.", ephemeral=True)
+            return
+        guild_id = interaction.guild.id
+        changes = {}
+        if reset:
+            changes = {"log_channel_id": None, "log_webhook": None, "digest_seconds": 0.0}
+        if channel is not None:
+            changes["log_channel_id"] = channel.id
+            changes["log_webhook"] = None
+        if webhook is not None:
+            webhook = webhook.strip()
+            if not WEBHOOK_URL.fullmatch(webhook):
+                await interaction.response.send_message("❌ That is not a Discord webhook URL.", ephemeral=True)
+                return
+            changes["log_webhook"] = webhook
+        if digest_minutes is not None:
+            changes["digest_seconds"] = float(digest_minutes) * 60
+        settings = update_guild_settings(guild_id, **changes) if changes else get_guild_settings(guild_id)
+        if changes:
+            log.info("Result delivery changed", extra={"guild": guild_id, "user": interaction.user.id})
+        await interaction.response.send_message(describe_log_settings(settings), ephemeral=True)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        # Results would only fail there until they are dropped
+        if get_guild_settings(channel.guild.id)["log_channel_id"] == channel.id:
+            update_guild_settings(channel.guild.id, log_channel_id=None)
+
+async def setup(bot):
+    await bot.add_cog(ClockInLog(bot))
+    log.info("Loaded extension: commands.clockinlog")
@@ -0,0 +1,117 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from discord import Interaction
+import re
+import time
+import logging
+from commands.clockincreate import (
+    active_shifts, handler_seconds, can_manage_shift, shift_name_index, attendee_removed, schedule_embed_update
+)
+from utils.storage import from_epoch
+
+log = logging.getLogger(__name__)
+
+MENTION = re.compile(r"<@!?([0-9]+)>")
+remove_seconds = handler_seconds.labels("clockinremove")
+member_autocomplete_seconds = handler_seconds.labels("clockinremove_autocomplete")
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def resolve_attendee(shift, index, text):
+    # Returns (user_id, None), or (None, error message)
+    text = text.strip()
+    match = MENTION.fullmatch(text)
+    if match:
+        text = match.group(1)
+    if text.isdigit() and int(text) in shift.attendees:
+        return int(text), None  # Picked from the suggestions, which carry the user id
+    matches = index.exact(text)
+    if len(matches) == 1:
+        return matches[0], None
+    if matches:
+        return None, f"❌ {len(matches)} attendees are called `{text}`, pick one from the suggestions."
+    return None, f"❌ `{text}` is not in this shift."
+
+class ClockInRemove(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    def managed_shift(self, interaction, shift_id):
+        # A running shift of this server that the user may edit, or None
+        shift = active_shifts.get(shift_id)
+        if shift is None or shift.ended or shift.guild_id != interaction.guild_id:
+            return None
+        if not can_manage_shift(interaction.user, shift):
+            return None
+        return shift
+
+    @app_commands.command(
+        name="clockinremove",
+        description="Remove a member from a running shift (host or members with brotato role)"
+    )
+    @app_commands.describe(
+        shift="Running shift to edit",
+        member="Attendee to remove (start typing their name)"
+    )
+    async def clockinremove_slash(self, interaction: Interaction, shift: str, member: str):
+        with remove_seconds.time():
+            try:
+                if not isinstance(interaction.user, discord.Member) or interaction.guild is None:
+                    await interaction.response.send_message("❌ You need to be in a server.", ephemeral=True)
+                    return
+                found = active_shifts.get(shift)
+                if found is None or found.ended or found.guild_id != interaction.guild.id:
+                    await interaction.response.send_message("❌ No running shift found with that name.", ephemeral=True)
+                    return
+                if not can_manage_shift(interaction.user, found):
+                    await interaction.response.send_message("❌ No permission to edit this shift.", ephemeral=True)
+                    return
+
+                user_id, error = resolve_attendee(found, shift_name_index(found, self.bot), member)
+                if error:
+                    await interaction.response.send_message(error, ephemeral=True)
+                    return
+                attendee_removed(found, user_id)
+                schedule_embed_update(found, self.bot)
+                await interaction.response.send_message(f"✅ Removed <@{user_id}> from the shift.", ephemeral=True)
+            except Exception:
+                log.exception("Clock-in removal failed", extra={"shift": shift, "user": interaction.user.id})
+                await interaction.response.send_message("❌ Error. Could not edit shift participants.", ephemeral=True)
+
+    @clockinremove_slash.autocomplete("shift")
+    async def shift_autocomplete(self, interaction: Interaction, current: str):
+        if interaction.guild is None:
+            return []
+        current = current.lower()
+        choices = []
+        for sid, s in active_shifts.items():
+            if s.ended or s.guild_id != interaction.guild.id or current not in s.title.lower():
+                continue
+            if not can_manage_shift(interaction.user, s):
+                continue
+            choices.append(app_commands.Choice(
+                name=f"{s.title} ({len(s.attendees)} present, {from_epoch(s.start):%Y-%m-%d %H:%M})"[:100], value=sid))
+            if len(choices) == 25:
+                break
+        return choices
+
+    @clockinremove_slash.autocomplete("member")
+    async def member_autocomplete(self, interaction: Interaction, current: str):
+        # Runs on every keystroke: one bisect into the shift's name index
+        started = time.perf_counter()
+        try:
+            shift = self.managed_shift(interaction, getattr(interaction.namespace, "shift", None))
+            if shift is None:
+                return []
+            return [
+                app_commands.Choice(name=name[:100], value=str(uid))
+                for uid, name in shift_name_index(shift, self.bot).search(current, 25)
+            ]
+        finally:
+            member_autocomplete_seconds.observe(time.perf_counter() - started)
+
+async def setup(bot):
+    await bot.add_cog(ClockInRemove(bot))
+    log.info("Loaded extension: commands.clockinremove")
@@ -0,0 +1,79 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from discord import Interaction
+from typing import Literal, Optional
+import logging
+from commands.clockincreate import permissions, set_manager_roles
+
+log = logging.getLogger(__name__)
+
+class ClockInRoles(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(
+        name="clockinroles",
+        description="Choose which roles can create and manage clock-in shifts (Manage Server only)"
+    )
+    @app_commands.describe(
+        action="add/remove a role, list the current ones, or reset to the default role name",
+        role="Role to add or remove"
+    )
+    @app_commands.default_permissions(manage_guild=True)
+    async def clockinroles_slash(
+        self,
+        interaction: Interaction,
+        action: Literal["add", "remove", "list", "reset"],
+        role: Optional[discord.Role] = None
+    ):
+        if not isinstance(interaction.user, discord.Member) or interaction.guild is None:
+            await interaction.response.send_message("❌ You need to be in a server.", ephemeral=True)
+            return
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("❌ You need the Manage Server permission.", ephemeral=True)
+            return
+        guild = interaction.guild
+        current = permissions.configured.get(guild.id, frozenset())
+        if action in ("add", "remove") and role is None:
+            await interaction.response.send_message(f"❌ Pick a role to {action}.", ephemeral=True)
+            return
+        if action == "add":
+            set_manager_roles(guild.id, current | {role.id})
+        elif action == "remove":
+            if role.id not in current:
+                await interaction.response.send_message(f"ℹ️ {role.mention} is not a manager role.", ephemeral=True)
+                return
+            set_manager_roles(guild.id, current - {role.id})
+        elif action == "reset":
+            set_manager_roles(guild.id, None)
+        log.info("Manager roles %s", action, extra={"guild": guild.id, "user": interaction.user.id})
+        await interaction.response.send_message(
+            f"🛡️ Roles that can manage shifts: {permissions.describe(guild)}", ephemeral=True)
+
+    # ---- cache invalidation ----
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        # A new role may match the default role name
+        permissions.invalidate(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        permissions.invalidate(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        configured = permissions.configured.get(role.guild.id, frozenset())
+        if role.id in configured:
+            # Stays configured even with no roles left: falling back to the default
+            # role name would hand shift management to whoever holds a role with that name
+            set_manager_roles(role.guild.id, configured - {role.id})
+            if len(configured) == 1:
+                log.warning("Last manager role deleted; no one can manage shifts until an admin runs /clockinroles add",
+                            extra={"guild": role.guild.id, "role": role.id})
+        else:
+            permissions.invalidate(role.guild.id)
+
+async def setup(bot):
+    await bot.add_cog(ClockInRoles(bot))
+    log.info("Loaded extension: commands.clockinroles")
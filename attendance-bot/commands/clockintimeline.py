@@ -0,0 +1,207 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from discord import Interaction
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import importlib.util
+import asyncio
+import logging
+import io
+import os
+from commands.clockincreate import active_shifts, store, permissions, safe_get_user
+from utils.storage import StoreReader, from_epoch
+from utils.models import epoch_now
+from utils.timeline import PresenceIndex, sparkline, render_headcount_png
+
+log = logging.getLogger(__name__)
+
+TIMELINE_RENDER_WORKERS = int(os.environ.get("TIMELINE_RENDER_WORKERS", "1"))  # Processes drawing charts
+TIMELINE_RENDER_TIMEOUT = 30  # Seconds before a chart is given up on
+CAN_RENDER = importlib.util.find_spec("matplotlib") is not None  # Without it the curve is sent as text
+SPARKLINE_POINTS = 40
+PRESENT_LIST_LIMIT = 40  # Names listed for a point-in-time query
+
+render_pool = None  # ProcessPoolExecutor, started on the first chart
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def get_render_pool():
+    global render_pool
+    if render_pool is None:
+        # Not forked: a child of the bot's process would inherit its event loop, sockets and
+        # SQLite connections mid-use; forkserver starts it from a clean process instead
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        render_pool = ProcessPoolExecutor(max_workers=max(1, TIMELINE_RENDER_WORKERS),
+                                          mp_context=multiprocessing.get_context(method))
+    return render_pool
+
+def live_sessions(shift):
+    # Copy of a shift in memory, so the index never sees later changes
+    sessions = {uid: attendee.sessions() for uid, attendee in shift.attendees.items()}
+    fields = {
+        "guild_id": shift.guild_id,
+        "title": shift.title,
+        "start": shift.start,
+        "end_time": shift.end_time if shift.ended else None
+    }
+    return fields, sessions
+
+def curve_points(index, start, until):
+    # Step curve as minutes since the start, running from the start to `until`
+    minutes = [0.0]
+    counts = [index.headcount(start)]
+    for t, count in index.curve():
+        if start < t < until:
+            minutes.append((t - start) / 60)
+            counts.append(count)
+    minutes.append((until - start) / 60)
+    counts.append(counts[-1])
+    return minutes, counts
+
+class ClockInTimeline(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.reader = StoreReader(store)  # Ended shifts
+
+    def has_brotato_role(self, member: discord.Member):
+        return permissions.is_manager(member)
+
+    async def load_shift(self, guild_id, shift_id):
+        shift = active_shifts.get(shift_id)
+        if shift is not None:
+            fields, sessions = live_sessions(shift)
+        else:
+            fields, sessions = await self.reader.query(store.load_shift_sessions, shift_id)
+        if fields is None or fields["guild_id"] != guild_id:
+            return None, {}
+        return fields, sessions
+
+    @app_commands.command(
+        name="clockintimeline",
+        description="Headcount over time of a shift, and who was present at a given minute (only members with brotato role)"
+    )
+    @app_commands.describe(
+        shift="Shift to chart",
+        minute="Minutes after the shift start to list who was present"
+    )
+    async def clockintimeline_slash(
+        self,
+        interaction: Interaction,
+        shift: str,
+        minute: Optional[app_commands.Range[int, 0, 100000]] = None
+    ):
+        if not isinstance(interaction.user, discord.Member) or interaction.guild is None:
+            await interaction.response.send_message("❌ You need to be in a server.", ephemeral=True)
+            return
+        if not self.has_brotato_role(interaction.user):
+            await interaction.response.send_message(
+                f"❌ Only members with role {permissions.describe(interaction.guild)} can view shift timelines.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            fields, sessions = await self.load_shift(interaction.guild.id, shift)
+            if fields is None:
+                await interaction.followup.send("❌ Shift not found in this server.", ephemeral=True)
+                return
+            start = fields["start"]
+            until = fields["end_time"] or epoch_now()
+            until = max(until, start)
+            index = PresenceIndex.from_sessions(sessions, start, until)
+
+            embed = discord.Embed(
+                title=f"📈 Timeline: {fields['title']}",
+                color=discord.Color.blue(),
+                timestamp=from_epoch(start)
+            )
+            peak, peak_from, peak_until = index.peak()
+            if peak_from is not None:
+                span = f"<t:{int(peak_from)}:t>" + (f" – <t:{int(peak_until)}:t>" if peak_until else "")
+                embed.add_field(name="🔝 Peak", value=f"**{peak}** present ({span})", inline=True)
+            else:
+                embed.add_field(name="🔝 Peak", value="Nobody attended", inline=True)
+            embed.add_field(
+                name="👥 Present now" if fields["end_time"] is None else "👥 Present at the end",
+                value=str(index.headcount(until - 1e-6)), inline=True
+            )
+            embed.add_field(name="🧑 Attendees", value=str(len(sessions)), inline=True)
+
+            if minute is not None:
+                at = start + minute * 60
+                if at >= until:
+                    value = "The shift had not reached that minute."
+                else:
+                    present = index.present_at(at)
+                    names = []
+                    for uid in present[:PRESENT_LIST_LIMIT]:
+                        user = safe_get_user(self.bot, uid)
+                        names.append(getattr(user, "display_name", None) or f"<@{uid}>")
+                    value = ", ".join(names) or "Nobody"
+                    if len(present) > PRESENT_LIST_LIMIT:
+                        value += f" ... and {len(present) - PRESENT_LIST_LIMIT} more"
+                embed.add_field(
+                    name=f"🕒 Present at minute {minute} (<t:{int(at)}:t>)",
+                    value=value[:1024], inline=False
+                )
+
+            minutes, counts = curve_points(index, start, until)
+            if CAN_RENDER:
+                # Drawing takes tens of milliseconds of CPU, so it runs in another process
+                loop = asyncio.get_running_loop()
+                png = await asyncio.wait_for(
+                    loop.run_in_executor(get_render_pool(), render_headcount_png, minutes, counts, fields["title"]),
+                    TIMELINE_RENDER_TIMEOUT)
+                embed.set_image(url="attachment://timeline.png")
+                await interaction.followup.send(
+                    embed=embed, file=discord.File(io.BytesIO(png), filename="timeline.png"), ephemeral=True)
+            else:
+                embed.description = sparkline(index.sample(start, until - 1e-6, SPARKLINE_POINTS))
+                await interaction.followup.send(embed=embed, ephemeral=True)
+        except Exception as e:
+            log.exception("Shift timeline failed", extra={"guild": interaction.guild.id, "shift": shift})
+            await interaction.followup.send(f"❌ Could not build the timeline: {e}", ephemeral=True)
+
+    @clockintimeline_slash.autocomplete("shift")
+    async def shift_autocomplete(self, interaction: Interaction, current: str):
+        if interaction.guild is None:
+            return []
+        current = current.lower()
+        choices = []
+        seen = set()
+        # Shifts in memory first (running ones at the top), then the latest ended ones on disk
+        live = sorted(
+            (s for s in active_shifts.values() if s.guild_id == interaction.guild.id),
+            key=lambda s: (s.ended, -s.start)
+        )
+        for s in live:
+            if current in s.title.lower():
+                label = "ended" if s.ended else "running"
+                choices.append(app_commands.Choice(name=f"{s.title} ({label}, {from_epoch(s.start):%Y-%m-%d %H:%M})"[:100],
+                                                   value=s.shift_id))
+                seen.add(s.shift_id)
+        if len(choices) < 25:
+            try:
+                # No flush per keystroke: a shift that ended in the last second is listed from memory above
+                rows = await self.reader.query(store.recent_ended_shifts, interaction.guild.id, 25, fresh=False)
+            except Exception as e:
+                log.warning("Could not list ended shifts: %s", e, extra={"guild": interaction.guild.id})
+                rows = []
+            for sid, title, end_time in rows:
+                if sid not in seen and current in title.lower():
+                    choices.append(app_commands.Choice(
+                        name=f"{title} (ended {from_epoch(end_time):%Y-%m-%d %H:%M})"[:100], value=sid))
+        return choices[:25]
+
+    async def cog_unload(self):
+        global render_pool
+        self.reader.close()
+        if render_pool is not None:
+            render_pool.shutdown(wait=False, cancel_futures=True)
+            render_pool = None
+
+async def setup(bot):
+    await bot.add_cog(ClockInTimeline(bot))
+    log.info("Loaded extension: commands.clockintimeline")
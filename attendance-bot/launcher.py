@@ -0,0 +1,125 @@
+"""Run the bot as several processes, each one connected to a range of shards.
+
+Every process is main.py with SHARD_COUNT/SHARD_IDS set, so it only
+receives (and only keeps state for) the guilds on its shards. They share
+the shift database; each one journals in its own directory. Run from
+attendance-bot/:
+
+    python launcher.py --processes 4 --shard-count 8
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import subprocess
+from dotenv import load_dotenv
+from utils.log import setup_logging
+from utils.sharding import split_shards, format_shard_ids
+
+log = logging.getLogger("launcher")
+
+IDENTIFY_INTERVAL = 5.0  # Discord allows one gateway identify per 5 seconds (max_concurrency 1)
+RESTART_DELAY = 5.0  # First wait before restarting a process that crashed, doubling up to RESTART_DELAY_MAX
+RESTART_DELAY_MAX = 300.0
+HEALTHY_UPTIME = 600.0  # A process up this long counts as recovered: its next crash restarts after RESTART_DELAY again
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def process_env(shard_ids, shard_count, index):
+    env = dict(os.environ)
+    env["SHARD_COUNT"] = str(shard_count)
+    env["SHARD_IDS"] = format_shard_ids(shard_ids)
+    if env.get("METRICS_PORT"):
+        env["METRICS_PORT"] = str(int(env["METRICS_PORT"]) + index)  # One endpoint per process
+    return env
+
+class ShardProcess:
+    def __init__(self, index, shard_ids, shard_count):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.popen = None
+        self.restarts = 0
+        self.restart_at = None  # Monotonic time of the next restart, while waiting for it
+        self.started_at = None  # Monotonic time of the last start
+
+    def start(self):
+        self.popen = subprocess.Popen(
+            [sys.executable, "main.py"], env=process_env(self.shard_ids, self.shard_count, self.index),
+            start_new_session=True  # Ctrl+C reaches the launcher only, which passes it on once
+        )
+        self.restart_at = None
+        self.started_at = time.monotonic()
+        log.info("Started shards %s (pid %d)", format_shard_ids(self.shard_ids), self.popen.pid,
+                 extra={"shards": self.shard_ids})
+
+class Launcher:
+    def __init__(self, processes, shard_count):
+        self.children = [
+            ShardProcess(i, shard_ids, shard_count) for i, shard_ids in enumerate(split_shards(shard_count, processes))
+        ]
+        self.stopping = False
+
+    def stop(self, signum=None, frame=None):
+        # SIGINT makes bot.run() close the bot, which runs main.py's shutdown pipeline (drain, flush)
+        self.stopping = True
+        for child in self.children:
+            if child.popen is not None and child.popen.poll() is None:
+                child.popen.send_signal(signal.SIGINT)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for child in self.children:
+            if self.stopping:
+                break
+            child.start()
+            # Staggered, so the identifies of every shard stay under the gateway's rate
+            time.sleep(IDENTIFY_INTERVAL * len(child.shard_ids))
+        while True:
+            alive = False
+            for child in self.children:
+                if child.popen is None:
+                    continue
+                code = child.popen.poll()
+                if code is None:
+                    alive = True
+                    if child.restarts and time.monotonic() - child.started_at >= HEALTHY_UPTIME:
+                        child.restarts = 0
+                    continue
+                if self.stopping or code == 0:
+                    continue
+                alive = True  # Waiting for its restart
+                if child.restart_at is None:
+                    delay = min(RESTART_DELAY_MAX, RESTART_DELAY * 2 ** child.restarts)
+                    child.restarts += 1
+                    child.restart_at = time.monotonic() + delay
+                    log.error("Shards %s exited with %d, restarting in %.0fs", format_shard_ids(child.shard_ids), code,
+                              delay, extra={"shards": child.shard_ids})
+                elif time.monotonic() >= child.restart_at:
+                    child.start()
+            if not alive:
+                return 0
+            time.sleep(1.0)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the bot as one process per range of shards.")
+    parser.add_argument("--processes", type=int, default=int(os.environ.get("SHARD_PROCESSES", "2")))
+    parser.add_argument("--shard-count", type=int, default=int(os.environ.get("SHARD_COUNT") or 0),
+                        help="Total shards across every process (default: one per process)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    load_dotenv()
+    setup_logging()
+    args = parse_args(argv)
+    shard_count = args.shard_count or args.processes
+    launcher = Launcher(args.processes, shard_count)
+    log.info("Running %d shard(s) in %d process(es)", shard_count, len(launcher.children))
+    return launcher.run()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,123 +5,192 @@ from dotenv import load_dotenv
 import os
 import asyncio
 import sys
+from utils.log import setup_logging
+from utils.moderation import ModerationEngine, ModerationQueue
+from utils.command_sync import CommandSyncManager
+from utils.shutdown import ShutdownPipeline, gather_bounded
+from utils.sharding import Partition
+from utils import metrics
 
-# Load environment variables and bot token
-dotenv_loaded = load_dotenv()  # <--- Apenas chama .env sem caminho explícito
-
-# Tenta obter o token de 'TOKEN', se não, tenta 'DISCORD_TOKEN'
-token = os.environ.get("TOKEN")
-if token is None or len(str(token).strip()) == 0:
-    # Diagnóstico extra para casos onde existe 'DISCORD_TOKEN' e não 'TOKEN'
-    alt_token = os.environ.get("DISCORD_TOKEN")
-    if alt_token is not None and len(str(alt_token).strip()) > 0:
-        print("[WARN] Variável de ambiente 'TOKEN' não definida, mas 'DISCORD_TOKEN' foi encontrada.")
-        print("[INFO] Usando 'DISCORD_TOKEN' para iniciar o bot.")
-        token = alt_token
-    else:
-        print("[ERROR] No TOKEN found in environment!")
-        print("Diagnostic details:")
-        print(f"  Did .env load? {dotenv_loaded}")
-        print(f"  Current working directory: {os.getcwd()}")
-        print(f"  .env exists: {os.path.exists('.env')}")
-        print("  Environment variable keys:", list(os.environ.keys()))
-        print("\n[HELP] Certifique-se que existe um ficheiro .env no mesmo diretório que main.py e contém a linha:")
-        print("TOKEN=seu_token_aqui")
-        print("\n[DEBUG] Se estiver numa plataforma que renomeia a variável (ex: Railway, Render, alguns deploys no VSCode), use DISCORD_TOKEN em vez de TOKEN.")
-        sys.exit(1)
+log = logging.getLogger("main")
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Carregar as extensões de forma segura e registar logs honestos.
+# setup_hook corre uma vez, depois do login e antes de ligar ao gateway,
+# por isso as reconexões já não voltam a carregar nem a fazer sync.
+EXTENSIONS = ["commands.clockincreate", "commands.clockinexport", "commands.attendance", "commands.clockintimeline", "commands.clockinremove", "commands.clockinroles", "commands.clockinlog"]
 
-# Carregar só clockincreate.py de forma segura e mostrar prints honestos:
-@bot.event
-async def on_connect(): 
-    # Tenta carregar só a extensão clockincreate (apenas se existir)
-    extension = "commands.clockincreate"
-    try:
-        await bot.load_extension(extension)
-        print(f"✓ Loaded extension: {extension}")
-    except commands.ExtensionAlreadyLoaded:
-        print(f'⚠ Extension already loaded: {extension}')
-    except commands.ExtensionNotFound:
-        print(f'✗ Extension not found: {extension}')
-    except commands.NoEntryPointError:
-        print(f'✗ No setup() entry point in: {extension}')
-    except Exception as e:
-        print(f'✗ Failed to load {extension}: {type(e).__name__}: {e}')
+# Criados em main(), não ao importar: os workers dos gráficos (forkserver/spawn)
+# importam este módulo como __mp_main__ e não podem arrancar outro bot
+bot = None
+partition = None
+moderation = None
+moderation_queue = None
+command_sync = None
+
+def get_token(dotenv_loaded):
+    # Tenta obter o token de 'TOKEN', se não, tenta 'DISCORD_TOKEN'
+    token = os.environ.get("TOKEN")
+    if token is None or len(str(token).strip()) == 0:
+        # Diagnóstico extra para casos onde existe 'DISCORD_TOKEN' e não 'TOKEN'
+        alt_token = os.environ.get("DISCORD_TOKEN")
+        if alt_token is not None and len(str(alt_token).strip()) > 0:
+            log.warning("Variável de ambiente 'TOKEN' não definida, mas 'DISCORD_TOKEN' foi encontrada.")
+            log.info("Usando 'DISCORD_TOKEN' para iniciar o bot.")
+            token = alt_token
+        else:
+            log.error("No TOKEN found in environment!", extra={
+                "dotenv_loaded": dotenv_loaded,
+                "cwd": os.getcwd(),
+                "dotenv_exists": os.path.exists(".env"),
+                "env_keys": list(os.environ.keys())
+            })
+            log.error("Certifique-se que existe um ficheiro .env no mesmo diretório que main.py e contém a linha: TOKEN=seu_token_aqui")
+            log.error("Se estiver numa plataforma que renomeia a variável (ex: Railway, Render, alguns deploys no VSCode), use DISCORD_TOKEN em vez de TOKEN.")
+            sys.exit(1)
+    return token
+
+def create_bot():
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    # Shards: SHARD_COUNT + SHARD_IDS correm só esses shards neste processo (o launcher.py
+    # arranca um processo por grupo de shards); AUTO_SHARD=1 deixa o Discord escolher quantos
+    auto_shard = os.environ.get("AUTO_SHARD", "") not in ("", "0", "false")
+    if partition.shard_ids is not None and not os.environ.get("SHARD_COUNT"):
+        log.error("SHARD_IDS needs SHARD_COUNT (the total number of shards across every process)")
+        sys.exit(1)
+    if os.environ.get("SHARD_COUNT") or auto_shard:
+        return commands.AutoShardedBot(
+            command_prefix="!", intents=intents,
+            shard_count=partition.shard_count if os.environ.get("SHARD_COUNT") else None,
+            shard_ids=partition.shard_ids, http_trace=metrics.rate_limit_trace()
+        )
+    return commands.Bot(command_prefix="!", intents=intents, http_trace=metrics.rate_limit_trace())  # Conta os 429
 
-    # Synca e mostra os slash commands registados
-    await asyncio.sleep(1)  # Permitir o registo dos comandos
+async def setup_hook():
+    for extension in EXTENSIONS:
+        try:
+            await bot.load_extension(extension)
+            log.info("Loaded extension: %s", extension)
+        except commands.ExtensionAlreadyLoaded:
+            log.info("Extension already loaded: %s", extension)
+        except commands.ExtensionNotFound:
+            log.error("Extension not found: %s", extension)
+        except commands.NoEntryPointError:
+            log.error("No setup() entry point in: %s", extension)
+        except Exception as e:
+            log.exception("Failed to load %s: %s: %s", extension, type(e).__name__, e)
+
+    # Mostra os slash commands registados e só faz sync dos âmbitos que mudaram
     tree_commands = bot.tree.get_commands()
-    if tree_commands:
-        print('\n[Tree] Registered commands in app_commands tree:')
-        for c in tree_commands:
-            print(f'  /{c.name} - {c.description}')
+    log.info("Registered commands in app_commands tree: %s",
+             ", ".join(f"/{c.name}" for c in tree_commands) or "[nenhum slash command registado]")
+    if not partition.owns_shard(0):
+        # Os comandos são globais: só o processo do shard 0 faz sync
+        log.info("Command sync left to the process running shard 0")
     else:
-        print('\n[Tree] Registered commands in app_commands tree:')
-        print('  [nenhum slash command registado]')
-    print('\n[Tree] Syncing application commands...')
-    try:
-        await bot.tree.sync()
-    except Exception as e:
-        print(f'[WARN] Failed syncing slash commands: {e}')
+        command_sync.load(bot.application_id)
+        synced = await command_sync.sync()
+        if synced:
+            log.info("Synced application commands for: %s", ", ".join(synced))
+        else:
+            log.info("Application commands unchanged, skipping sync")
     if not tree_commands:
-        print('[WARN] No slash commands found: are they registered in your Cogs?')
+        log.warning("No slash commands found: are they registered in your Cogs?")
 
-@bot.event
 async def on_ready():
-    print(f'Bot is online as {bot.user} (ID: {bot.user.id})')
-    print("Guilds:", [guild.name for guild in bot.guilds])
+    log.info("Bot is online as %s (ID: %s)", bot.user, bot.user.id,
+             extra={"guilds": [guild.name for guild in bot.guilds], "shards": partition.shard_ids or "all"})
 
-@bot.event
 async def on_message(message):
     if message.author.bot:
         return
-    # Block the number 67
-    if '67' in message.content.lower():
-        await message.delete()
-        await message.channel.send(f'{message.author.mention}, please do not say the number 67 in this server.')
+    # Block the configured terms (by default, the number 67)
+    violation = moderation.check(message)
+    if violation is not None:
+        moderation_queue.enqueue(message, violation)  # Não espera pelo delete/send
     await bot.process_commands(message)
 
-# -- CLEAR SLASH COMMANDS ON SHUTDOWN --
-async def clear_commands_on_shutdown():
-    """Remove all slash (app) commands for all guilds and globally before bot closes."""
+# -- SHUTDOWN --
+# Limpar os comandos ao desligar é opcional (CLEAR_COMMANDS_ON_SHUTDOWN): com o sync
+# por hash ficam registados e o próximo arranque só faz sync do que mudou. Limpos,
+# o hash da árvore vazia fica guardado e o próximo arranque volta a fazer sync de tudo.
+# Limpar também cada servidor é outra opção: os comandos deste bot são globais.
+CLEAR_COMMANDS_ON_SHUTDOWN = os.environ.get("CLEAR_COMMANDS_ON_SHUTDOWN", "") not in ("", "0", "false")
+CLEAR_GUILD_COMMANDS_ON_SHUTDOWN = os.environ.get("CLEAR_GUILD_COMMANDS_ON_SHUTDOWN", "") not in ("", "0", "false")
+
+async def drain_pending_work():
+    """Flush shift state, pending embed edits and queued moderation actions."""
+    cog = bot.get_cog("ClockInCreate")
+    if cog is not None:
+        await cog.drain()  # Primeiro: o estado dos turnos não pode ficar à espera da fila de moderação
+    await moderation_queue.close()
+
+async def clear_guild_commands(guild):
     try:
-        print('\n[Shutdown] Clearing app_commands before shutdown...')
-        if bot.guilds:
-            for guild in bot.guilds:
-                try:
-                    bot.tree.clear_commands(guild=guild)
-                    await asyncio.wait_for(bot.tree.sync(guild=guild), timeout=3.0)
-                    print(f'✓ Cleared commands for guild: {guild.name}')
-                except asyncio.TimeoutError:
-                    print(f'⚠ Timeout clearing commands for guild: {guild.name}')
-                except Exception as e:
-                    print(f'✗ Failed clearing for guild {guild.name}: {e}')
-        # Global
-        try:
-            bot.tree.clear_commands(guild=None)
-            await asyncio.wait_for(bot.tree.sync(), timeout=3.0)
-            print('✓ Cleared global commands')
-        except asyncio.TimeoutError:
-            print('⚠ Timeout clearing global commands')
-        except Exception as e:
-            print(f'✗ Failed clearing global commands: {e}')
-        print('[Shutdown] Done clearing commands')
+        bot.tree.clear_commands(guild=guild)
+        await asyncio.wait_for(command_sync.sync_scope(guild), timeout=3.0)
+        log.info("Cleared commands for guild: %s", guild.name, extra={"guild": guild.id})
+    except asyncio.TimeoutError:
+        log.warning("Timeout clearing commands for guild: %s", guild.name, extra={"guild": guild.id})
     except Exception as e:
-        print(f'[Shutdown] Error clearing commands: {e}')
+        log.warning("Failed clearing for guild %s: %s", guild.name, e, extra={"guild": guild.id})
+
+async def clear_commands_on_shutdown():
+    """Remove slash (app) commands globally and/or for every guild, as enabled, before bot closes."""
+    if not partition.owns_shard(0):
+        return  # Os outros processos de shards continuam a usar os comandos globais
+    log.info("Clearing app_commands before shutdown...")
+    if CLEAR_COMMANDS_ON_SHUTDOWN:
+        await clear_global_commands()
+    if CLEAR_GUILD_COMMANDS_ON_SHUTDOWN and bot.guilds:
+        # Em paralelo, no máximo SHUTDOWN_CONCURRENCY de cada vez
+        await gather_bounded(clear_guild_commands(guild) for guild in bot.guilds)
+    log.info("Done clearing commands")
 
-# Monkeypatch .close to clear slash commands on shutdown (if possible)
-_original_close = bot.close
-async def close_and_clear():
+async def clear_global_commands():
     try:
-        await clear_commands_on_shutdown()
+        bot.tree.clear_commands(guild=None)
+        await asyncio.wait_for(command_sync.sync_scope(None), timeout=3.0)
+        log.info("Cleared global commands")
+    except asyncio.TimeoutError:
+        log.warning("Timeout clearing global commands")
     except Exception as e:
-        print(f'Error during clear_commands_on_shutdown: {e}')
-    finally:
-        await _original_close()
-bot.close = close_and_clear
+        log.warning("Failed clearing global commands: %s", e)
+
+def main():
+    global bot, partition, moderation, moderation_queue, command_sync
+    # Load environment variables and bot token
+    dotenv_loaded = load_dotenv()  # <--- Apenas chama .env sem caminho explícito
+    setup_logging()  # Depois do .env, para ler LOG_LEVEL/LOG_LEVELS/LOG_FORMAT
+    token = get_token(dotenv_loaded)
+
+    partition = Partition.from_env()
+    bot = create_bot()
+    moderation = ModerationEngine()  # Regras por servidor em moderation.json (MODERATION_RULES_PATH), recarregadas quando mudam
+    moderation_queue = ModerationQueue()  # Apaga em bloco e avisa uma vez por rajada
+    command_sync = CommandSyncManager(bot.tree)  # Só faz sync quando os comandos mudaram (command-sync.json)
+    for handler in (setup_hook, on_ready, on_message):
+        bot.event(handler)
+
+    # Drena primeiro (o estado dos turnos importa mais), depois, se pedido, limpa os
+    # comandos; tudo dentro de SHUTDOWN_DEADLINE segundos
+    shutdown = ShutdownPipeline()
+    shutdown.add("drain", drain_pending_work)
+    if CLEAR_COMMANDS_ON_SHUTDOWN or CLEAR_GUILD_COMMANDS_ON_SHUTDOWN:
+        shutdown.add("commands", clear_commands_on_shutdown)
+
+    # Monkeypatch .close to run the shutdown pipeline first
+    original_close = bot.close
+    async def close_and_clear():
+        try:
+            await shutdown.run()
+        finally:
+            await original_close()
+    bot.close = close_and_clear
+
+    # log_handler=None: logging is already set up by setup_logging()
+    bot.run(token, log_handler=None)
 
-bot.run(token)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
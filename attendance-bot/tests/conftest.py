@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the bot's packages (utils, commands, bench) the way main.py does
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BOT_DIR not in sys.path:
+    sys.path.insert(0, BOT_DIR)
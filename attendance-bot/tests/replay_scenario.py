@@ -0,0 +1,71 @@
+"""Phases of a bot that crashes and restarts, one process each; driven by test_storage.py.
+
+    run <out>   open shifts, snapshot halfway, journal the rest, dump the live state, crash
+    load <out>  recover from snapshot + journal, dump the state, snapshot it all, crash
+"""
+import os
+import sys
+import json
+import asyncio
+import commands.clockincreate as c
+from bench.fakes import FakeBot
+from utils.models import Shift
+
+T0 = 1_700_000_000.0
+GUILD = 1 << 22
+
+def dump_state(path):
+    state = {
+        "shifts": {
+            sid: {
+                "roster": shift.roster,
+                "attendees": {
+                    str(uid): [a.join, a.leave, a.present_seconds, a.open_since, a.sessions()]
+                    for uid, a in shift.attendees.items()
+                }
+            }
+            for sid, shift in c.active_shifts.items()
+        },
+        "graces": {str(uid): info for uid, info in c.grace_periods.items()},
+        "outbox": sorted(c.outbox.items)
+    }
+    with open(path, "w") as f:
+        json.dump(state, f, sort_keys=True)
+
+def open_shift(sid):
+    shift = Shift(shift_id=sid, guild_id=GUILD, host=1, title=sid, min_attendance=0.5, grace_seconds=3600,
+                  voice=2, start=T0, channel_id=3, message_id=4)
+    c.shift_opened(shift)
+    return shift
+
+async def run(out):
+    await c.ClockInCreate(FakeBot()).cog_load()
+    a = open_shift(f"{GUILD}-1")
+    b = open_shift(f"{GUILD}-2")
+    for uid in (11, 12, 13, 14):
+        c.attendee_joined(a, uid, T0 + uid)
+    c.attendee_joined(b, 21, T0 + 5)
+    c.attendee_voice_left(a, 12, T0 + 30)
+    c.attendee_left(a, 13, T0 + 40)
+    await c.store.flush()  # Snapshot; everything below is only in the journal
+    c.attendee_voice_returned(a, 12, T0 + 50)
+    c.attendee_voice_left(a, 14, T0 + 60)
+    c.attendee_joined(a, 15, T0 + 70)
+    c.attendee_voice_left(a, 11, T0 + 72)
+    c.attendee_removed(a, 11)  # Also ends the grace period it was in
+    c.shift_finished(b, T0 + 80)
+    c.results_queued(b.shift_id, GUILD, {"embed": {}, "pages": False, "channel_id": 3, "summary": {}})
+    c.shift_evicted(b.shift_id)  # As end_shift does once the closing edit is out
+    await c.journal.flush()
+    dump_state(out)
+    os._exit(0)  # Crash: no store flush
+
+async def load(out):
+    await c.ClockInCreate(FakeBot()).cog_load()
+    dump_state(out)
+    await c.store.flush()
+    os._exit(0)
+
+if __name__ == "__main__":
+    phase, out = sys.argv[1], sys.argv[2]
+    asyncio.run(run(out) if phase == "run" else load(out))
@@ -0,0 +1,24 @@
+import json
+from types import SimpleNamespace
+from utils.moderation import ModerationEngine, DEFAULT_WARNING
+
+def message(guild_id, content):
+    return SimpleNamespace(guild=SimpleNamespace(id=guild_id), channel=SimpleNamespace(id=1),
+                           author=SimpleNamespace(mention="<@9>", roles=()), content=content)
+
+def test_bad_warning_templates_fall_back_to_the_default(tmp_path):
+    path = tmp_path / "moderation.json"
+    path.write_text(json.dumps({
+        "default": {"terms": ["67"], "warning": "{user}, stop"},
+        "guilds": {
+            "2": {"terms": ["spoiler"], "warning": "{0} {mention"},
+            "3": {"terms": ["spoiler"], "warning": "{mention.name}"},
+            "4": {"terms": ["spoiler"], "warning": "{mention}: no {term}!"},
+        }
+    }))
+    engine = ModerationEngine(str(path))
+    assert engine.check(message(1, "i said 67")).warning == DEFAULT_WARNING.format(mention="<@9>")
+    assert engine.check(message(2, "SPOILER")).warning == DEFAULT_WARNING.format(mention="<@9>")
+    assert engine.check(message(3, "spoiler")).warning == DEFAULT_WARNING.format(mention="<@9>")
+    assert engine.check(message(4, "a spoiler")).warning == "<@9>: no spoiler!"
+    assert engine.check(message(4, "nothing here")) is None
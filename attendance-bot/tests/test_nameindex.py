@@ -0,0 +1,54 @@
+import random
+from utils.nameindex import NameIndex, normalize_name
+
+def test_normalize_name():
+    assert normalize_name("  José   ÁLVARES ") == "jose alvares"
+
+def test_search_by_name_and_later_words():
+    index = NameIndex()
+    index.add(1, "John Smith")
+    index.add(2, "Smithers")
+    index.add(3, "Zoë")
+    assert sorted(index.search("smi")) == [(1, "John Smith"), (2, "Smithers")]
+    assert index.search("jo") == [(1, "John Smith")]
+    assert index.search("zoe") == [(3, "Zoë")]
+    assert index.search("x") == []
+    assert len(index.search("", limit=2)) == 2
+
+def test_remove_and_rename():
+    index = NameIndex()
+    index.add(1, "John Smith")
+    index.add(2, "John Smith")
+    assert sorted(index.exact("john  SMITH")) == [1, 2]
+    index.remove(1)
+    assert 1 not in index
+    assert index.exact("John Smith") == [2]
+    assert index.exact("Smith") == []  # A later word is not the whole name
+    index.add(2, "Jane Doe")
+    assert index.search("smith") == []
+    assert index.search("doe") == [(2, "Jane Doe")]
+    index.remove(2)
+    index.remove(2)  # Removing twice is a no-op
+    assert len(index) == 0
+    assert index.keys == []
+
+def test_matches_a_linear_scan():
+    rng = random.Random(7)
+    words = ["ana", "anabel", "bo", "bob", "carl", "carla", "dé"]
+    index = NameIndex()
+    names = {}
+    for step in range(400):
+        user_id = rng.randrange(60)
+        if rng.random() < 0.3:
+            index.remove(user_id)
+            names.pop(user_id, None)
+        else:
+            name = " ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+            index.add(user_id, name)
+            names[user_id] = name
+        prefix = rng.choice(words)[:rng.randint(1, 3)]
+        expected = {
+            uid for uid, name in names.items()
+            if any(normalize_name(w).startswith(normalize_name(prefix)) for w in name.split())
+        }
+        assert {uid for uid, _ in index.search(prefix, limit=1000)} == expected
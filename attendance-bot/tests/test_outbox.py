@@ -0,0 +1,108 @@
+import time
+import asyncio
+import pytest
+from utils.outbox import Outbox
+
+class RecordingStore:
+    def __init__(self):
+        self.saved = {}
+        self.dropped = []
+
+    def save_outbound(self, item):
+        self.saved[item["shift_id"]] = dict(item)
+
+    def drop_outbound(self, shift_id):
+        self.dropped.append(shift_id)
+
+def run_outbox(deliver, items, wait, **kwargs):
+    async def run():
+        store = RecordingStore()
+        finished = []
+        outbox = Outbox(store, on_done=lambda item: finished.append(item["shift_id"]), **kwargs)
+        outbox.scheduler.slack = 0.01  # Keep the test short; batching has its own test
+        outbox.start(lambda guild_id, group: deliver(outbox, guild_id, group))
+        for shift_id, guild_id in items:
+            outbox.enqueue(shift_id, guild_id, {"shift": shift_id})
+        await asyncio.sleep(wait)
+        outbox.stop()
+        return outbox, store, finished
+
+    return asyncio.run(run())
+
+def test_retries_with_backoff_until_delivered():
+    calls = []
+
+    async def deliver(outbox, guild_id, group):
+        calls.append([item["shift_id"] for item in group])
+        if len(calls) < 3:
+            raise RuntimeError("503")
+        outbox.done(group)
+
+    outbox, store, finished = run_outbox(deliver, [("s1", 1)], wait=0.6, base_delay=0.05, max_delay=1.0)
+    assert calls == [["s1"], ["s1"], ["s1"]]
+    assert len(outbox) == 0
+    assert finished == ["s1"]
+    assert store.saved["s1"]["attempts"] == 2  # Each failure is written back with its next attempt
+    assert store.dropped == ["s1"]
+
+def test_gives_up_after_max_attempts():
+    calls = []
+
+    async def deliver(outbox, guild_id, group):
+        calls.append(guild_id)
+        raise RuntimeError("gone")
+
+    outbox, store, finished = run_outbox(deliver, [("s1", 1)], wait=0.5, base_delay=0.02, max_attempts=3)
+    assert len(calls) == 3
+    assert finished == ["s1"]
+    assert len(outbox) == 0
+
+def test_digest_groups_a_guild_results():
+    groups = []
+
+    async def deliver(outbox, guild_id, group):
+        groups.append((guild_id, sorted(item["shift_id"] for item in group)))
+        outbox.done(group)
+
+    digest = {1: 0.15, 2: 0}
+    outbox, store, finished = run_outbox(
+        deliver, [("a", 1), ("b", 2), ("c", 1), ("d", 1)], wait=0.5,
+        digest_seconds=lambda guild_id: digest[guild_id])
+    # Guild 2 posts each result on its own right away; guild 1 once, with all three
+    assert sorted(groups) == [(1, ["a", "c", "d"]), (2, ["b"])]
+    assert groups[0] == (2, ["b"])
+    assert sorted(finished) == ["a", "b", "c", "d"]
+
+def test_load_rearms_recovered_items():
+    delivered = []
+
+    async def run():
+        outbox = Outbox(RecordingStore())
+        outbox.scheduler.slack = 0.01
+        outbox.load([{"shift_id": "s1", "guild_id": 1, "payload": {}, "attempts": 2, "next_attempt": 0}])
+
+        async def deliver(guild_id, group):
+            delivered.extend(item["attempts"] for item in group)
+            outbox.done(group)
+
+        outbox.start(deliver)
+        await asyncio.sleep(0.2)
+        outbox.stop()
+
+    asyncio.run(run())
+    assert delivered == [2]
+
+@pytest.mark.parametrize("attempts", [1, 4])
+def test_backoff_is_capped(attempts):
+    outbox = Outbox(RecordingStore(), base_delay=1.0, max_delay=3.0)
+    item = {"shift_id": "s", "guild_id": 1, "payload": {}, "attempts": attempts - 1, "next_attempt": 0}
+    outbox.items["s"] = item
+
+    async def run():
+        outbox._retry([item], RuntimeError("x"))
+        outbox.stop()
+        return item["next_attempt"]
+
+    delay = asyncio.run(run()) - time.time()
+    expected = min(3.0, 2 ** (attempts - 1))
+    assert expected * 0.8 - 0.05 <= delay <= expected * 1.2
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import asyncio
+import subprocess
+from types import SimpleNamespace
+from utils.models import Shift, Attendee
+from utils.storage import ShiftStore, GUILD_SETTINGS
+from utils.permissions import RolePermissions
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIO = os.path.join(BOT_DIR, "tests", "replay_scenario.py")
+
+def make_shift(sid="1-1"):
+    shift = Shift(shift_id=sid, guild_id=1 << 22, host=1, title="Patrol", min_attendance=0.5, grace_seconds=300,
+                  voice=2, start=1000.0, channel_id=3, message_id=4)
+    closed = Attendee(join=1000.0, leave=1300.0, present_seconds=250.0)
+    closed.spans.extend([1000.0, 1200.0, 1250.0, 1300.0])
+    shift.add_attendee(10, closed)
+    shift.add_attendee(20, Attendee(join=1100.0, open_since=1100.0))
+    return shift
+
+def test_flush_and_reload(tmp_path):
+    path = str(tmp_path / "shifts.db")
+
+    async def write():
+        store = ShiftStore(path)
+        store.open()
+        shift = make_shift()
+        store.save_shift(shift)
+        for uid in shift.attendees:
+            store.save_attendee(shift, uid)
+        store.save_grace(20, shift.shift_id, 1150.0)
+        store.save_grace(20, "1-other", 1160.0)  # Same user in another shift: its own row
+        await store.flush()
+        store.drop_grace(20, "1-other")
+        await store.flush()
+        assert not store.has_pending()
+        await store.close()
+
+    asyncio.run(write())
+    store = ShiftStore(path)
+    store.open()
+    shifts, graces = store.load_open_shifts()
+    expected = make_shift()
+    loaded = shifts[expected.shift_id]
+    assert loaded.roster == expected.roster
+    for uid, attendee in expected.attendees.items():
+        got = loaded.attendees[uid]
+        assert (got.join, got.leave, got.present_seconds, got.open_since) == \
+               (attendee.join, attendee.leave, attendee.present_seconds, attendee.open_since)
+        assert got.sessions() == attendee.sessions()
+    assert graces == [(20, expected.shift_id, 1150.0)]
+    store.conn.close()
+
+def run_phase(tmp_path, phase, out):
+    env = dict(os.environ, SHIFT_DB_PATH=str(tmp_path / "shifts.db"), SHIFT_JOURNAL_DIR=str(tmp_path / "journal"),
+               PYTHONPATH=BOT_DIR, METRICS_PORT="", SHARD_COUNT="", SHARD_IDS="")
+    subprocess.run([sys.executable, SCENARIO, phase, str(out)], cwd=BOT_DIR, env=env, check=True,
+                   capture_output=True, timeout=60)
+    with open(out) as f:
+        return json.load(f)
+
+def test_crash_replay_matches_live_state(tmp_path):
+    # Live state at the crash == snapshot + journal replay == a fresh snapshot of that
+    live = run_phase(tmp_path, "run", tmp_path / "live.json")
+    replayed = run_phase(tmp_path, "load", tmp_path / "replayed.json")
+    reloaded = run_phase(tmp_path, "load", tmp_path / "reloaded.json")
+    assert replayed == live
+    assert reloaded == live
+    assert live["outbox"], "the results queued after the snapshot must survive the crash"
+    assert set(live["graces"]) == {"14"}
+    assert list(live["shifts"]) == [f"{1 << 22}-1"], "the ended shift must leave active_shifts"
+
+def test_manager_roles_configured_but_empty(tmp_path):
+    path = str(tmp_path / "shifts.db")
+    gid = 1 << 22
+
+    async def write():
+        store = ShiftStore(path)
+        store.open()
+        store.save_guild_settings(gid, dict(GUILD_SETTINGS, managers_configured=True))  # Every role deleted
+        store.save_guild_settings(gid + 1, dict(GUILD_SETTINGS))  # Never configured
+        await store.flush()
+        # A row written before managers_configured existed: its roles mean it was configured
+        store.conn.execute("INSERT INTO guild_settings (guild_id, manager_roles) VALUES (?, '[5]')", (gid + 2,))
+        store.conn.commit()
+        await store.close()
+
+    asyncio.run(write())
+    store = ShiftStore(path)
+    store.open()
+    settings = store.load_guild_settings()
+    store.conn.close()
+    assert settings[gid]["managers_configured"] and settings[gid]["manager_roles"] == []
+    assert not settings[gid + 1]["managers_configured"]
+    assert settings[gid + 2]["managers_configured"] and settings[gid + 2]["manager_roles"] == [5]
+
+    permissions = RolePermissions("brotato")
+    permissions.load({g: s["manager_roles"] if s["managers_configured"] else None for g, s in settings.items()})
+    brotato = SimpleNamespace(id=7, name="Brotato")
+    assert permissions.role_ids(SimpleNamespace(id=gid, roles=[brotato])) == frozenset()
+    assert permissions.role_ids(SimpleNamespace(id=gid + 1, roles=[brotato])) == {7}
@@ -0,0 +1,43 @@
+import random
+import pytest
+from utils.timeline import PresenceIndex
+
+def brute_force(intervals, t):
+    return sorted(uid for start, end, uid in intervals if start <= t < end)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    intervals = []
+    for uid in range(80):
+        t = rng.randrange(0, 50)
+        for _ in range(rng.randint(1, 4)):
+            start = t + rng.randrange(0, 20)
+            end = start + rng.randrange(0, 30)  # Some are empty and must be ignored
+            intervals.append((start, end, uid))
+            t = end  # Back to back on purpose: an end time equal to the next start
+    index = PresenceIndex(intervals)
+    kept = [iv for iv in intervals if iv[1] > iv[0]]
+    assert len(index) == len(kept)
+    probes = {t for start, end, _ in kept for t in (start - 1, start, end - 0.5, end)}
+    probes.update(rng.uniform(-10, 250) for _ in range(50))
+    for t in sorted(probes):
+        expected = brute_force(kept, t)
+        assert index.present_at(t) == expected
+        assert index.headcount(t) == len(expected)
+    best, start, _ = index.peak()
+    assert best == max(len(brute_force(kept, t)) for t in probes)
+    assert index.headcount(start) == best
+
+def test_back_to_back_sessions_count_once():
+    index = PresenceIndex([(0, 10, 1), (10, 20, 1), (5, 15, 2)])
+    assert index.headcount(10) == 2
+    assert index.present_at(10) == [1, 2]
+    assert index.curve() == [(0, 1), (5, 2), (10, 2), (15, 1), (20, 0)]
+    assert index.peak() == (2, 5, 10)  # Up to the next change point
+
+def test_from_sessions_clips_and_closes_open_sessions():
+    index = PresenceIndex.from_sessions({1: [(0, 30), (40, None)], 2: [(-5, 5)]}, start=0, until=50)
+    assert index.intervals == [(0, 5, 2), (0, 30, 1), (40, 50, 1)]
+    assert index.sample(0, 50, 6) == [2, 1, 1, 0, 1, 0]
+    assert PresenceIndex([]).peak() == (0, None, None)
@@ -0,0 +1,59 @@
+import asyncio
+from utils.timers import DeadlineScheduler
+
+def run_scheduler(arms, slack, wait, cancel=()):
+    # Returns {key: seconds after arming at which it fired}
+    async def run():
+        loop = asyncio.get_running_loop()
+        fired = {}
+
+        async def callback(keys):
+            for key in keys:
+                fired[key] = loop.time() - t0
+
+        scheduler = DeadlineScheduler(slack=slack)
+        t0 = loop.time()
+        for key, delay in arms:
+            scheduler.arm(key, delay)
+        scheduler.start(callback)
+        for key in cancel:
+            assert scheduler.cancel(key)
+        await asyncio.sleep(wait)
+        scheduler.stop()
+        return fired, len(scheduler)
+
+    return asyncio.run(run())
+
+def test_never_fires_early():
+    arms = [("a", 0.05), ("b", 0.12), ("c", 0.2), ("d", 0.4)]
+    fired, pending = run_scheduler(arms, slack=0.1, wait=0.7)
+    assert set(fired) == {"a", "b", "c", "d"}
+    assert pending == 0
+    for key, delay in arms:
+        assert fired[key] >= delay
+        assert fired[key] < delay + 0.1 + 0.1  # At most slack late, plus scheduling jitter
+
+def test_batches_deadlines_within_slack():
+    async def run():
+        batches = []
+
+        async def callback(keys):
+            batches.append(sorted(keys))
+
+        scheduler = DeadlineScheduler(slack=0.1)
+        scheduler.arm("a", 0.05)
+        scheduler.arm("b", 0.1)
+        scheduler.arm("c", 0.4)
+        scheduler.start(callback)
+        await asyncio.sleep(0.7)
+        scheduler.stop()
+        return batches
+
+    assert asyncio.run(run()) == [["a", "b"], ["c"]]
+
+def test_cancel_and_rearm():
+    fired, pending = run_scheduler([("a", 0.05), ("b", 0.05), ("a", 0.15)], slack=0.0, wait=0.3, cancel=("b",))
+    assert set(fired) == {"a"}
+    assert fired["a"] >= 0.15  # Re-arming replaces the earlier deadline
+    assert pending == 0
+    assert not DeadlineScheduler().cancel("missing")
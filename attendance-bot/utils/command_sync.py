@@ -0,0 +1,111 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import discord
+
+log = logging.getLogger(__name__)
+
+COMMAND_SYNC_STATE = os.environ.get("COMMAND_SYNC_STATE", "command-sync.json")
+COMMAND_SYNC_FORCE = os.environ.get("COMMAND_SYNC_FORCE", "") not in ("", "0", "false")
+GLOBAL_SCOPE = "global"
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def scope_key(guild):
+    return GLOBAL_SCOPE if guild is None else str(guild.id)
+
+def payload_hash(payload):
+    # Commands sorted by (type, name) and keys sorted, so the hash only
+    # changes when what Discord would receive changes
+    ordered = sorted(payload, key=lambda c: (c.get("type", 1), c["name"]))
+    encoded = json.dumps(ordered, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+# =========================
+# COMMAND SYNC MANAGER
+# =========================
+class CommandSyncManager:
+    """Syncs the app command tree only for scopes whose payload changed.
+
+    The hash of what was last synced to each scope ("global" or a guild id)
+    is kept in a small JSON file, tagged with the application id so a
+    different bot token starts from scratch. Anything that syncs the tree
+    (including the optional shutdown clear) should go through sync_scope()
+    so the stored hash stays true to what Discord has.
+    """
+
+    def __init__(self, tree, path=COMMAND_SYNC_STATE, force=COMMAND_SYNC_FORCE):
+        self.tree = tree
+        self.path = path
+        self.force = force
+        self.hashes = {}  # {scope: sha256 of the payload last synced}
+        self._application_id = None
+        self._locks = {}  # {scope: asyncio.Lock}, so different scopes can sync concurrently
+
+    def load(self, application_id):
+        self._application_id = application_id
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log.warning("Could not read command sync state from %s: %s", self.path, e)
+            return
+        if state.get("application_id") != application_id:
+            log.info("Command sync state belongs to another application, ignoring it")
+            return
+        self.hashes = dict(state.get("scopes", {}))
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"application_id": self._application_id, "scopes": self.hashes}, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            log.warning("Could not write command sync state to %s: %s", self.path, e)
+
+    async def payload(self, guild=None):
+        commands = self.tree.get_commands(guild=guild)
+        translator = self.tree.translator
+        if translator:
+            return [await command.get_translated_payload(self.tree, translator) for command in commands]
+        return [command.to_dict(self.tree) for command in commands]
+
+    async def sync_scope(self, guild=None):
+        """Sync one scope if its payload changed; returns True if it synced."""
+        key = scope_key(guild)
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            digest = payload_hash(await self.payload(guild))
+            if not self.force and self.hashes.get(key) == digest:
+                return False
+            await self.tree.sync(guild=guild)
+            self.hashes[key] = digest
+            self.save()
+            return True
+
+    async def sync(self, guilds=()):
+        """Sync the global scope plus the given guilds and every guild synced before.
+
+        A guild never synced and without guild commands is left alone.
+        Returns the list of scopes that were synced.
+        """
+        scopes = {GLOBAL_SCOPE: None}
+        for key in self.hashes:
+            if key != GLOBAL_SCOPE:
+                scopes[key] = discord.Object(id=int(key))
+        for guild in guilds:
+            if self.tree.get_commands(guild=guild):
+                scopes.setdefault(str(guild.id), guild)
+        synced = []
+        for key, guild in scopes.items():
+            try:
+                if await self.sync_scope(guild):
+                    synced.append(key)
+            except Exception as e:
+                log.warning("Failed syncing slash commands for scope %s: %s", key, e, extra={"scope": key})
+        return synced
@@ -0,0 +1,262 @@
+import os
+import json
+import struct
+import asyncio
+import hashlib
+import logging
+
+log = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct(">I")  # Payload length
+DIGEST_SIZE = 16
+SEGMENT_PREFIX = "journal-"
+SEGMENT_SUFFIX = ".log"
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def chain_digest(prev_digest, payload):
+    return hashlib.sha256(prev_digest + payload).digest()[:DIGEST_SIZE]
+
+def segment_name(first_seq):
+    return f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}"
+
+def read_frames(path):
+    """Yield (end_offset, payload, digest) for every complete frame of a segment.
+
+    A segment starts with the digest it chains from, yielded first with a
+    None payload; a torn frame at the end (crash mid-write) stops the
+    iteration.
+    """
+    with open(path, "rb") as f:
+        anchor = f.read(DIGEST_SIZE)
+        if len(anchor) < DIGEST_SIZE:
+            return
+        offset = DIGEST_SIZE
+        yield offset, None, anchor
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            (length,) = FRAME_HEADER.unpack(header)
+            payload = f.read(length)
+            digest = f.read(DIGEST_SIZE)
+            if len(payload) < length or len(digest) < DIGEST_SIZE:
+                return
+            offset += FRAME_HEADER.size + length + DIGEST_SIZE
+            yield offset, payload, digest
+
+class JournalCorrupted(Exception):
+    pass
+
+# =========================
+# SHIFT JOURNAL
+# =========================
+class ShiftJournal:
+    """Append-only, length-prefixed, hash-chained log of shift events.
+
+    Each frame is <length><json payload><digest>, where digest chains the
+    previous frame's digest with this payload, so editing or dropping a
+    record breaks every digest after it. Appends only touch an in-memory
+    buffer; a background task writes it out. Segments roll over at
+    segment_bytes and the ones fully covered by a snapshot are pruned,
+    keeping the newest keep_segments of them as the audit trail.
+    """
+
+    def __init__(self, directory, segment_bytes=4 * 1024 * 1024, keep_segments=8,
+                 flush_interval=0.2, fsync=False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.keep_segments = keep_segments
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.last_seq = 0
+        self.replaying = False
+        self._digest = bytes(DIGEST_SIZE)
+        self._buffer = bytearray()
+        self._segment = None  # Path of the segment being written
+        self._segment_size = 0
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    # ---- lifecycle ----
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        if not segments:
+            self._start_segment(1)
+            return
+        # Only the newest segment is read: it holds the chain head and the last seq
+        first_seq, path = segments[-1]
+        seq = first_seq - 1
+        good = 0
+        for offset, payload, digest in read_frames(path):
+            if payload is not None:
+                seq = json.loads(payload)["seq"]
+            self._digest = digest
+            good = offset
+        if good == 0:
+            # Crashed before the anchor was written: chain from the previous segment
+            os.remove(path)
+            self._digest = self._last_digest_of(segments[-2][1]) if len(segments) > 1 else bytes(DIGEST_SIZE)
+            self._start_segment(first_seq)
+            self.last_seq = first_seq - 1
+            return
+        with open(path, "r+b") as f:
+            f.truncate(good)  # Drop a torn tail frame
+        self.last_seq = seq
+        self._segment = path
+        self._segment_size = good
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        except asyncio.CancelledError:
+            pass
+
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    first_seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                except ValueError:
+                    continue
+                found.append((first_seq, os.path.join(self.directory, name)))
+        found.sort()
+        return found
+
+    def _start_segment(self, first_seq):
+        path = os.path.join(self.directory, segment_name(first_seq))
+        with open(path, "wb") as f:
+            f.write(self._digest)
+        self._segment = path
+        self._segment_size = DIGEST_SIZE
+
+    @staticmethod
+    def _last_digest_of(path):
+        digest = bytes(DIGEST_SIZE)
+        for _, _, d in read_frames(path):
+            digest = d
+        return digest
+
+    # ---- writing ----
+    def append(self, record):
+        """Journal one event (a dict); returns its seq. O(1), no I/O."""
+        if self.replaying:
+            return None
+        self.last_seq += 1
+        record["seq"] = self.last_seq
+        payload = json.dumps(record, separators=(",", ":")).encode()
+        self._digest = chain_digest(self._digest, payload)
+        self._buffer += FRAME_HEADER.pack(len(payload))
+        self._buffer += payload
+        self._buffer += self._digest
+        return self.last_seq
+
+    async def flush(self):
+        async with self._lock:
+            if not self._buffer or self._segment is None:
+                return
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            try:
+                await asyncio.to_thread(self._write, data, self.last_seq, self._digest)
+            except Exception as e:
+                # Put the frames back in front of whatever was appended meanwhile: the chain
+                # only holds if they reach the segment, in order, on a later flush
+                self._buffer[:0] = data
+                log.exception("Shift journal flush failed, retrying with the next flush (%d bytes pending): %s",
+                              len(self._buffer), e)
+
+    def _write(self, data, last_seq, digest):
+        try:
+            with open(self._segment, "ab") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        except Exception:
+            # Cut a partial write back off, so the retry does not leave a torn frame mid-segment
+            try:
+                os.truncate(self._segment, self._segment_size)
+            except OSError:
+                pass  # open() drops a torn tail; a torn frame followed by others is reported by verify()
+            raise
+        self._segment_size += len(data)
+        if self._segment_size >= self.segment_bytes:
+            # The next segment chains from the digest of the last frame just written
+            path = os.path.join(self.directory, segment_name(last_seq + 1))
+            try:
+                with open(path, "wb") as f:
+                    f.write(digest)
+            except OSError as e:
+                # The frames are in; keep appending to this segment and roll over on a later flush
+                log.warning("Could not start journal segment %s: %s", path, e)
+                return
+            self._segment = path
+            self._segment_size = DIGEST_SIZE
+
+    async def compact(self, snapshot_seq):
+        """Prune segments whose every record is already in a snapshot."""
+        async with self._lock:
+            await asyncio.to_thread(self._compact, snapshot_seq)
+
+    def _compact(self, snapshot_seq):
+        segments = self.segments()
+        covered = [
+            path for (first_seq, path), (next_first, _) in zip(segments, segments[1:])
+            if next_first - 1 <= snapshot_seq and path != self._segment
+        ]
+        for path in covered[:max(0, len(covered) - self.keep_segments)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.warning("Could not prune journal segment %s: %s", path, e)
+
+    # ---- reading ----
+    def replay(self, after_seq=0):
+        """Yield every record with seq > after_seq, oldest first."""
+        segments = self.segments()
+        start = 0
+        for i, (first_seq, _) in enumerate(segments):
+            if first_seq <= after_seq + 1:
+                start = i
+        for _, path in segments[start:]:
+            for _, payload, _ in read_frames(path):
+                if payload is None:
+                    continue
+                record = json.loads(payload)
+                if record["seq"] > after_seq:
+                    yield record
+
+    def verify(self):
+        """Walk the whole chain; raises JournalCorrupted at the first broken link."""
+        digest = None
+        count = 0
+        for _, path in self.segments():
+            for offset, payload, frame_digest in read_frames(path):
+                if payload is None:
+                    if digest is not None and frame_digest != digest:
+                        raise JournalCorrupted(f"{path}: segment does not chain from the previous one")
+                    digest = frame_digest
+                    continue
+                digest = chain_digest(digest, payload)
+                if digest != frame_digest:
+                    raise JournalCorrupted(f"{path}: digest mismatch in the frame ending at byte {offset}")
+                count += 1
+        return count
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import datetime
+import logging.handlers
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")  # Per-logger overrides: "discord=WARNING,commands.clockincreate=DEBUG"
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")  # "json" (one object per line) or "text"
+LOG_SAMPLE_BURST = int(os.environ.get("LOG_SAMPLE_BURST", "5"))  # Identical warnings let through per window
+LOG_SAMPLE_WINDOW = float(os.environ.get("LOG_SAMPLE_WINDOW", "60"))
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+_listener = None
+
+# =========================
+# FORMATTERS
+# =========================
+def record_fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            extra = " ".join(f"{k}={v}" for k, v in fields.items())
+            # Keep the traceback (if any) on the lines after the fields
+            head, sep, tail = line.partition("\n")
+            line = f"{head} [{extra}]{sep}{tail}"
+        return line
+
+# =========================
+# SAMPLING
+# =========================
+class SamplingFilter(logging.Filter):
+    """Lets through `burst` copies of the same warning per `window` seconds.
+
+    Records are keyed on logger and message template (before %-args are
+    applied), so "Can't edit message for shift %s" is one key whatever the
+    shift. The first record after a suppressed stretch carries a
+    `suppressed` field with how many were dropped. Errors always pass.
+    """
+
+    def __init__(self, burst=LOG_SAMPLE_BURST, window=LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._seen = {}  # {(logger, template): [window_start, count, suppressed]}
+
+    def filter(self, record):
+        if record.levelno != logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        entry = self._seen.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            if len(self._seen) > 1024:
+                self._seen.clear()
+            suppressed = entry[2] if entry else 0
+            self._seen[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if entry[1] < self.burst:
+            entry[1] += 1
+            return True
+        entry[2] += 1
+        return False
+
+# =========================
+# QUEUE PIPELINE
+# =========================
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only fix the message text here; JSON encoding and traceback
+        # formatting happen on the listener thread, off the event loop
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+def setup_logging():
+    """Route all logging through a queue drained by a background thread.
+
+    Callers only pay for a queue put; the formatting and the (possibly
+    slow) write to stdout happen on the listener thread. Safe to call
+    more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    # The filter runs before prepare(), while record.msg is still the template
+    handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    # Flush whatever is still queued; called at exit
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def parse_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.strip().partition("=")
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
@@ -0,0 +1,253 @@
+import os
+import time
+import asyncio
+import logging
+import bisect
+import functools
+import aiohttp
+
+# Buckets in seconds, from a voice event (~µs) to a slow REST edit (~s)
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = os.environ.get("METRICS_PORT", "")  # Empty: no endpoint, metrics are still recorded
+
+log = logging.getLogger(__name__)
+_registry = []  # Every metric family, in registration order
+_server = None
+
+# =========================
+# METRIC TYPES
+# =========================
+# Recording is a plain attribute add (plus a bisect for histograms); label
+# children are meant to be bound once at import time with labels(), so the
+# hot paths never build a label tuple or touch a dict.
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.value = 0
+        self._children = {}
+        _registry.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _CounterChild()
+        return child
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        if not self.labelnames:
+            yield self.name, (), self.value
+            return
+        for values, child in self._children.items():
+            yield self.name, zip(self.labelnames, values), child.value
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._root = None if labelnames else _HistogramChild(self.buckets)
+        _registry.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, seconds):
+        self._root.observe(seconds)
+
+    def time(self):
+        return self._root.time()
+
+    def samples(self):
+        children = [((), self._root)] if self._root is not None else [
+            (tuple(zip(self.labelnames, values)), child) for values, child in self._children.items()
+        ]
+        for labels, child in children:
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                yield self.name + "_bucket", labels + (("le", repr(bound)),), cumulative
+            yield self.name + "_bucket", labels + (("le", "+Inf"),), child.count
+            yield self.name + "_sum", labels, child.sum
+            yield self.name + "_count", labels, child.count
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Per bucket, not cumulative; the last slot is the overflow
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+def timed(histogram):
+    """Decorator: observe the run time of every call of an async function."""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+class Gauge:
+    """Read from a callback at scrape time, so it costs nothing in between.
+
+    The callback returns a number, or an iterable of (label_values, number).
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help_text, callback, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        _registry.append(self)
+
+    def samples(self):
+        value = self.callback()
+        if not self.labelnames:
+            yield self.name, (), value
+            return
+        for values, v in value:
+            yield self.name, zip(self.labelnames, values), v
+
+# =========================
+# EXPOSITION
+# =========================
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for name, labels, value in metric.samples():
+                labels = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{labels}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}")
+        except Exception as e:
+            lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+    return "\n".join(lines) + "\n"
+
+async def _handle(reader, writer):
+    try:
+        request = await asyncio.wait_for(reader.readline(), 5)
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            pass  # Headers are not needed
+        parts = request.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+            status, body = "200 OK", render().encode()
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_server(port=None, host=None):
+    """Serve /metrics on host:port (METRICS_HOST/METRICS_PORT by default).
+
+    Does nothing when no port is configured or a server is already running.
+    """
+    global _server
+    port = port if port is not None else METRICS_PORT
+    if _server is not None or not port:
+        return None
+    _server = await asyncio.start_server(_handle, host or METRICS_HOST, int(port))
+    log.info("Serving Prometheus metrics on http://%s:%s/metrics", host or METRICS_HOST, port)
+    return _server
+
+async def stop_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
+
+# =========================
+# RATE LIMITS
+# =========================
+rate_limited = Counter("discord_rate_limited_total", "429 responses received from the Discord API")
+global_rate_limited = Counter("discord_global_rate_limited_total", "429 responses that hit the global rate limit")
+
+def rate_limit_trace():
+    """aiohttp trace for the bot's HTTP session (Bot(http_trace=...)) that counts every 429.
+
+    Counted as the responses arrive, so the counters do not depend on how
+    discord.http logs its retries or on the level LOG_LEVELS gives it.
+    """
+    async def on_request_end(session, context, params):
+        if params.response.status == 429:
+            rate_limited.inc()
+            if params.response.headers.get("X-RateLimit-Global"):
+                global_rate_limited.inc()
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_end.append(on_request_end)
+    return trace
@@ -0,0 +1,95 @@
+import time
+from array import array
+
+_last_now = 0.0
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def epoch_now():
+    """Epoch seconds (UTC) for shift timestamps; never steps backwards within the process.
+
+    Wall-clock rather than time.monotonic(), because these values are
+    journaled and stored and must still mean the same after a restart.
+    A system clock stepped back only holds the value still until it
+    catches up, so no session ever ends before it started.
+    """
+    global _last_now
+    now = time.time()
+    if now > _last_now:
+        _last_now = now
+    return _last_now
+
+# =========================
+# SHIFT MODELS
+# =========================
+class Attendee:
+    """One member's presence in a shift; every time is epoch seconds.
+
+    Closed sessions are kept as start, end pairs in a flat array('d') (16
+    bytes a session, no tuple or datetime objects); the open session, if
+    any, is only `open_since` until it closes. `present_seconds` is the
+    running total of the closed ones, so scoring never walks `spans`.
+    """
+
+    __slots__ = ("join", "leave", "present_seconds", "open_since", "spans")
+
+    def __init__(self, join, leave=None, present_seconds=0.0, open_since=None):
+        self.join = join
+        self.leave = leave
+        self.present_seconds = present_seconds
+        self.open_since = open_since
+        self.spans = array("d")
+
+    def session_count(self):
+        return len(self.spans) // 2 + (self.open_since is not None)
+
+    def sessions(self, first=0):
+        """[(start, end)] from session `first` on, the open one last with end None."""
+        spans = self.spans
+        result = [(spans[i], spans[i + 1]) for i in range(2 * first, len(spans), 2)]
+        if self.open_since is not None:
+            result.append((self.open_since, None))
+        return result
+
+class Shift:
+    """A clock-in shift. start/end_time are epoch seconds; embed/message are the live Discord objects.
+
+    `roster` lists the attendee ids in join order (the same order as
+    `attendees`), so one page of the roster is a slice instead of a walk
+    over every attendee. Attendees are only added and removed through
+    add_attendee()/remove_attendee() to keep the two in step.
+    """
+
+    __slots__ = (
+        "shift_id", "guild_id", "host", "title", "min_attendance", "grace_seconds", "voice",
+        "channel_id", "message_id", "start", "end_time", "ended", "attendees", "roster", "embed", "message"
+    )
+
+    def __init__(self, shift_id, guild_id, host, title, min_attendance, grace_seconds, voice, start,
+                 channel_id=None, message_id=None, end_time=None, ended=False, embed=None, message=None):
+        self.shift_id = shift_id
+        self.guild_id = guild_id
+        self.host = host
+        self.title = title
+        self.min_attendance = min_attendance
+        self.grace_seconds = grace_seconds
+        self.voice = voice
+        self.start = start
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.end_time = end_time
+        self.ended = ended
+        self.attendees = {}  # {user_id: Attendee}, in join order
+        self.roster = []  # [user_id], in join order
+        self.embed = embed
+        self.message = message
+
+    def add_attendee(self, user_id, attendee):
+        if user_id not in self.attendees:
+            self.roster.append(user_id)
+        self.attendees[user_id] = attendee
+
+    def remove_attendee(self, user_id):
+        del self.attendees[user_id]
+        self.roster.remove(user_id)
@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+MODERATION_RULES_PATH = os.environ.get("MODERATION_RULES_PATH", "moderation.json")
+MODERATION_RELOAD_INTERVAL = float(os.environ.get("MODERATION_RELOAD_INTERVAL", "5"))  # Seconds between mtime checks
+MODERATION_FLUSH_DELAY = float(os.environ.get("MODERATION_FLUSH_DELAY", "1.0"))  # Seconds a channel's burst is gathered for
+MODERATION_WARN_WINDOW = float(os.environ.get("MODERATION_WARN_WINDOW", "30"))  # At most one warning per user per channel per window
+BULK_DELETE_LIMIT = 100  # Discord's cap for one bulk delete
+
+# Used when the rules file does not exist: the original hard-coded filter
+DEFAULT_RULES = {
+    "default": {
+        "terms": ["67"],
+        "warning": "{mention}, please do not say the number {term} in this server."
+    },
+    "guilds": {}
+}
+DEFAULT_WARNING = "{mention}, please do not say that in this server."
+
+Violation = namedtuple("Violation", "term warning")
+
+# =========================
+# MATCHER
+# =========================
+def compile_terms(terms):
+    """One case-insensitive regex matching any of the terms as a substring.
+
+    The terms are merged into a trie first, so terms sharing a prefix
+    share the work: at each position the regex walks one path down the
+    trie instead of trying every term in turn.
+    """
+    trie = {}
+    for term in terms:
+        term = term.lower()
+        if not term:
+            continue
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True  # End of a term
+    if not trie:
+        return None
+    return re.compile(_trie_pattern(trie), re.IGNORECASE)
+
+def _trie_pattern(node):
+    ends = "" in node
+    branches = []
+    singles = []
+    for ch in sorted(k for k in node if k):
+        child = node[ch]
+        if list(child) == [""]:
+            singles.append(re.escape(ch))
+        else:
+            branches.append(re.escape(ch) + _trie_pattern(child))
+    if singles:
+        branches.append(singles[0] if len(singles) == 1 else "[" + "".join(singles) + "]")
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if ends:
+        # A shorter term ends here: the match may stop at this node.
+        # Lazy, so the shortest (first found) term is reported.
+        pattern = "(?:" + pattern + ")??"
+    return pattern
+
+class GuildRules:
+    __slots__ = ("pattern", "exempt_channels", "exempt_roles", "warning")
+
+    def __init__(self, terms, exempt_channels=(), exempt_roles=(), warning=DEFAULT_WARNING):
+        self.pattern = compile_terms(terms)
+        self.exempt_channels = frozenset(int(c) for c in exempt_channels)
+        self.exempt_roles = frozenset(int(r) for r in exempt_roles)
+        self.warning = check_warning(warning)
+
+def check_warning(warning):
+    # The template comes from a hand-edited file: try it once here, so a bad
+    # placeholder falls back to the default instead of failing in on_message
+    try:
+        warning.format(mention="@user", term="term")
+    except (KeyError, IndexError, ValueError, AttributeError, TypeError) as e:
+        log.warning("Invalid moderation warning %r (%s: %s), using the default", warning, type(e).__name__, e)
+        return DEFAULT_WARNING
+    return warning
+
+# =========================
+# MODERATION ENGINE
+# =========================
+class ModerationEngine:
+    """Per-guild term filters, loaded from a JSON file and reloaded when it changes.
+
+    The file looks like:
+
+        {
+          "default": {"terms": ["67"], "exempt_channels": [], "exempt_roles": [],
+                      "warning": "{mention}, please do not say the number {term} in this server."},
+          "guilds": {
+            "123456789": {"terms": ["spoiler"], "exempt_roles": [987654321], "inherit_default": true}
+          }
+        }
+
+    A guild entry replaces the default one, except that with
+    "inherit_default" its terms and exemptions are added to the default's.
+    """
+
+    def __init__(self, path=MODERATION_RULES_PATH, reload_interval=MODERATION_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.default = None
+        self.guilds = {}  # {guild_id: GuildRules}
+        self._mtime = None
+        self._next_check = 0.0
+        self.reload(force=True)
+
+    def reload(self, force=False):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if not force and mtime == self._mtime:
+            return False
+        try:
+            if mtime is None:
+                config = DEFAULT_RULES
+            else:
+                with open(self.path, encoding="utf-8") as f:
+                    config = json.load(f)
+            default, guilds = self._build(config)
+        except Exception as e:
+            # Keep serving the rules we had
+            log.warning("Could not load moderation rules from %s: %s", self.path, e)
+            self._mtime = mtime
+            if self.default is None:
+                self.default, self.guilds = self._build(DEFAULT_RULES)
+            return False
+        self.default, self.guilds, self._mtime = default, guilds, mtime
+        log.info("Loaded moderation rules for %d guild(s) from %s", len(guilds),
+                 self.path if mtime is not None else "built-in defaults")
+        return True
+
+    @staticmethod
+    def _build(config):
+        base = config.get("default") or {}
+        default = GuildRules(
+            base.get("terms", ()), base.get("exempt_channels", ()), base.get("exempt_roles", ()),
+            base.get("warning", DEFAULT_WARNING)
+        )
+        guilds = {}
+        for guild_id, entry in (config.get("guilds") or {}).items():
+            terms = list(entry.get("terms", ()))
+            channels = list(entry.get("exempt_channels", ()))
+            roles = list(entry.get("exempt_roles", ()))
+            if entry.get("inherit_default"):
+                terms += base.get("terms", [])
+                channels += base.get("exempt_channels", [])
+                roles += base.get("exempt_roles", [])
+            guilds[int(guild_id)] = GuildRules(
+                terms, channels, roles, entry.get("warning", default.warning)
+            )
+        return default, guilds
+
+    def rules_for(self, guild_id):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.reload()
+        return self.guilds.get(guild_id, self.default)
+
+    def check(self, message):
+        """Return a Violation if the message breaks its guild's rules, else None."""
+        guild = message.guild
+        if guild is None:
+            return None  # DMs are not moderated
+        rules = self.rules_for(guild.id)
+        if rules.pattern is None or message.channel.id in rules.exempt_channels:
+            return None
+        if rules.exempt_roles:
+            roles = getattr(message.author, "roles", ())
+            if any(role.id in rules.exempt_roles for role in roles):
+                return None
+        match = rules.pattern.search(message.content)
+        if match is None:
+            return None
+        term = match.group(0)
+        return Violation(term, rules.warning.format(mention=message.author.mention, term=term))
+
+# =========================
+# ACTION QUEUE
+# =========================
+class ModerationQueue:
+    """Collects flagged messages per channel and acts on them in batches.
+
+    enqueue() only appends; the first message of a burst starts a task that
+    waits flush_delay, then removes everything gathered with bulk deletes
+    and posts one warning that mentions each offender not already warned
+    in that channel within warn_window.
+    """
+
+    def __init__(self, flush_delay=MODERATION_FLUSH_DELAY, warn_window=MODERATION_WARN_WINDOW):
+        self.flush_delay = flush_delay
+        self.warn_window = warn_window
+        self._pending = {}  # {channel_id: (channel, [(message, violation)])}
+        self._tasks = {}  # {channel_id: flush task}
+        self._warned = {}  # {(channel_id, user_id): monotonic time of the last warning}
+
+    def enqueue(self, message, violation):
+        channel = message.channel
+        entry = self._pending.get(channel.id)
+        if entry is None:
+            entry = self._pending[channel.id] = (channel, [])
+        entry[1].append((message, violation))
+        if channel.id not in self._tasks:
+            self._tasks[channel.id] = asyncio.create_task(self._flush_later(channel.id))
+
+    async def _flush_later(self, channel_id):
+        try:
+            await asyncio.sleep(self.flush_delay)
+        finally:
+            self._tasks.pop(channel_id, None)
+            await self.flush(channel_id)
+
+    async def flush(self, channel_id):
+        entry = self._pending.pop(channel_id, None)
+        if entry is None:
+            return
+        channel, flagged = entry
+        await self._delete(channel, [message for message, _ in flagged])
+        await self._warn(channel, flagged)
+
+    async def close(self):
+        # Act on whatever is still gathered, without waiting out the delay
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+        for channel_id in list(self._pending):
+            await self.flush(channel_id)
+
+    async def _delete(self, channel, messages):
+        for i in range(0, len(messages), BULK_DELETE_LIMIT):
+            chunk = messages[i:i + BULK_DELETE_LIMIT]
+            try:
+                if len(chunk) == 1:
+                    await chunk[0].delete()
+                else:
+                    await channel.delete_messages(chunk)
+            except Exception as e:
+                log.warning("Could not delete %d flagged message(s): %s", len(chunk), e,
+                            extra={"guild": getattr(channel.guild, "id", None), "channel": channel.id})
+
+    async def _warn(self, channel, flagged):
+        now = time.monotonic()
+        lines = []
+        for message, violation in flagged:
+            key = (channel.id, message.author.id)
+            last = self._warned.get(key)
+            if last is not None and now - last < self.warn_window:
+                continue
+            self._warned[key] = now
+            lines.append(violation.warning)
+        if len(self._warned) > 4096:
+            self._warned = {k: t for k, t in self._warned.items() if now - t < self.warn_window}
+        if not lines:
+            return
+        text = "\n".join(lines)
+        if len(text) > 2000:
+            text = text[:1997] + "..."
+        try:
+            await channel.send(text)
+        except Exception as e:
+            log.warning("Could not send moderation warning: %s", e,
+                        extra={"guild": getattr(channel.guild, "id", None), "channel": channel.id})
@@ -0,0 +1,84 @@
+import bisect
+import unicodedata
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def normalize_name(name):
+    """Casefolded name without accents or extra spaces, for matching what people type."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+# =========================
+# PREFIX INDEX
+# =========================
+class NameIndex:
+    """Display names of one shift's attendees, searchable by prefix.
+
+    Keys are (normalized text, user_id) in one sorted list, one key for
+    the whole name and one for every later word, so "smi" finds both
+    "Smith" and "John Smith". A prefix query is a bisect plus a walk over
+    the matches it returns; adding or removing a name is an insort/del,
+    no rebuild.
+    """
+
+    def __init__(self):
+        self.keys = []  # Sorted (normalized text, user_id)
+        self.names = {}  # {user_id: display name}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, user_id):
+        return user_id in self.names
+
+    @staticmethod
+    def _keys_for(user_id, name):
+        words = normalize_name(name).split(" ")
+        return {(" ".join(words[i:]), user_id) for i in range(len(words)) if words[i]}
+
+    def add(self, user_id, name):
+        if self.names.get(user_id) == name:
+            return
+        self.remove(user_id)
+        self.names[user_id] = name
+        for key in self._keys_for(user_id, name):
+            bisect.insort(self.keys, key)
+
+    def remove(self, user_id):
+        name = self.names.pop(user_id, None)
+        if name is None:
+            return
+        for key in self._keys_for(user_id, name):
+            i = bisect.bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+
+    def search(self, prefix, limit=25):
+        """[(user_id, display name)] whose name or a later word starts with `prefix`, at most `limit`."""
+        prefix = normalize_name(prefix)
+        found = []
+        seen = set()
+        i = bisect.bisect_left(self.keys, (prefix,))
+        while i < len(self.keys) and len(found) < limit:
+            text, user_id = self.keys[i]
+            if not text.startswith(prefix):
+                break
+            if user_id not in seen:
+                seen.add(user_id)
+                found.append((user_id, self.names[user_id]))
+            i += 1
+        return found
+
+    def exact(self, name):
+        """User ids whose whole name matches `name` once normalized."""
+        name = normalize_name(name)
+        result = []
+        i = bisect.bisect_left(self.keys, (name,))
+        while i < len(self.keys) and self.keys[i][0] == name:
+            user_id = self.keys[i][1]
+            if normalize_name(self.names[user_id]) == name:
+                result.append(user_id)
+            i += 1
+        return result
@@ -0,0 +1,123 @@
+import time
+import random
+import logging
+from utils.timers import DeadlineScheduler
+
+log = logging.getLogger(__name__)
+
+# =========================
+# OUTBOUND QUEUE
+# =========================
+class Outbox:
+    """Shift results waiting to be posted, retried with backoff until they go out.
+
+    Items are {shift_id, guild_id, payload, attempts, next_attempt}, one
+    per ended shift. They are kept in memory and marked in the store, so
+    the next flush writes the pending ones and a restart re-arms them
+    with load(); one delivered before that flush never reaches the disk.
+    Callers journal enqueue() and on_done, so results queued after the
+    last snapshot are rebuilt by the journal replay.
+
+    Deliveries are driven by a DeadlineScheduler. A guild with a digest
+    window arms one ("digest", guild_id) deadline for the first result
+    and every result that ends before it fires goes out with it;
+    otherwise each result arms its own ("item", shift_id). Every due key
+    is handed to `deliver(guild_id, items)` one group after another, so
+    many shifts ending at once never fan out into parallel API calls.
+    `deliver` calls done() for what it sent; if it raises, whatever is
+    left is retried after a delay that starts at base_delay and doubles
+    every attempt (jittered, capped at max_delay), and is dropped after
+    max_attempts.
+    """
+
+    def __init__(self, store, digest_seconds=None, on_done=None, base_delay=5.0, max_delay=900.0, max_attempts=10):
+        self.store = store
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.items = {}  # {shift_id: item}
+        self.scheduler = DeadlineScheduler(slack=0.5)
+        self._deliver = None
+        self._digest_seconds = digest_seconds or (lambda guild_id: 0)  # digest_seconds(guild_id) picks the mode
+        self._on_done = on_done  # on_done(item) for every item leaving the queue, sent or given up on
+
+    def __len__(self):
+        return len(self.items)
+
+    def start(self, deliver):
+        # deliver(guild_id, items) is awaited per due group; items can be queued before this
+        self._deliver = deliver
+        self.scheduler.start(self._run)
+
+    def stop(self):
+        self.scheduler.stop()
+
+    def load(self, items):
+        # Items recovered from the store; anything already due goes out right away
+        now = time.time()
+        for item in items:
+            self.items[item["shift_id"]] = item
+            self._arm(item, max(0.0, item["next_attempt"] - now))
+
+    def enqueue(self, shift_id, guild_id, payload):
+        digest = self._digest_seconds(guild_id)
+        item = {
+            "shift_id": shift_id, "guild_id": guild_id, "payload": payload, "attempts": 0,
+            "next_attempt": time.time() + digest
+        }
+        self.items[shift_id] = item
+        self.store.save_outbound(item)
+        self._arm(item, digest)
+
+    def done(self, items):
+        for item in items:
+            if self.items.pop(item["shift_id"], None) is not None:
+                self.store.drop_outbound(item["shift_id"])
+                self.scheduler.cancel(("item", item["shift_id"]))  # A digest key still has the guild's other results
+                if self._on_done is not None:
+                    self._on_done(item)
+
+    def _key(self, item):
+        if self._digest_seconds(item["guild_id"]) > 0:
+            return ("digest", item["guild_id"])
+        return ("item", item["shift_id"])
+
+    def _arm(self, item, delay):
+        key = self._key(item)
+        if key[0] == "digest" and key in self.scheduler:
+            return  # Rides along with the guild's armed digest
+        self.scheduler.arm(key, delay)
+
+    def _take(self, key):
+        kind, value = key
+        if kind == "item":
+            item = self.items.get(value)
+            return (item["guild_id"], [item]) if item is not None else (None, [])
+        # Every pending result of the guild, retries included: they ride along with this post
+        return value, [item for item in self.items.values() if item["guild_id"] == value]
+
+    async def _run(self, keys):
+        for key in keys:
+            guild_id, items = self._take(key)
+            if not items:
+                continue
+            try:
+                await self._deliver(guild_id, items)
+            except Exception as e:
+                self._retry([item for item in items if item["shift_id"] in self.items], e)
+
+    def _retry(self, items, error):
+        for item in items:
+            item["attempts"] += 1
+            if item["attempts"] >= self.max_attempts:
+                log.error("Giving up on shift results after %d attempts: %s", item["attempts"], error,
+                          extra={"shift": item["shift_id"], "guild": item["guild_id"]})
+                self.done([item])
+                continue
+            delay = min(self.max_delay, self.base_delay * 2 ** (item["attempts"] - 1))
+            delay *= random.uniform(0.8, 1.2)  # Retries of results that failed together do not line up again
+            item["next_attempt"] = time.time() + delay
+            self.store.save_outbound(item)
+            log.warning("Shift results not delivered (attempt %d), retrying in %.0fs: %s", item["attempts"], delay, error,
+                        extra={"shift": item["shift_id"], "guild": item["guild_id"]})
+            self._arm(item, delay)
@@ -0,0 +1,66 @@
+# =========================
+# ROLE PERMISSIONS
+# =========================
+class RolePermissions:
+    """Which roles may manage shifts in each guild, resolved to role IDs.
+
+    A guild's configured role IDs win; a guild that never configured any
+    (or was reset) falls back to every role named `default_role_name`
+    (case-insensitive), which is how the bot behaved before roles could be
+    configured. A configuration whose roles were all removed or deleted
+    stays configured with no managers until an admin adds one. Either way the IDs
+    are resolved once per guild and cached until a role is created,
+    renamed or deleted, or the configuration changes, so a check never
+    looks at role names: it probes the member's role IDs for the few
+    authorized ones.
+    """
+
+    def __init__(self, default_role_name):
+        self.default_role_name = default_role_name
+        self.configured = {}  # {guild_id: frozenset(role_id)}, only guilds with a configuration (possibly empty)
+        self._resolved = {}  # {guild_id: frozenset(role_id)}
+
+    def load(self, settings):
+        # settings: {guild_id: [role_id], or None if not configured} as stored
+        self.configured = {gid: frozenset(ids) for gid, ids in settings.items() if ids is not None}
+        self._resolved = {}
+
+    def set_roles(self, guild_id, role_ids):
+        role_ids = frozenset(role_ids)
+        self.configured[guild_id] = role_ids
+        self.invalidate(guild_id)
+        return role_ids
+
+    def reset(self, guild_id):
+        # Back to the default role name
+        self.configured.pop(guild_id, None)
+        self.invalidate(guild_id)
+
+    def invalidate(self, guild_id):
+        self._resolved.pop(guild_id, None)
+
+    def role_ids(self, guild):
+        ids = self._resolved.get(guild.id)
+        if ids is None:
+            ids = self.configured.get(guild.id)
+            if ids is None:
+                name = self.default_role_name.lower()
+                ids = frozenset(role.id for role in getattr(guild, "roles", ()) if role.name.lower() == name)
+            self._resolved[guild.id] = ids
+        return ids
+
+    def is_manager(self, member):
+        guild = getattr(member, "guild", None)
+        if guild is None:
+            return False
+        # get_role is a binary search over the member's role IDs
+        return any(member.get_role(role_id) is not None for role_id in self.role_ids(guild))
+
+    def describe(self, guild):
+        # For error messages: the authorized roles as mentions, or the default role name
+        ids = self.configured.get(guild.id)
+        if ids is None:
+            return f"`{self.default_role_name}`"
+        if not ids:
+            return "none (ask an admin to run `/clockinroles add`)"
+        return ", ".join(f"<@&{role_id}>" for role_id in sorted(ids))
@@ -0,0 +1,86 @@
+import os
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def shard_for_guild(guild_id, shard_count):
+    # Discord's own formula: the gateway shard that receives this guild's events
+    return (guild_id >> 22) % shard_count
+
+def parse_shard_ids(text):
+    """"0-3,6" -> [0, 1, 2, 3, 6]; empty -> None (every shard)."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    ids = set()
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        ids.update(range(int(first), int(last or first) + 1))
+    return sorted(ids)
+
+def format_shard_ids(shard_ids):
+    # Inverse of parse_shard_ids, as ranges
+    ranges = []
+    for shard_id in sorted(shard_ids):
+        if ranges and ranges[-1][1] == shard_id - 1:
+            ranges[-1][1] = shard_id
+        else:
+            ranges.append([shard_id, shard_id])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def split_shards(shard_count, processes):
+    # Contiguous shard ranges, as even as possible: split_shards(10, 3) -> [[0..3], [4..6], [7..9]]
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    result = []
+    first = 0
+    for i in range(processes):
+        last = first + size + (1 if i < extra else 0)
+        result.append(list(range(first, last)))
+        first = last
+    return result
+
+# =========================
+# PARTITION
+# =========================
+class Partition:
+    """The guilds this process owns: those on its gateway shards.
+
+    With several processes each one runs a range of shards (SHARD_IDS out
+    of SHARD_COUNT) and only ever sees events of guilds on them, so shift
+    and grace-period state splits by guild with no coordination: every
+    process loads, journals and writes only the guilds it owns. A
+    Partition with no shard_ids owns every guild (one process, whether it
+    runs one shard or all of them).
+    """
+
+    def __init__(self, shard_count=1, shard_ids=None):
+        self.shard_count = max(1, shard_count)
+        self.shard_ids = sorted(shard_ids) if shard_ids is not None else None
+        self._owned = frozenset(self.shard_ids) if self.shard_ids is not None else None
+
+    @classmethod
+    def from_env(cls):
+        count = os.environ.get("SHARD_COUNT", "").strip()
+        return cls(int(count) if count else 1, parse_shard_ids(os.environ.get("SHARD_IDS")))
+
+    @property
+    def sharded(self):
+        # True when other processes own some of the guilds
+        return self._owned is not None and len(self._owned) < self.shard_count
+
+    @property
+    def name(self):
+        # Tags this partition's journal and snapshot; empty when it owns everything
+        return f"shards-{format_shard_ids(self.shard_ids)}" if self.sharded else ""
+
+    def owns_shard(self, shard_id):
+        return self._owned is None or shard_id in self._owned
+
+    def owns(self, guild_id):
+        if self._owned is None:
+            return True
+        return shard_for_guild(guild_id, self.shard_count) in self._owned
+
+    def __repr__(self):
+        return f"<Partition {self.name or 'all'} of {self.shard_count}>"
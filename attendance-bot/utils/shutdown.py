@@ -0,0 +1,61 @@
+import os
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+SHUTDOWN_DEADLINE = float(os.environ.get("SHUTDOWN_DEADLINE", "20"))  # Seconds for the whole pipeline
+SHUTDOWN_CONCURRENCY = int(os.environ.get("SHUTDOWN_CONCURRENCY", "8"))  # REST calls in flight during cleanup
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+async def gather_bounded(coros, limit=SHUTDOWN_CONCURRENCY):
+    """Run the coroutines with at most `limit` at a time; exceptions are returned, not raised."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=True)
+
+# =========================
+# SHUTDOWN PIPELINE
+# =========================
+class ShutdownPipeline:
+    """Ordered shutdown steps sharing one deadline.
+
+    Each step is an async callable run with whatever is left of the budget;
+    a step that times out or fails is logged and the next one still runs,
+    and steps reached after the deadline are skipped, so the whole
+    pipeline never takes much longer than `deadline` seconds.
+    """
+
+    def __init__(self, deadline=SHUTDOWN_DEADLINE):
+        self.deadline = deadline
+        self.steps = []  # [(name, step)]
+        self._ran = False
+
+    def add(self, name, step):
+        self.steps.append((name, step))
+
+    async def run(self):
+        if self._ran:
+            return  # close() can be called more than once
+        self._ran = True
+        loop = asyncio.get_running_loop()
+        end = loop.time() + self.deadline
+        for name, step in self.steps:
+            remaining = end - loop.time()
+            if remaining <= 0:
+                log.warning("Shutdown deadline reached, skipping step: %s", name)
+                continue
+            started = loop.time()
+            try:
+                await asyncio.wait_for(step(), remaining)
+                log.info("Shutdown step %s done in %.2fs", name, loop.time() - started)
+            except asyncio.TimeoutError:
+                log.warning("Shutdown step %s ran out of time after %.2fs", name, loop.time() - started)
+            except Exception as e:
+                log.exception("Shutdown step %s failed: %s", name, e)
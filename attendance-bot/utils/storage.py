@@ -0,0 +1,760 @@
+import sqlite3
+import asyncio
+import json
+import pathlib
+import datetime
+import logging
+from abc import ABC, abstractmethod
+from utils.models import Shift, Attendee
+from utils.sharding import Partition
+
+log = logging.getLogger(__name__)
+
+# =========================
+# SCHEMA
+# =========================
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shifts (
+    shift_id TEXT PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    host INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    min_attendance REAL NOT NULL,
+    grace_seconds REAL NOT NULL DEFAULT 300,
+    voice INTEGER NOT NULL,
+    channel_id INTEGER,
+    message_id INTEGER,
+    start REAL NOT NULL,
+    end_time REAL,
+    ended INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS shifts_by_ended ON shifts (ended);
+CREATE INDEX IF NOT EXISTS shifts_by_guild_end ON shifts (guild_id, end_time);
+CREATE TABLE IF NOT EXISTS attendees (
+    shift_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    joined REAL NOT NULL,
+    left_at REAL,
+    present_seconds REAL NOT NULL DEFAULT 0,
+    open_since REAL,
+    PRIMARY KEY (shift_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    shift_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    started REAL NOT NULL,
+    stopped REAL,
+    PRIMARY KEY (shift_id, user_id, idx)
+);
+CREATE TABLE IF NOT EXISTS grace_periods (
+    shift_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    left_at REAL NOT NULL,
+    PRIMARY KEY (shift_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS history (
+    shift_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    guild_id INTEGER NOT NULL,
+    end_time REAL NOT NULL,
+    present_seconds REAL NOT NULL,
+    attendance REAL NOT NULL,
+    passed INTEGER NOT NULL,
+    position INTEGER,
+    PRIMARY KEY (shift_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS history_by_user ON history (guild_id, user_id, end_time);
+CREATE TABLE IF NOT EXISTS attendance_rollups (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    shifts_attended INTEGER NOT NULL,
+    shifts_passed INTEGER NOT NULL,
+    total_seconds REAL NOT NULL,
+    attendance_sum REAL NOT NULL,
+    PRIMARY KEY (guild_id, user_id, period)
+);
+CREATE INDEX IF NOT EXISTS rollups_leaderboard ON attendance_rollups (guild_id, period, shifts_passed, total_seconds);
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER PRIMARY KEY,
+    manager_roles TEXT NOT NULL DEFAULT '[]',
+    log_channel_id INTEGER,
+    log_webhook TEXT,
+    digest_seconds REAL NOT NULL DEFAULT 0,
+    managers_configured INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    shift_id TEXT PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL
+);
+"""
+ALL_TIME = "all"  # Rollup period covering every shift; the others are "YYYY-MM" (UTC)
+
+# Columns added after the first release: (table, column, definition)
+MIGRATIONS = [
+    ("shifts", "grace_seconds", "REAL NOT NULL DEFAULT 300"),
+    ("history", "position", "INTEGER"),
+    ("guild_settings", "log_channel_id", "INTEGER"),
+    ("guild_settings", "log_webhook", "TEXT"),
+    ("guild_settings", "digest_seconds", "REAL NOT NULL DEFAULT 0"),
+    ("guild_settings", "managers_configured", "INTEGER NOT NULL DEFAULT 0"),
+]
+# Tables whose primary key changed: (table, new key, statements that rebuild it with the new key)
+REKEYS = [
+    ("grace_periods", ["shift_id", "user_id"], """
+    CREATE TABLE grace_periods_rekey (
+        shift_id TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        left_at REAL NOT NULL,
+        PRIMARY KEY (shift_id, user_id)
+    );
+    INSERT OR REPLACE INTO grace_periods_rekey (shift_id, user_id, left_at)
+        SELECT shift_id, user_id, left_at FROM grace_periods;
+    DROP TABLE grace_periods;
+    ALTER TABLE grace_periods_rekey RENAME TO grace_periods;
+    """),
+]
+# Per-guild settings and their defaults, in guild_settings column order
+GUILD_SETTINGS = {
+    "manager_roles": [],
+    "log_channel_id": None,
+    "log_webhook": None,
+    "digest_seconds": 0.0,
+    "managers_configured": False,  # True once set up, even if every manager role is later gone
+}
+# Indexes and backfills on migrated columns, run once the columns exist
+POST_MIGRATION = """
+CREATE INDEX IF NOT EXISTS history_by_position ON history (shift_id, position);
+UPDATE guild_settings SET managers_configured = 1 WHERE manager_roles != '[]' AND managers_configured = 0;
+"""
+
+# =========================
+# HELPER FUNCTIONS
+# =========================
+def to_epoch(dt):
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+def period_of(dt):
+    return f"{dt.year:04d}-{dt.month:02d}"
+
+def from_epoch(ts):
+    if ts is None:
+        return None
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).replace(tzinfo=None)
+
+# =========================
+# STATE STORE INTERFACE
+# =========================
+class ShiftStateStore(ABC):
+    """What commands.clockincreate needs from wherever shift state lives.
+
+    Every store serves one Partition: it only loads, and is only handed,
+    shifts, grace periods, settings and results of guilds the partition
+    owns, so several processes (one per shard range) can share one
+    backend without stepping on each other. Marking is synchronous and
+    cheap, called on the event loop; persisting happens in flush().
+    ShiftStore below is the local single-node implementation.
+    """
+
+    partition = Partition()
+
+    # ---- lifecycle ----
+    @abstractmethod
+    def open(self):
+        ...
+
+    @abstractmethod
+    def start(self):
+        ...
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+    @abstractmethod
+    async def flush(self):
+        ...
+
+    @abstractmethod
+    def has_pending(self):
+        ...
+
+    @abstractmethod
+    def has_unwritten_results(self):
+        ...
+
+    # ---- marking ----
+    @abstractmethod
+    def save_shift(self, shift):
+        ...
+
+    @abstractmethod
+    def save_attendee(self, shift, user_id):
+        ...
+
+    @abstractmethod
+    def remove_attendee(self, shift_id, user_id):
+        ...
+
+    @abstractmethod
+    def delete_shift(self, shift_id):
+        ...
+
+    @abstractmethod
+    def save_grace(self, user_id, shift_id, left_at):
+        ...
+
+    @abstractmethod
+    def drop_grace(self, user_id, shift_id):
+        ...
+
+    @abstractmethod
+    def save_history(self, shift, results):
+        ...
+
+    @abstractmethod
+    def save_guild_settings(self, guild_id, settings):
+        ...
+
+    @abstractmethod
+    def save_outbound(self, item):
+        ...
+
+    @abstractmethod
+    def drop_outbound(self, shift_id):
+        ...
+
+    # ---- recovery (this partition's guilds only) ----
+    @abstractmethod
+    def load_journal_seq(self):
+        ...
+
+    @abstractmethod
+    def load_open_shifts(self):
+        ...
+
+    @abstractmethod
+    def load_guild_settings(self):
+        ...
+
+    @abstractmethod
+    def load_outbox(self):
+        ...
+
+# =========================
+# SHIFT STORE
+# =========================
+class ShiftStore(ShiftStateStore):
+    """SQLite (WAL) copy of the Shift objects kept in commands.clockincreate.
+
+    Callers only mark what changed; a background flusher serializes the
+    marked shifts/attendees on the loop and writes them in one transaction
+    on a worker thread, so voice events never wait on the disk.
+
+    With a journal attached every flush is also a snapshot: it records the
+    last journal seq it contains, so recovery only replays the records
+    after it, and journal segments older than that can be pruned.
+
+    Processes running other shard ranges may share the same file (WAL
+    lets them; writers wait on each other through the busy timeout).
+    Rows are keyed by shift or guild, so partitions never write the same
+    row, and each partition keeps its own journal position in meta.
+    """
+
+    def __init__(self, path, flush_interval=1.0, journal=None, partition=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.journal = journal
+        self.partition = partition or Partition()
+        self.journal_seq_key = "journal_seq:" + self.partition.name if self.partition.name else "journal_seq"
+        self.conn = None
+        self._shifts = {}  # {shift_id: shift}
+        self._attendees = {}  # {(shift_id, user_id): shift}
+        self._removed = set()  # {(shift_id, user_id)}
+        self._deleted = set()  # {shift_id}
+        self._graces = {}  # {(shift_id, user_id): left_at or None}
+        self._history = []  # Final per-attendee results of ended shifts, as history rows
+        self._settings = {}  # {guild_id: settings dict}
+        self._outbox = {}  # {shift_id: outbox item or None}
+        self._session_marks = {}  # {(shift_id, user_id): sessions already written}
+        self._results_marked = 0  # Ended shifts handed to save_history
+        self._results_written = 0  # ... and how many of them are on disk
+        self._retry = []  # Batches whose write failed, retried in order before the next one
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    # ---- lifecycle ----
+    def open(self):
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        for table, column, definition in MIGRATIONS:
+            columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            if column not in columns:
+                try:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                except sqlite3.OperationalError as e:
+                    # Another shard process starting at the same time may have added it first
+                    if "duplicate column" not in str(e):
+                        raise
+        for table, key, rebuild in REKEYS:
+            self._rekey(table, key, rebuild)
+        self.conn.executescript(POST_MIGRATION)
+        self.conn.commit()
+
+    def _primary_key(self, table):
+        columns = sorted((row[5], row[1]) for row in self.conn.execute(f"PRAGMA table_info({table})") if row[5])
+        return [name for _, name in columns]
+
+    def _rekey(self, table, key, rebuild):
+        if self._primary_key(table) == key:
+            return
+        self.conn.commit()
+        self.conn.execute("BEGIN IMMEDIATE")  # Another shard process starting at the same time waits here
+        try:
+            if self._primary_key(table) != key:
+                for statement in rebuild.split(";"):
+                    if statement.strip():
+                        self.conn.execute(statement)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    async def _flush_loop(self):
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                # Shielded: cancelling mid-write would release the lock while the
+                # worker thread still uses self.conn, racing close()
+                await asyncio.shield(self.flush())
+        except asyncio.CancelledError:
+            pass
+
+    # ---- marking (called from the event loop, O(1)) ----
+    def save_shift(self, shift):
+        self._shifts[shift.shift_id] = shift
+
+    def save_attendee(self, shift, user_id):
+        self._attendees[(shift.shift_id, user_id)] = shift
+
+    def remove_attendee(self, shift_id, user_id):
+        key = (shift_id, user_id)
+        self._attendees.pop(key, None)
+        self._session_marks.pop(key, None)
+        self._removed.add(key)
+
+    def delete_shift(self, shift_id):
+        self._shifts.pop(shift_id, None)
+        for key in [k for k in self._attendees if k[0] == shift_id]:
+            del self._attendees[key]
+        for key in [k for k in self._session_marks if k[0] == shift_id]:
+            del self._session_marks[key]
+        for key in [k for k in self._graces if k[0] == shift_id]:
+            del self._graces[key]  # The delete below covers their rows
+        self._deleted.add(shift_id)
+
+    def save_grace(self, user_id, shift_id, left_at):
+        self._graces[(shift_id, user_id)] = left_at
+
+    def drop_grace(self, user_id, shift_id):
+        self._graces[(shift_id, user_id)] = None
+
+    def save_history(self, shift, results):
+        # results: [(user_id, present_seconds, attendance, passed)] in roster order, once the shift has ended
+        self._results_marked += 1
+        for position, (user_id, present, attendance, passed) in enumerate(results):
+            self._history.append((
+                shift.shift_id, user_id, shift.guild_id, shift.end_time, present, attendance, 1 if passed else 0, position
+            ))
+
+    def save_guild_settings(self, guild_id, settings):
+        self._settings[guild_id] = dict(settings)
+
+    def save_outbound(self, item):
+        self._outbox[item["shift_id"]] = item
+
+    def drop_outbound(self, shift_id):
+        self._outbox[shift_id] = None
+
+    def has_pending(self):
+        return bool(
+            self._shifts or self._attendees or self._removed or self._deleted or self._graces or self._history
+            or self._settings or self._outbox
+        )
+
+    def has_unwritten_results(self):
+        # True while a shift that ended is missing from history and the rollups
+        return self._results_written < self._results_marked
+
+    # ---- flushing ----
+    async def flush(self):
+        if self.conn is None:
+            return
+        async with self._lock:
+            if not self.has_pending() and not self._retry:
+                return
+            batch = self._take_batch()
+            batches = self._retry + [batch]
+            if self.journal is not None:
+                # The journal must never be behind a snapshot
+                await self.journal.flush()
+            try:
+                await asyncio.to_thread(self._write, batches)
+            except Exception as e:
+                self._retry = batches
+                log.exception("Shift store flush failed: %s", e)
+                return
+            self._retry = []
+            self._results_written = batch["results_marked"]
+            if self.journal is not None and batch["journal_seq"] is not None:
+                try:
+                    await self.journal.compact(batch["journal_seq"])
+                except Exception as e:
+                    log.warning("Journal compaction failed: %s", e)
+
+    def _take_batch(self):
+        # Snapshot plain rows on the loop so the worker thread never reads live objects
+        shift_rows = [self._shift_row(s) for s in self._shifts.values()]
+        attendee_rows = []
+        session_rows = []
+        for (sid, uid), shift in self._attendees.items():
+            attendee = shift.attendees.get(uid)
+            if attendee is None:
+                continue
+            attendee_rows.append((
+                sid, uid, attendee.join, attendee.leave, attendee.present_seconds, attendee.open_since
+            ))
+            # Only the last written session can still change; older ones are final
+            first = max(0, self._session_marks.get((sid, uid), 0) - 1)
+            for idx, (start, end) in enumerate(attendee.sessions(first), start=first):
+                session_rows.append((sid, uid, idx, start, end))
+            if shift.ended:
+                self._session_marks.pop((sid, uid), None)  # Its sessions are final once written here
+            else:
+                self._session_marks[(sid, uid)] = attendee.session_count()
+        grace_rows = [(sid, uid, left_at) for (sid, uid), left_at in self._graces.items() if left_at is not None]
+        grace_drops = [key for key, left_at in self._graces.items() if left_at is None]
+        batch = {
+            "shifts": shift_rows,
+            "attendees": attendee_rows,
+            "sessions": session_rows,
+            "removed": list(self._removed),
+            "deleted": [(sid,) for sid in self._deleted],
+            "graces": grace_rows,
+            "grace_drops": grace_drops,
+            "history": self._history,
+            "settings": [
+                (gid, json.dumps(sorted(settings["manager_roles"])), settings["log_channel_id"], settings["log_webhook"],
+                 settings["digest_seconds"], int(settings["managers_configured"]))
+                for gid, settings in self._settings.items()
+            ],
+            "outbox": [
+                (sid, item["guild_id"], json.dumps(item["payload"]), item["attempts"], item["next_attempt"])
+                for sid, item in self._outbox.items() if item is not None
+            ],
+            "outbox_drops": [(sid,) for sid, item in self._outbox.items() if item is None],
+            "results_marked": self._results_marked,
+            # Every event up to here is in the rows above
+            "journal_seq": self.journal.last_seq if self.journal is not None else None
+        }
+        self._shifts = {}
+        self._attendees = {}
+        self._removed = set()
+        self._deleted = set()
+        self._graces = {}
+        self._history = []
+        self._settings = {}
+        self._outbox = {}
+        return batch
+
+    @staticmethod
+    def _shift_row(shift):
+        return (
+            shift.shift_id, shift.guild_id, shift.host, shift.title, shift.min_attendance,
+            shift.grace_seconds, shift.voice, shift.channel_id, shift.message_id,
+            shift.start, shift.end_time, 1 if shift.ended else 0
+        )
+
+    def _write(self, batches):
+        with self.conn:
+            for batch in batches:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        conn = self.conn
+        # Deletes first: an attendee removed and re-added in one batch starts clean
+        for table in ("shifts", "attendees", "sessions", "grace_periods"):
+            conn.executemany(f"DELETE FROM {table} WHERE shift_id = ?", batch["deleted"])
+        conn.executemany("DELETE FROM attendees WHERE shift_id = ? AND user_id = ?", batch["removed"])
+        conn.executemany("DELETE FROM sessions WHERE shift_id = ? AND user_id = ?", batch["removed"])
+        conn.executemany(
+            "INSERT OR REPLACE INTO shifts (shift_id, guild_id, host, title, min_attendance, grace_seconds, voice, "
+            "channel_id, message_id, start, end_time, ended) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            batch["shifts"])
+        conn.executemany(
+            "INSERT OR REPLACE INTO attendees (shift_id, user_id, joined, left_at, present_seconds, open_since) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            batch["attendees"])
+        conn.executemany(
+            "INSERT OR REPLACE INTO sessions (shift_id, user_id, idx, started, stopped) VALUES (?, ?, ?, ?, ?)",
+            batch["sessions"])
+        conn.executemany("DELETE FROM grace_periods WHERE shift_id = ? AND user_id = ?", batch["grace_drops"])
+        conn.executemany(
+            "INSERT OR REPLACE INTO grace_periods (shift_id, user_id, left_at) VALUES (?, ?, ?)",
+            batch["graces"])
+        for row in batch["history"]:
+            self._write_history(row)
+        conn.executemany(
+            "INSERT OR REPLACE INTO guild_settings (guild_id, manager_roles, log_channel_id, log_webhook, digest_seconds, "
+            "managers_configured) VALUES (?, ?, ?, ?, ?, ?)", batch["settings"])
+        conn.executemany("DELETE FROM outbox WHERE shift_id = ?", batch["outbox_drops"])
+        conn.executemany(
+            "INSERT OR REPLACE INTO outbox (shift_id, guild_id, payload, attempts, next_attempt) VALUES (?, ?, ?, ?, ?)",
+            batch["outbox"])
+        if batch["journal_seq"] is not None:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (self.journal_seq_key, batch["journal_seq"]))
+
+    def _write_history(self, row):
+        shift_id, user_id, guild_id, end, present, attendance, passed, position = row
+        inserted = self.conn.execute(
+            "INSERT OR IGNORE INTO history (shift_id, user_id, guild_id, end_time, present_seconds, attendance, passed, "
+            "position) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row).rowcount
+        if not inserted:
+            return  # Already counted (e.g. the finish was replayed from the journal)
+        # Rollups are only ever bumped by the row they add, so they stay O(1) to maintain and to read
+        for period in (ALL_TIME, period_of(from_epoch(end))):
+            self.conn.execute(
+                "INSERT INTO attendance_rollups (guild_id, user_id, period, shifts_attended, shifts_passed, "
+                "total_seconds, attendance_sum) VALUES (?, ?, ?, 1, ?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id, period) DO UPDATE SET "
+                "shifts_attended = shifts_attended + 1, shifts_passed = shifts_passed + excluded.shifts_passed, "
+                "total_seconds = total_seconds + excluded.total_seconds, "
+                "attendance_sum = attendance_sum + excluded.attendance_sum",
+                (guild_id, user_id, period, passed, present, attendance))
+
+    # ---- recovery ----
+    def load_journal_seq(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (self.journal_seq_key,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def load_open_shifts(self):
+        """Rebuild the Shift objects of every shift that was still running.
+
+        Message and embed are left as None; the cog reattaches them lazily
+        from channel_id/message_id. Returns (shifts, graces) where graces is
+        a list of (user_id, shift_id, left_at).
+        """
+        conn = self.conn
+        shifts = {}
+        for row in conn.execute(
+                "SELECT shift_id, guild_id, host, title, min_attendance, voice, channel_id, message_id, start, "
+                "grace_seconds FROM shifts WHERE ended = 0"):
+            sid = row[0]
+            if not self.partition.owns(row[1]):
+                continue  # Another shard process's guild
+            shifts[sid] = Shift(
+                shift_id=sid, guild_id=row[1], host=row[2], title=row[3], min_attendance=row[4],
+                grace_seconds=row[9], voice=row[5], start=row[8], channel_id=row[6], message_id=row[7]
+            )
+        if not shifts:
+            return shifts, []
+        for sid, uid, joined, left_at, present, open_since in conn.execute(
+                "SELECT a.shift_id, a.user_id, a.joined, a.left_at, a.present_seconds, a.open_since "
+                "FROM attendees a JOIN shifts s ON s.shift_id = a.shift_id WHERE s.ended = 0 "
+                "ORDER BY a.joined, a.user_id"):
+            if sid not in shifts:
+                continue
+            shifts[sid].add_attendee(uid, Attendee(join=joined, leave=left_at, present_seconds=present, open_since=open_since))
+        for sid, uid, idx, started, stopped in conn.execute(
+                "SELECT x.shift_id, x.user_id, x.idx, x.started, x.stopped "
+                "FROM sessions x JOIN shifts s ON s.shift_id = x.shift_id WHERE s.ended = 0 "
+                "ORDER BY x.shift_id, x.user_id, x.idx"):
+            attendee = shifts[sid].attendees.get(uid) if sid in shifts else None
+            if attendee is not None and stopped is not None:
+                attendee.spans.append(started)  # The open session is already open_since
+                attendee.spans.append(stopped)
+        for sid, shift in shifts.items():
+            for uid, attendee in shift.attendees.items():
+                self._session_marks[(sid, uid)] = attendee.session_count()
+        graces = [
+            (uid, sid, left_at)
+            for uid, sid, left_at in conn.execute("SELECT user_id, shift_id, left_at FROM grace_periods")
+            if sid in shifts
+        ]
+        return shifts, graces
+
+    def load_guild_settings(self):
+        # {guild_id: settings dict}, see GUILD_SETTINGS
+        return {
+            gid: {"manager_roles": json.loads(roles), "log_channel_id": channel_id, "log_webhook": webhook,
+                  "digest_seconds": digest, "managers_configured": bool(configured)}
+            for gid, roles, channel_id, webhook, digest, configured in self.conn.execute(
+                "SELECT guild_id, manager_roles, log_channel_id, log_webhook, digest_seconds, managers_configured "
+                "FROM guild_settings")
+            if self.partition.owns(gid)
+        }
+
+    def load_outbox(self):
+        # Shift results that were not delivered before the restart, oldest first
+        return [
+            {"shift_id": sid, "guild_id": gid, "payload": json.loads(payload), "attempts": attempts,
+             "next_attempt": next_attempt}
+            for sid, gid, payload, attempts, next_attempt in self.conn.execute(
+                "SELECT shift_id, guild_id, payload, attempts, next_attempt FROM outbox ORDER BY next_attempt")
+            if self.partition.owns(gid)
+        ]
+
+    # ---- history ----
+    def open_reader(self):
+        # A separate read-only connection for long scans; with WAL it reads a
+        # consistent snapshot while the flusher keeps writing
+        uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    @staticmethod
+    def iter_ended_attendees(conn, guild_id, since=None, until=None):
+        """Yield every attendee of the guild's ended shifts, oldest shift first.
+
+        Each item is a dict with the shift's fields and the attendee's
+        sessions as (start, end) datetimes. Rows are read from the cursor as
+        they are needed, so memory does not grow with the history.
+        """
+        cursor = conn.execute(
+            "SELECT s.shift_id, s.title, s.host, s.min_attendance, s.start, s.end_time, "
+            "a.user_id, a.joined, a.left_at, a.present_seconds, x.started, x.stopped "
+            "FROM shifts s "
+            "JOIN attendees a ON a.shift_id = s.shift_id "
+            "LEFT JOIN sessions x ON x.shift_id = a.shift_id AND x.user_id = a.user_id "
+            "WHERE s.guild_id = ? AND s.ended = 1 AND s.end_time >= ? AND s.end_time < ? "
+            "ORDER BY s.end_time, s.shift_id, a.user_id, x.idx",
+            (guild_id, to_epoch(since) if since else 0, to_epoch(until) if until else float("inf")))
+        current = None
+        for sid, title, host, min_attendance, start, end_time, uid, joined, left_at, present, started, stopped in cursor:
+            if current is None or current["shift_id"] != sid or current["user_id"] != uid:
+                if current is not None:
+                    yield current
+                current = {
+                    "shift_id": sid,
+                    "title": title,
+                    "host": host,
+                    "min_attendance": min_attendance,
+                    "start": from_epoch(start),
+                    "end_time": from_epoch(end_time),
+                    "user_id": uid,
+                    "join": from_epoch(joined),
+                    "leave": from_epoch(left_at),
+                    "present_seconds": present,
+                    "sessions": []
+                }
+            if started is not None:
+                current["sessions"].append((from_epoch(started), from_epoch(stopped)))
+        if current is not None:
+            yield current
+
+    @staticmethod
+    def load_shift_sessions(conn, shift_id):
+        """(shift fields, {user_id: [(started, stopped)]}) of one shift in epoch seconds, or (None, {})."""
+        row = conn.execute(
+            "SELECT guild_id, title, start, end_time FROM shifts WHERE shift_id = ?", (shift_id,)).fetchone()
+        if row is None:
+            return None, {}
+        sessions = {}
+        for uid, started, stopped in conn.execute(
+                "SELECT user_id, started, stopped FROM sessions WHERE shift_id = ? ORDER BY user_id, idx", (shift_id,)):
+            sessions.setdefault(uid, []).append((started, stopped))
+        return {"guild_id": row[0], "title": row[1], "start": row[2], "end_time": row[3]}, sessions
+
+    @staticmethod
+    def recent_ended_shifts(conn, guild_id, limit=25):
+        """[(shift_id, title, end_time)] of the guild's latest ended shifts, newest first."""
+        return conn.execute(
+            "SELECT shift_id, title, end_time FROM shifts WHERE guild_id = ? AND ended = 1 "
+            "ORDER BY end_time DESC LIMIT ?", (guild_id, limit)).fetchall()
+
+    @staticmethod
+    def load_history_page(conn, shift_id, offset, limit):
+        """(title, attendee count, [(user_id, attendance, passed)]) for one roster page of an ended shift.
+
+        Rows are numbered in roster order when the shift ends, so a page is
+        a range seek on history_by_position, however far into the roster.
+        Returns None if the shift is unknown.
+        """
+        row = conn.execute("SELECT title FROM shifts WHERE shift_id = ?", (shift_id,)).fetchone()
+        if row is None:
+            return None
+        (last,) = conn.execute("SELECT MAX(position) FROM history WHERE shift_id = ?", (shift_id,)).fetchone()
+        rows = conn.execute(
+            "SELECT user_id, attendance, passed FROM history WHERE shift_id = ? AND position >= ? "
+            "ORDER BY position LIMIT ?", (shift_id, offset, limit)).fetchall()
+        return row[0], 0 if last is None else last + 1, rows
+
+    @staticmethod
+    def load_rollup(conn, guild_id, user_id, period=ALL_TIME):
+        """(shifts_attended, shifts_passed, total_seconds, attendance_sum), or None."""
+        return conn.execute(
+            "SELECT shifts_attended, shifts_passed, total_seconds, attendance_sum FROM attendance_rollups "
+            "WHERE guild_id = ? AND user_id = ? AND period = ?", (guild_id, user_id, period)).fetchone()
+
+    @staticmethod
+    def load_leaderboard(conn, guild_id, period=ALL_TIME, limit=10):
+        """Top users by shifts passed, then time present: [(user_id, attended, passed, seconds, attendance_sum)]."""
+        return conn.execute(
+            "SELECT user_id, shifts_attended, shifts_passed, total_seconds, attendance_sum FROM attendance_rollups "
+            "WHERE guild_id = ? AND period = ? ORDER BY shifts_passed DESC, total_seconds DESC LIMIT ?",
+            (guild_id, period, limit)).fetchall()
+
+# =========================
+# READER
+# =========================
+class StoreReader:
+    """A read-only connection to a ShiftStore for the query commands.
+
+    Opened on first use; every query runs in a worker thread, so a
+    checkpoint or a busy disk never stalls the loop. With fresh=True the
+    store is flushed first only if a shift has ended since its last
+    write, the one change history and rollup queries can see; everything
+    else they read is already on disk. Autocomplete and other reads that
+    can be a second behind pass fresh=False.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.conn = None
+
+    async def query(self, func, *args, fresh=True):
+        # func(conn, *args), usually one of the store's static readers
+        if fresh and self.store.has_unwritten_results():
+            await self.store.flush()
+        if self.conn is None:
+            self.conn = await asyncio.to_thread(self.store.open_reader)
+        return await asyncio.to_thread(func, self.conn, *args)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,156 @@
+import io
+import bisect
+import itertools
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+# =========================
+# PRESENCE INDEX
+# =========================
+class PresenceIndex:
+    """Presence intervals of one shift, indexed for time queries.
+
+    Intervals are (start, end, user_id) in epoch seconds, half-open
+    [start, end). A sweep over the sorted endpoints gives the headcount
+    step curve, so headcount(t) is a bisect; present_at(t) walks a
+    centered interval tree and only touches the intervals that contain t
+    (plus O(log n) nodes), instead of every attendee's sessions.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(iv for iv in intervals if iv[1] > iv[0])
+        # Sweep line: at equal times ends (-1) sort before starts (+1), so
+        # back-to-back sessions never count one person twice
+        events = sorted(itertools.chain(
+            ((start, 1) for start, _, _ in self.intervals),
+            ((end, -1) for _, end, _ in self.intervals)
+        ))
+        self.times = []  # Change points...
+        self.counts = []  # ...and the headcount from each one until the next
+        count = 0
+        for t, delta in events:
+            count += delta
+            if self.times and self.times[-1] == t:
+                self.counts[-1] = count
+            else:
+                self.times.append(t)
+                self.counts.append(count)
+        self._root = _build_tree(self.intervals)
+
+    @classmethod
+    def from_sessions(cls, sessions, start, until):
+        """Build from {user_id: [(start, end or None)]} in epoch seconds, clipped to [start, until]."""
+        return cls(
+            (max(s, start), min(until if e is None else e, until), uid)
+            for uid, user_sessions in sessions.items()
+            for s, e in user_sessions
+        )
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def headcount(self, t):
+        i = bisect.bisect_right(self.times, t) - 1
+        return self.counts[i] if i >= 0 else 0
+
+    def present_at(self, t):
+        """User ids present at time t, sorted."""
+        found = []
+        node = self._root
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if t < center:
+                # Every interval here ends after center > t: it holds t if it started by then
+                for start, _, uid in by_start:
+                    if start > t:
+                        break
+                    found.append(uid)
+                node = left
+            else:
+                # Every interval here started by center <= t: it holds t if it ends after it
+                for _, end, uid in by_end:
+                    if end <= t:
+                        break
+                    found.append(uid)
+                node = right
+        found.sort()
+        return found
+
+    def curve(self):
+        """[(time, headcount)] at each change point; the count holds until the next one."""
+        return list(zip(self.times, self.counts))
+
+    def peak(self):
+        """(headcount, from, until) of the first stretch with the highest headcount, or (0, None, None)."""
+        if not self.counts:
+            return 0, None, None
+        best = max(self.counts)
+        i = self.counts.index(best)
+        return best, self.times[i], self.times[i + 1] if i + 1 < len(self.times) else None
+
+    def sample(self, start, end, points):
+        """Headcount at `points` evenly spaced times over [start, end]."""
+        if points < 2 or end <= start:
+            return [self.headcount(start)]
+        step = (end - start) / (points - 1)
+        return [self.headcount(start + i * step) for i in range(points)]
+
+def _build_tree(intervals):
+    # Node: (center, intervals containing center by start asc, same by end desc, left, right)
+    if not intervals:
+        return None
+    # Median start (intervals arrive sorted): at least that interval holds
+    # the center, so every level gets smaller
+    center = intervals[len(intervals) // 2][0]
+    here, left, right = [], [], []
+    for iv in intervals:
+        if iv[1] <= center:
+            left.append(iv)
+        elif iv[0] > center:
+            right.append(iv)
+        else:
+            here.append(iv)
+    return (
+        center,
+        sorted(here, key=lambda iv: iv[0]),
+        sorted(here, key=lambda iv: iv[1], reverse=True),
+        _build_tree(left),
+        _build_tree(right)
+    )
+
+# =========================
+# RENDERING
+# =========================
+def sparkline(values):
+    top = max(values, default=0)
+    if top <= 0:
+        return SPARK_BLOCKS[0] * len(values)
+    return "".join(SPARK_BLOCKS[round(v / top * (len(SPARK_BLOCKS) - 1))] for v in values)
+
+def render_headcount_png(minutes, counts, title):
+    """PNG of the headcount step curve; minutes are offsets from the shift start.
+
+    Runs in a worker process (matplotlib is slow to draw and not
+    thread-safe), so it only takes and returns plain values.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 3), dpi=100)
+    try:
+        ax.step(minutes, counts, where="post", color="#5865F2")
+        ax.fill_between(minutes, counts, step="post", alpha=0.25, color="#5865F2")
+        ax.set_title(title)
+        ax.set_xlabel("Minutes since start")
+        ax.set_ylabel("Present")
+        ax.set_xlim(left=0)
+        ax.set_ylim(bottom=0)
+        ax.yaxis.get_major_locator().set_params(integer=True)
+        ax.grid(alpha=0.3)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
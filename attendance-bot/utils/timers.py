@@ -0,0 +1,96 @@
+import asyncio
+import heapq
+import itertools
+import logging
+
+log = logging.getLogger(__name__)
+
+# =========================
+# DEADLINE SCHEDULER
+# =========================
+class DeadlineScheduler:
+    """One task serving any number of keyed deadlines from a heap.
+
+    arm() is O(log n); cancel() is O(1) (the heap entry is left behind as a
+    tombstone and skipped when it surfaces). Once the earliest deadline
+    passes, the scheduler waits `slack` more seconds and hands every
+    deadline due by then to the callback in a single list, so a burst of
+    expiries is processed as one batch. No key fires before its deadline;
+    each fires at most `slack` seconds after it.
+    """
+
+    def __init__(self, slack=1.0):
+        self.slack = slack
+        self._heap = []  # [(deadline, seq, key)]
+        self._live = {}  # {key: seq} of armed deadlines
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._callback = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._live)
+
+    def __contains__(self, key):
+        return key in self._live
+
+    def start(self, callback):
+        # callback(keys) is awaited with every batch of expired keys
+        self._callback = callback
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def arm(self, key, delay):
+        deadline = asyncio.get_running_loop().time() + max(0, delay)
+        seq = next(self._seq)
+        self._live[key] = seq
+        heapq.heappush(self._heap, (deadline, seq, key))
+        if self._heap[0][1] == seq:
+            self._wake.set()  # New earliest deadline: re-time the sleep
+
+    def cancel(self, key):
+        if self._live.pop(key, None) is None:
+            return False
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._live):
+            self._heap = [entry for entry in self._heap if self._live.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+        return True
+
+    def _pop_due(self, now):
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, seq, key = heapq.heappop(heap)
+            if self._live.get(key) == seq:
+                del self._live[key]
+                due.append(key)
+        return due
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while self._heap and self._live.get(self._heap[0][2]) != self._heap[0][1]:
+                heapq.heappop(self._heap)
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            # The batch window opens at the earliest deadline and closes `slack` later
+            delay = self._heap[0][0] + self.slack - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due = self._pop_due(loop.time())
+            if due:
+                try:
+                    await self._callback(due)
+                except Exception as e:
+                    log.exception("Deadline callback failed: %s", e)